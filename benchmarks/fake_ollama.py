@@ -0,0 +1,172 @@
+"""
+Локальная имитация сервера Ollama для бенчмарков.
+
+Отвечает на /api/generate, /api/chat (NDJSON-стриминг и обычный ответ),
+/api/tags, /api/embeddings, /api/ps и /api/pull. Задержка до первого токена,
+скорость генерации и доля ошибок 5xx настраиваются, так что бенчмарки
+измеряют накладные расходы самого бота без GPU и сети.
+
+Отдельный запуск:
+    python benchmarks/fake_ollama.py --port 11434 --ttft 0.2 --tps 30
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+
+class FakeOllama:
+    """Имитация Ollama с настраиваемыми задержками и ошибками"""
+
+    def __init__(self, ttft: float = 0.05, tokens_per_second: float = 50.0, tokens: int = 20,
+                 error_rate: float = 0.0, models: Optional[List[str]] = None,
+                 embedding_dim: int = 768, seed: Optional[int] = None):
+        """
+        Args:
+            ttft: Задержка до первого токена в секундах
+            tokens_per_second: Скорость генерации
+            tokens: Число токенов в ответе
+            error_rate: Доля запросов генерации, завершающихся ошибкой 500
+            models: Имена моделей для /api/tags (по умолчанию принимается любая)
+            embedding_dim: Размерность эмбеддингов
+            seed: Зерно генератора ошибок
+        """
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.models = models or ["gemma3:latest", "gemma3:12b", "llava:latest"]
+        self.embedding_dim = embedding_dim
+        self._random = random.Random(seed)
+        self.requests: Counter = Counter()
+        self.errors = 0
+        self._loaded: Dict[str, float] = {}
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/api/generate", self._generate)
+        app.router.add_post("/api/chat", self._chat)
+        app.router.add_get("/api/tags", self._tags)
+        app.router.add_post("/api/embeddings", self._embeddings)
+        app.router.add_get("/api/ps", self._ps)
+        app.router.add_post("/api/pull", self._pull)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        """Запускает сервер; фактический адрес - в runner.addresses"""
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    def _fail(self) -> bool:
+        if self.error_rate and self._random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+    def _reply_tokens(self, prompt: str) -> List[str]:
+        """Детерминированный ответ: одинаковые запросы дают одинаковый текст"""
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return [f"слово{digest[i % len(digest)]} " for i in range(self.tokens)]
+
+    async def _respond(self, request: web.Request, body: Dict[str, Any], prompt: str, chat: bool) -> web.StreamResponse:
+        model = body.get("model", "")
+        self._loaded[model] = time.time()
+        if self._fail():
+            return web.json_response({"error": "fake failure"}, status=500)
+        await asyncio.sleep(self.ttft)
+        tokens = self._reply_tokens(prompt)
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+
+        def chunk(text: str, done: bool) -> Dict[str, Any]:
+            data: Dict[str, Any] = {"model": model, "done": done}
+            if chat:
+                data["message"] = {"role": "assistant", "content": text}
+            else:
+                data["response"] = text
+            if done:
+                data.update({"eval_count": len(tokens), "eval_duration": int(len(tokens) * interval * 1e9)})
+            return data
+
+        if not body.get("stream", True):
+            await asyncio.sleep(interval * len(tokens))
+            return web.json_response(chunk("".join(tokens), True))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for token in tokens:
+            await response.write((json.dumps(chunk(token, False), ensure_ascii=False) + "\n").encode("utf-8"))
+            await asyncio.sleep(interval)
+        await response.write((json.dumps(chunk("", True)) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def _generate(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests["generate"] += 1
+        return await self._respond(request, body, body.get("prompt", ""), chat=False)
+
+    async def _chat(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        self.requests["chat"] += 1
+        messages = body.get("messages") or [{}]
+        return await self._respond(request, body, messages[-1].get("content", ""), chat=True)
+
+    async def _tags(self, request: web.Request) -> web.Response:
+        self.requests["tags"] += 1
+        return web.json_response({"models": [
+            {"name": name, "model": name, "size": 4 * 1024 ** 3, "modified_at": "2024-01-01T00:00:00Z"}
+            for name in self.models
+        ]})
+
+    async def _embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        self.requests["embeddings"] += 1
+        if self._fail():
+            return web.json_response({"error": "fake failure"}, status=500)
+        # Псевдослучайный, но воспроизводимый вектор
+        rnd = random.Random(body.get("prompt", ""))
+        return web.json_response({"embedding": [rnd.uniform(-1, 1) for _ in range(self.embedding_dim)]})
+
+    async def _ps(self, request: web.Request) -> web.Response:
+        self.requests["ps"] += 1
+        return web.json_response({"models": [
+            {"name": name, "model": name, "size_vram": 4 * 1024 ** 3} for name in self._loaded
+        ]})
+
+    async def _pull(self, request: web.Request) -> web.Response:
+        self.requests["pull"] += 1
+        return web.json_response({"status": "success"})
+
+
+async def serve(host: str, port: int, fake: FakeOllama) -> None:
+    await fake.start(host, port)
+    print(f"Фейковый Ollama слушает http://{host}:{port}")
+    await asyncio.Event().wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=0.05, help="Задержка до первого токена, с")
+    parser.add_argument("--tps", type=float, default=50.0, help="Токенов в секунду")
+    parser.add_argument("--tokens", type=int, default=20, help="Токенов в ответе")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500")
+    args = parser.parse_args()
+    fake = FakeOllama(ttft=args.ttft, tokens_per_second=args.tps, tokens=args.tokens, error_rate=args.error_rate)
+    try:
+        asyncio.run(serve(args.host, args.port, fake))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
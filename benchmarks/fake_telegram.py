@@ -0,0 +1,105 @@
+"""
+Локальная имитация Telegram Bot API для бенчмарков.
+
+Принимает запросы вида /bot<token>/<method> и отвечает правдоподобными
+результатами: отправленные сообщения получают новые message_id, файлы
+скачиваются как заглушки. Можно задать задержку ответа и долю ответов 429
+(RetryAfter), чтобы проверить очередь исходящих сообщений.
+"""
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Бенчмарк", "username": "benchmark_bot"}
+
+# Методы, результатом которых является отправленное сообщение
+_MESSAGE_METHODS = {
+    "sendmessage", "sendphoto", "senddocument", "editmessagetext", "editmessagemedia",
+    "editmessagecaption",
+}
+
+
+class FakeTelegram:
+    """Имитация Bot API с записью всех вызовов"""
+
+    def __init__(self, latency: float = 0.0, retry_after_rate: float = 0.0, retry_after: int = 1,
+                 file_content: bytes = b"\xff\xd8\xff\xe0fake-jpeg", seed: Optional[int] = None):
+        """
+        Args:
+            latency: Задержка ответа в секундах
+            retry_after_rate: Доля запросов, на которые отвечается 429
+            retry_after: Значение retry_after в ответах 429
+            file_content: Содержимое скачиваемых файлов
+            seed: Зерно генератора ответов 429
+        """
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.file_content = file_content
+        self._random = random.Random(seed)
+        self._message_ids = itertools.count(1_000_000)
+        self.calls: List[Tuple[float, str, Optional[str]]] = []
+        self.methods: Counter = Counter()
+        self.rate_limited = 0
+
+    def make_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._method)
+        app.router.add_get("/file/bot{token}/{path:.*}", self._file)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        runner = web.AppRunner(self.make_app(), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+    def _message(self, chat_id: Any, text: Optional[str]) -> Dict[str, Any]:
+        chat_id = int(chat_id or 0)
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "group", "title": "bench"},
+            "from": BOT_USER,
+            "text": text or "",
+        }
+
+    async def _method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        data = await request.post()
+        chat_id = data.get("chat_id")
+        self.calls.append((time.monotonic(), method, chat_id))
+        self.methods[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method in _MESSAGE_METHODS and self.retry_after_rate and self._random.random() < self.retry_after_rate:
+            self.rate_limited += 1
+            return web.json_response({
+                "ok": False, "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        if method == "getme":
+            result: Any = BOT_USER
+        elif method == "getfile":
+            file_id = data.get("file_id", "file")
+            result = {"file_id": file_id, "file_unique_id": file_id, "file_size": len(self.file_content),
+                      "file_path": f"files/{file_id}.jpg"}
+        elif method == "getupdates":
+            result = []
+        elif method in _MESSAGE_METHODS:
+            result = self._message(chat_id, data.get("text"))
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def _file(self, request: web.Request) -> web.Response:
+        self.methods["download"] += 1
+        return web.Response(body=self.file_content, content_type="application/octet-stream")
@@ -0,0 +1,121 @@
+"""
+Бенчмарк определения намерения «нарисовать картинку».
+
+Сравнивает прежний поиск подстрок ('создай', 'create', ...) с IntentRouter
+на размеченных сообщениях из intent_messages.jsonl: точность, полнота,
+ложные запуски генерации и время классификации одного сообщения.
+Сообщения с "split": "heldout" не использовались при подборе шаблонов
+и примеров классификатора; метрики выводятся отдельно для них.
+С --ollama неоднозначные сообщения дополнительно проверяются
+классификатором по эмбеддингам на живом сервере Ollama.
+
+Запуск из корня репозитория:
+    python benchmarks/intent_bench.py
+    python benchmarks/intent_bench.py --ollama http://localhost:11434 --model nomic-embed-text
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import timeit
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framework.services.intent_router import CHAT, IMAGE, EmbeddingClassifier, IntentRouter, match_image_request
+
+MESSAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intent_messages.jsonl")
+
+
+def legacy_extract_prompt(text: str) -> Optional[str]:
+    keywords = ['нарисуй', 'сгенерируй', 'создай', 'generate', 'draw', 'create']
+    text = text.lower()
+    for keyword in keywords:
+        if keyword in text:
+            return text[text.find(keyword) + len(keyword):].strip()
+    return None
+
+
+def load_messages(path: str) -> List[Dict[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(name: str, messages: List[Dict[str, str]], predicted: List[str], micros: float) -> None:
+    pairs = list(zip((m["intent"] for m in messages), predicted))
+    tp = sum(1 for expected, got in pairs if expected == IMAGE and got == IMAGE)
+    fp = sum(1 for expected, got in pairs if expected == CHAT and got == IMAGE)
+    fn = sum(1 for expected, got in pairs if expected == IMAGE and got == CHAT)
+    accuracy = sum(1 for expected, got in pairs if expected == got) / len(pairs)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    print(f"{name:22} {accuracy:>9.1%} {precision:>9.1%} {recall:>8.1%} {fp:>14} {micros:>10.1f}")
+    for message, got in zip(messages, predicted):
+        if got != message["intent"]:
+            print(f"    ошибка: {message['text']!r} -> {got}")
+
+
+def bench(fn: Callable[[str], str], messages: List[Dict[str, str]]) -> float:
+    """Среднее время классификации одного сообщения в микросекундах"""
+    texts = [m["text"] for m in messages]
+    timer = timeit.Timer(lambda: [fn(text) for text in texts])
+    number, _ = timer.autorange()
+    return min(timer.repeat(5, number)) / number / len(texts) * 1e6
+
+
+async def run_embeddings(router: IntentRouter, messages: List[Dict[str, str]]) -> None:
+    predicted = []
+    started = time.monotonic()
+    for message in messages:
+        predicted.append((await router.classify(message["text"])).intent)
+    cold = (time.monotonic() - started) / len(messages) * 1e6
+    # Второй проход: векторы примеров и сообщений уже в кэше
+    started = time.monotonic()
+    for message in messages:
+        await router.classify(message["text"])
+    warm = (time.monotonic() - started) / len(messages) * 1e6
+    report("шаблоны + эмбеддинги", messages, predicted, warm)
+    print(f"    первый проход (без кэша векторов): {cold:.0f} мкс на сообщение")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", default=MESSAGES, help="Размеченные сообщения (JSONL: text, intent)")
+    parser.add_argument("--threshold", type=float, default=0.7, help="Порог уверенности IntentRouter")
+    parser.add_argument("--ollama", help="URL Ollama для классификатора по эмбеддингам")
+    parser.add_argument("--model", default="nomic-embed-text", help="Модель эмбеддингов")
+    args = parser.parse_args()
+
+    all_messages = load_messages(args.messages)
+    router = IntentRouter(threshold=args.threshold)
+    legacy = lambda text: IMAGE if legacy_extract_prompt(text) else CHAT
+    rules = lambda text: router.classify_rules(text).intent
+
+    splits = {
+        "подбор": [m for m in all_messages if m.get("split") != "heldout"],
+        "отложенные": [m for m in all_messages if m.get("split") == "heldout"],
+    }
+    classifier = None
+    if args.ollama:
+        from framework.ollama_client import OllamaClient
+        classifier = EmbeddingClassifier(OllamaClient(base_url=args.ollama), model_name=args.model)
+
+    for split, messages in splits.items():
+        if not messages:
+            continue
+        print(f"\n[{split}] сообщений: {len(messages)}, картинок: {sum(1 for m in messages if m['intent'] == IMAGE)}")
+        print(f"{'метод':22} {'accuracy':>9} {'precision':>9} {'recall':>8} {'ложных SD':>14} {'мкс/сообщ':>10}")
+        report("подстроки (прежний)", messages, [legacy(m["text"]) for m in messages], bench(legacy, messages))
+        report("шаблоны", messages, [rules(m["text"]) for m in messages], bench(rules, messages))
+        ambiguous = [m for m in messages if (match := match_image_request(m["text"])) is not None
+                     and router.ambiguous_min <= match.confidence < router.threshold]
+        print(f"    неоднозначных (решает классификатор): {len(ambiguous)}, "
+              f"из них картинок: {sum(1 for m in ambiguous if m['intent'] == IMAGE)}")
+        if classifier is not None:
+            asyncio.run(run_embeddings(IntentRouter(threshold=args.threshold, classifier=classifier), messages))
+
+
+if __name__ == "__main__":
+    main()
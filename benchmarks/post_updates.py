@@ -0,0 +1,64 @@
+"""
+Отправка записанных обновлений Telegram на локальный вебхук.
+
+Читает файл JSONL (одно обновление в строке, в формате Bot API) и отправляет
+обновления POST-запросами на вебхук бота, запущенного с webhook.enabled = true.
+Позволяет проверить режим вебхука и реплики за прокси без обращения к Telegram.
+
+Запуск из корня репозитория:
+    python benchmarks/post_updates.py updates.jsonl --url http://127.0.0.1:8080/webhook --secret $WEBHOOK_SECRET
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+
+
+def load_updates(path: str) -> List[Dict[str, Any]]:
+    """Читает обновления из JSONL, пропуская пустые строки"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def post_updates(updates: List[Dict[str, Any]], url: str, secret: Optional[str],
+                       concurrency: int) -> Counter:
+    """Отправляет обновления и возвращает счётчик HTTP-статусов"""
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(session: aiohttp.ClientSession, update: Dict[str, Any]) -> None:
+        async with semaphore:
+            async with session.post(url, json=update, headers=headers) as response:
+                statuses[response.status] += 1
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in updates))
+    return statuses
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("updates", help="Файл JSONL с обновлениями")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook", help="Адрес вебхука")
+    parser.add_argument("--secret", default=None, help="Секрет вебхука")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных запросов")
+    args = parser.parse_args()
+
+    updates = load_updates(args.updates)
+    started = time.perf_counter()
+    statuses = asyncio.run(post_updates(updates, args.url, args.secret, args.concurrency))
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        "updates": len(updates),
+        "seconds": round(elapsed, 3),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Сквозной бенчмарк обработки обновлений без Telegram и GPU.
+
+Поднимает фейковые Ollama и Bot API (fake_ollama.py, fake_telegram.py),
+импортирует run_bot и прогоняет записанные обновления через его диспетчер.
+Для каждого обновления измеряется время обработчика - от получения обновления
+до отправки ответа; выводятся p50/p95/p99, пропускная способность и пиковый RSS.
+
+Обновления берутся из файла JSONL (формат Bot API, как для post_updates.py)
+или генерируются (--synthetic). С --baseline результат сравнивается с
+сохранённым через --output, и при росте p95 больше --max-regression
+скрипт завершается с кодом 1.
+
+Отмена генерации новым сообщением того же пользователя на время прогона
+выключена (в синтетике все сообщения чата идут от одного пользователя, и
+ответы на большинство из них отменялись бы); --supersede включает её.
+В результате "replies" - сколько ответов отправлено на "updates" обновлений.
+
+Запуск из корня репозитория:
+    python benchmarks/replay.py --synthetic 500 --chats 50 --concurrency 32 --output baseline.json
+    python benchmarks/replay.py --synthetic 500 --chats 50 --concurrency 32 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+from fake_ollama import FakeOllama
+from fake_telegram import BOT_USER, FakeTelegram
+from post_updates import load_updates
+
+# Методы Bot API, которыми отправляется ответ (правки не считаются)
+REPLY_METHODS = ("sendmessage", "sendphoto", "senddocument")
+
+
+def synthetic_updates(count: int, chats: int) -> List[Dict[str, Any]]:
+    """Текстовые сообщения в личных чатах, равномерно по chats чатам"""
+    updates = []
+    for i in range(count):
+        chat_id = 1000 + i % chats
+        updates.append({
+            "update_id": i + 1,
+            "message": {
+                "message_id": i + 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private", "first_name": "Тест"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Тест"},
+                "text": f"Расскажи что-нибудь интересное про число {i}",
+            },
+        })
+    return updates
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss в Linux - в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake_ollama = FakeOllama(ttft=args.ttft, tokens_per_second=args.tps, tokens=args.tokens,
+                             error_rate=args.error_rate, seed=0)
+    fake_telegram = FakeTelegram(latency=args.tg_latency, retry_after_rate=args.retry_after_rate, seed=0)
+    ollama_runner = await fake_ollama.start()
+    telegram_runner = await fake_telegram.start()
+    ollama_url = "http://%s:%d" % ollama_runner.addresses[0][:2]
+    telegram_url = "http://%s:%d" % telegram_runner.addresses[0][:2]
+
+    # aiogram проверяет формат токена; id бота берётся из токена
+    os.environ["TELEGRAM_BOT_TOKEN"] = f"{BOT_USER['id']}:replay-benchmark"
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    started = time.perf_counter()
+    import run_bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from framework.ollama_pool import OllamaPool
+    from framework.services.loop_monitor import LoopMonitor
+    import_seconds = time.perf_counter() - started
+
+    # Бот и клиент Ollama направляются на фейковые серверы
+    bot, dp, coordinator = run_bot.bot, run_bot.dp, run_bot.coordinator
+    await bot.session.close()
+    bot.session = AiohttpSession(api=TelegramAPIServer.from_base(telegram_url))
+    coordinator.ollama_pool = OllamaPool([ollama_url], probe_interval=3600)
+    coordinator.ollama_client.base_url = ollama_url
+    coordinator._configure_clients()
+    coordinator.cancel_superseded = args.supersede
+    if args.unlimited_sender:
+        sender = coordinator.sender
+        sender.private_rate = sender.group_rate = sender._global_bucket.rate = 1e6
+        sender.private_burst = sender.group_burst = sender._global_bucket.capacity = 1e6
+
+    updates = load_updates(args.updates) if args.updates else synthetic_updates(args.synthetic, args.chats)
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def feed(update: Dict[str, Any]) -> None:
+        nonlocal errors
+        async with semaphore:
+            update_started = time.perf_counter()
+            try:
+                await dp.feed_raw_update(bot, update)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - update_started)
+
+    # Блокировки цикла событий во время прогона попадают в результат
+    loop_monitor = LoopMonitor(threshold=args.stall_threshold)
+    loop_monitor.start()
+    await dp.emit_startup(bot=bot)
+    replay_started = time.perf_counter()
+    await asyncio.gather(*(feed(update) for update in updates))
+    elapsed = time.perf_counter() - replay_started
+    await loop_monitor.stop()
+    await coordinator.sender.close()
+    await dp.emit_shutdown(bot=bot)
+    await bot.session.close()
+    await ollama_runner.cleanup()
+    await telegram_runner.cleanup()
+
+    return {
+        "updates": len(updates),
+        "replies": sum(fake_telegram.methods[method] for method in REPLY_METHODS),
+        "errors": errors,
+        "import_seconds": round(import_seconds, 3),
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(updates) / elapsed, 2) if elapsed else None,
+        "latency": {
+            "p50": round(percentile(latencies, 0.50), 4),
+            "p95": round(percentile(latencies, 0.95), 4),
+            "p99": round(percentile(latencies, 0.99), 4),
+            "max": round(max(latencies, default=0.0), 4),
+        },
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "loop_stalls": loop_monitor.stalls,
+        "ollama_requests": dict(fake_ollama.requests),
+        "telegram_calls": dict(fake_telegram.methods),
+        "telegram_rate_limited": fake_telegram.rate_limited,
+    }
+
+
+def compare(result: Dict[str, Any], baseline_path: str, max_regression: float) -> Optional[str]:
+    """Сравнивает p95 с базовым запуском; возвращает описание регрессии или None"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    before, after = baseline["latency"]["p95"], result["latency"]["p95"]
+    if before and after > before * (1 + max_regression):
+        return f"p95 вырос с {before}s до {after}s (допустимо +{max_regression:.0%})"
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("updates", nargs="?", help="Файл JSONL с обновлениями")
+    parser.add_argument("--synthetic", type=int, default=200, help="Сгенерировать N обновлений, если файл не задан")
+    parser.add_argument("--chats", type=int, default=20, help="Число чатов для --synthetic")
+    parser.add_argument("--concurrency", type=int, default=16, help="Одновременно обрабатываемых обновлений")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Задержка Ollama до первого токена, с")
+    parser.add_argument("--tps", type=float, default=200.0, help="Скорость генерации Ollama, токенов/с")
+    parser.add_argument("--tokens", type=int, default=20, help="Токенов в ответе Ollama")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов Ollama 500")
+    parser.add_argument("--tg-latency", type=float, default=0.0, help="Задержка ответов Bot API, с")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="Доля ответов Bot API 429")
+    parser.add_argument("--unlimited-sender", action="store_true",
+                        help="Снять лимиты частоты отправки, чтобы измерять только обработку")
+    parser.add_argument("--supersede", action="store_true",
+                        help="Не выключать отмену генерации новым сообщением того же пользователя")
+    parser.add_argument("--stall-threshold", type=float, default=0.1,
+                        help="Блокировка цикла событий дольше N секунд считается зависанием")
+    parser.add_argument("--output", help="Сохранить результат в JSON")
+    parser.add_argument("--baseline", help="JSON предыдущего запуска для сравнения")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Допустимый рост p95")
+    args = parser.parse_args()
+    if args.updates:
+        args.updates = os.path.abspath(args.updates)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if baseline:
+        regression = compare(result, baseline, args.max_regression)
+        if regression:
+            print(f"Регрессия: {regression}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Бенчмарк времени запуска бота.
+
+Замеряет в отдельном процессе, сколько занимает импорт run_bot (создание бота,
+диспетчера и координатора агентов) до момента, когда бот готов принимать
+текстовые сообщения, а также пиковое потребление памяти и то, были ли
+загружены тяжёлые модули (torch, diffusers).
+
+Запуск из корня репозитория:
+    python benchmarks/startup_bench.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Код, выполняемый в дочернем процессе
+CHILD_CODE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import run_bot
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "import_seconds": elapsed,
+    "peak_rss_mb": rss_kb / 1024,
+    "torch_loaded": "torch" in sys.modules,
+    "diffusers_loaded": "diffusers" in sys.modules,
+}))
+"""
+
+
+def run_once() -> dict:
+    """Один запуск дочернего процесса"""
+    env = dict(os.environ)
+    # aiogram проверяет формат токена при создании бота
+    env.setdefault("TELEGRAM_BOT_TOKEN", "123456:startup-benchmark")
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Последняя строка stdout - результат, всё остальное - логи бота
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк времени запуска бота")
+    parser.add_argument("--runs", type=int, default=5, help="Количество запусков")
+    args = parser.parse_args()
+
+    samples = [run_once() for _ in range(args.runs)]
+    times = [s["import_seconds"] for s in samples]
+    print(f"Запусков: {len(samples)}")
+    print(f"Время до готовности: медиана {statistics.median(times):.3f}s, "
+          f"мин {min(times):.3f}s, макс {max(times):.3f}s")
+    print(f"Пиковый RSS: {max(s['peak_rss_mb'] for s in samples):.1f} MB")
+    print(f"torch загружен: {any(s['torch_loaded'] for s in samples)}, "
+          f"diffusers загружен: {any(s['diffusers_loaded'] for s in samples)}")
+
+
+if __name__ == "__main__":
+    main()
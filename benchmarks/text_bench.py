@@ -0,0 +1,94 @@
+"""
+Микробенчмарк функций обработки текста.
+
+Сравнивает framework.utils.text с прежними реализациями из PromptAgent,
+PromptGenerator, ImageAgent и ThinkAgent на длинных ответах модели
+(русский текст с эмодзи, латиницей и разметкой).
+
+Запуск из корня репозитория:
+    python benchmarks/text_bench.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from framework.utils.text import clean_prompt, contains_cyrillic, is_mostly_latin
+
+SAMPLE = (
+    "Интересный вопрос! 🤔 Давай разберёмся: фотосинтез - это процесс, при котором растения "
+    "превращают свет в энергию. В листьях есть хлорофилл (chlorophyll), он поглощает свет 🌿. "
+    "Ещё важна вода и углекислый газ CO2; в итоге получается глюкоза и кислород!\n\n"
+)
+
+
+def legacy_is_russian(text: str) -> bool:
+    return any(ord(c) in range(1040, 1104) for c in text)
+
+
+def legacy_image_is_russian(text: str) -> bool:
+    return any('а' <= char.lower() <= 'я' for char in text)
+
+
+def legacy_clean_text(text: str) -> str:
+    emoji_pattern = re.compile("["
+        u"\U0001F600-\U0001F64F"
+        u"\U0001F300-\U0001F5FF"
+        u"\U0001F680-\U0001F6FF"
+        u"\U0001F1E0-\U0001F1FF"
+        u"\U00002702-\U000027B0"
+        u"\U000024C2-\U0001F251"
+        "]+", flags=re.UNICODE)
+    text = emoji_pattern.sub(r'', text)
+    text = ''.join(c for c in text if ord(c) not in range(1040, 1104))
+    text = ' '.join(text.split())
+    return text.strip()
+
+
+def legacy_has_ascii(text: str) -> bool:
+    return any(ord(char) < 128 for char in ''.join(text.split()))
+
+
+# (название, прежняя функция, новая функция)
+CASES: List[Tuple[str, Callable, Callable]] = [
+    ("is_russian (латиница)", legacy_is_russian, contains_cyrillic),
+    ("ImageAgent._is_russian (латиница)", legacy_image_is_russian, contains_cyrillic),
+    ("clean_text", legacy_clean_text, clean_prompt),
+    ("ThinkAgent: проверка языка", legacy_has_ascii, is_mostly_latin),
+]
+
+
+def make_text(size: int, latin: bool = False) -> str:
+    """Длинный ответ модели; latin=True - английский текст без кириллицы (худший случай поиска)"""
+    base = "The quick brown fox jumps over the lazy dog 🦊 " if latin else SAMPLE
+    return (base * (size // len(base) + 1))[:size]
+
+
+def bench(fn: Callable, text: str, repeat: int) -> float:
+    """Лучшее время одного вызова в микросекундах"""
+    timer = timeit.Timer(lambda: fn(text))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Длины текста, символов")
+    parser.add_argument("--repeat", type=int, default=5, help="Повторов каждого замера")
+    args = parser.parse_args()
+
+    print(f"{'функция':36} {'символов':>9} {'прежняя, мкс':>14} {'новая, мкс':>12} {'ускорение':>10}")
+    for name, legacy, current in CASES:
+        for size in args.sizes:
+            # Поиск кириллицы медленнее всего, когда её нет вовсе
+            text = make_text(size, latin="латиница" in name)
+            before, after = bench(legacy, text, args.repeat), bench(current, text, args.repeat)
+            print(f"{name:36} {size:>9} {before:>14.1f} {after:>12.1f} {before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
+import asyncio
 import json
 import logging
 from typing import Dict, List, Optional, Any
-from framework.ollama_client import OllamaClient
+from framework.ollama_client import OllamaClient, ollama_client as default_ollama_client
+from framework.services.circuit_breaker import CircuitOpenError
+from framework.services.shared_store import SharedStore
 import random
 
 logger = logging.getLogger(__name__)
@@ -9,12 +12,22 @@ logger = logging.getLogger(__name__)
 class BaseAgent:
     """Базовый класс для всех агентов"""
     
-    def __init__(self, config: Dict[str, Any], model_name: Optional[str] = None):
+    # Параметры генерации с воспроизводимым ответом: такие запросы можно кэшировать
+    DETERMINISTIC_OPTIONS = {"temperature": 0, "seed": 42}
+    
+    # Сколько последних сообщений чата хранится в памяти
+    MEMORY_SIZE = 10
+    
+    def __init__(self, config: Dict[str, Any], model_name: Optional[str] = None,
+                 ollama_client: Optional[OllamaClient] = None):
         """Инициализация базового агента"""
         self.model_name = model_name or config.get('models', {}).get('default', 'gemma3:latest')
         self.config = config
-        self.ollama_client = OllamaClient()
+        # Все агенты по умолчанию работают через общий клиент с общим кэшем моделей
+        self.ollama_client = ollama_client or default_ollama_client
         self.memory: Dict[int, List[Dict[str, str]]] = {}
+        # Общее хранилище для нескольких рабочих процессов; без него память живёт в процессе
+        self.store: Optional[SharedStore] = None
         self.last_analysis: Optional[Dict[str, Any]] = None
         self.last_image_analysis: Optional[Dict[str, Any]] = None
         
@@ -31,23 +44,40 @@ class BaseAgent:
         self.creator = bot_config.get('creator', {'name': 'Команда разработчиков'})
         self.logger = logging.getLogger(__name__)
         
-    def _add_to_memory(self, chat_id: int, role: str, content: str):
+    def _memory_namespace(self) -> str:
+        """Пространство имён памяти агента в общем хранилище"""
+        return f"memory:{type(self).__name__}"
+        
+    async def _get_history(self, chat_id: int) -> List[Dict[str, str]]:
+        """Возвращает сохранённые сообщения чата"""
+        if self.store is not None:
+            # SQLite может ждать блокировку другого процесса до busy_timeout - не в цикле событий
+            return await asyncio.to_thread(self.store.get, self._memory_namespace(), chat_id, [])
+        return self.memory.get(chat_id, [])
+        
+    async def _add_to_memory(self, chat_id: int, role: str, content: str):
         """Добавляет сообщение в память для указанного чата"""
+        message = {"role": role, "content": content}
+        if self.store is not None:
+            # Чтение и запись в одной транзакции: другие процессы не затрут сообщение
+            await asyncio.to_thread(
+                self.store.append, self._memory_namespace(), chat_id, message, max_len=self.MEMORY_SIZE
+            )
+            return
         if not hasattr(self, 'memory') or self.memory is None:
             self.memory = {}
         if chat_id not in self.memory:
             self.memory[chat_id] = []
-        self.memory[chat_id].append({"role": role, "content": content})
-        # Оставляем только последние 10 сообщений
-        if len(self.memory[chat_id]) > 10:
-            self.memory[chat_id] = self.memory[chat_id][-10:]
+        self.memory[chat_id].append(message)
+        # Оставляем только последние MEMORY_SIZE сообщений
+        if len(self.memory[chat_id]) > self.MEMORY_SIZE:
+            self.memory[chat_id] = self.memory[chat_id][-self.MEMORY_SIZE:]
             
-    def _get_last_message(self, chat_id: int) -> Optional[str]:
+    async def _get_last_message(self, chat_id: int) -> Optional[str]:
         """Возвращает последнее сообщение пользователя"""
-        if chat_id in self.memory and self.memory[chat_id]:
-            for msg in reversed(self.memory[chat_id]):
-                if msg["role"] == "user":
-                    return msg["content"]
+        for msg in reversed(await self._get_history(chat_id)):
+            if msg["role"] == "user":
+                return msg["content"]
         return None
         
     def _get_random_greeting(self) -> str:
@@ -58,20 +88,27 @@ class BaseAgent:
         """Возвращает случайное сообщение об ошибке"""
         return random.choice(self.personality['error_phrases'])
         
+    def _unavailable_response(self, **extra: Any) -> Dict[str, Any]:
+        """Ответ, когда Ollama недоступна: фраза из характера бота, без ожидания таймаутов"""
+        return {"action": "send_message", "text": self._get_random_error(), **extra}
+        
     def _get_capabilities(self) -> str:
         """Возвращает список возможностей бота"""
         capabilities = "\n".join(self.personality['capabilities'])
         return f"{self._get_random_greeting()} {self.bot_name} - дружелюбный бот-помощник, и вот что он умеет:\n\n{capabilities}\n\nПросто напиши {self.bot_name}у сообщение, отправь фотографию или документ! 💫"
         
-    async def think(self, message: str, chat_id: int, message_id: int) -> dict:
+    async def think(self, message: str, chat_id: int, message_id: int,
+                    options: Optional[Dict[str, Any]] = None, cache: bool = False) -> dict:
         """Обработка сообщения и генерация ответа"""
         try:
             # Создаем системный промпт
-            system_prompt = self._create_analysis_prompt(message)
+            system_prompt = await self._create_analysis_prompt(message)
             
             # Генерируем ответ
             response = await self.ollama_client.generate(
-                prompt=system_prompt
+                prompt=system_prompt,
+                options=options,
+                cache=cache
             )
             
             if not response:
@@ -94,6 +131,8 @@ class BaseAgent:
                     "text": response
                 }
             
+        except CircuitOpenError:
+            return self._unavailable_response()
         except Exception as e:
             logger.error(f"Ошибка при генерации ответа: {e}")
             return {
@@ -132,6 +171,8 @@ class BaseAgent:
                     "text": response
                 }
             
+        except CircuitOpenError:
+            return self._unavailable_response()
         except Exception as e:
             logger.error(f"Ошибка при анализе изображения: {e}")
             return {
@@ -143,7 +184,7 @@ class BaseAgent:
         """Получение ответа от модели"""
         try:
             # Создаем системный промпт
-            system_prompt = self._create_response_prompt(message)
+            system_prompt = await self._create_response_prompt(message)
             
             # Генерируем ответ
             response = await self.ollama_client.generate(
@@ -172,6 +213,8 @@ class BaseAgent:
                 "text": str(response)
             }
             
+        except CircuitOpenError:
+            return self._unavailable_response()
         except Exception as e:
             logger.error(f"Ошибка при генерации ответа: {e}")
             return {
@@ -183,7 +226,7 @@ class BaseAgent:
         """Проверяет, является ли чат приватным"""
         return chat_id > 0
             
-    def _create_analysis_prompt(self, message: str) -> str:
+    async def _create_analysis_prompt(self, message: str) -> str:
         """Создает промпт для анализа запроса"""
         system_prompt = (
             "СИСТЕМНЫЕ ИНСТРУКЦИИ:\n"
@@ -203,10 +246,11 @@ class BaseAgent:
         
         # Добавляем историю диалога
         chat_id = 0  # Используем дефолтный chat_id для примера
-        if chat_id in self.memory:
+        messages = await self._get_history(chat_id)
+        if messages:
             history = "\n".join([
                 f"{'Пользователь' if msg['role'] == 'user' else 'Слайм'}: {msg['content']}"
-                for msg in self.memory[chat_id][-5:]  # Последние 5 сообщений
+                for msg in messages[-5:]  # Последние 5 сообщений
             ])
             system_prompt += f"{history}\n"
             
@@ -234,7 +278,7 @@ class BaseAgent:
             "\nОТВЕЧАЙ СТРОГО НА РУССКОМ ЯЗЫКЕ!"
         )
         
-    def _create_response_prompt(self, message: str) -> str:
+    async def _create_response_prompt(self, message: str) -> str:
         """Создает промпт для генерации ответа"""
         system_prompt = (
             "СИСТЕМНЫЕ ИНСТРУКЦИИ:\n"
@@ -253,10 +297,11 @@ class BaseAgent:
         )
         
         # Добавляем историю диалога
-        if self.memory.get(0):  # Используем дефолтный chat_id для примера
+        messages = await self._get_history(0)  # Используем дефолтный chat_id для примера
+        if messages:
             history = "\n".join([
                 f"{'Пользователь' if msg['role'] == 'user' else 'Слайм'}: {msg['content']}"
-                for msg in self.memory[0][-5:]  # Последние 5 сообщений
+                for msg in messages[-5:]  # Последние 5 сообщений
             ])
             system_prompt += f"{history}\n"
             
@@ -278,15 +323,13 @@ class BaseAgent:
                 
             # В реальном боте здесь будет код для получения файла через Telegram API
             # В тестах этот метод будет замокан
-            self.logger.info(f"Получение содержимого файла с ID: {file_id}")
+            self.logger.info("Получение содержимого файла с ID: %s", file_id)
             return f"Content of file {file_id}"
             
         except Exception as e:
             self.logger.error(f"Ошибка при получении содержимого файла: {e}")
             return None 
 
-    def get_memory_context(self, chat_id: int = 0) -> str:
+    async def get_memory_context(self, chat_id: int = 0) -> str:
         """Возвращает контекст сообщений из памяти для заданного чата"""
-        if chat_id not in self.memory:
-            return ""
-        return "\n".join(f"{msg['role']}: {msg['content']}" for msg in self.memory[chat_id]) 
\ No newline at end of file
+        return "\n".join(f"{msg['role']}: {msg['content']}" for msg in await self._get_history(chat_id)) 
\ No newline at end of file
@@ -1,10 +1,21 @@
 import logging
 import asyncio
-from typing import Dict, Any, Optional, Callable
-from framework.agents.image_agent import ImageAgent
-from framework.agents.message_agent import MessageAgent
-from framework.agents.think_agent import ThinkAgent
-from framework.models.image_generation.stable_diffusion import StableDiffusionHandler
+import threading
+from typing import TYPE_CHECKING, Dict, Any, Optional, Callable, Tuple
+from framework.agents.registry import AgentRegistry, get_registry
+from framework.models.image_generation.stable_diffusion import StableDiffusionHandler, GenerationCancelled
+from framework.services.generation_progress import GenerationProgress
+from framework.services.response_cache import ResponseCache
+from framework.services.circuit_breaker import CircuitBreaker
+from framework.services.adaptive_timeout import AdaptiveTimeout
+from framework.services.llm_scheduler import PriorityScheduler, priority, priority_for_chat
+from framework.services.model_residency import ModelResidencyManager
+from framework.services.shared_store import SharedStore
+from framework.services.message_sender import MessageSender
+from framework.services.update_dedup import UpdateDeduplicator
+from framework.services.intent_router import IntentRouter
+from framework.services.tracing import traced, tracer
+from framework.ollama_pool import OllamaPool, BackendError, BACKEND_ERRORS
 from aiogram import Bot
 from aiogram.types import Message, InputFile
 from aiogram.types import FSInputFile
@@ -12,40 +23,131 @@ from io import BytesIO
 from aiogram.types import BufferedInputFile
 import os
 from framework.agents.base import BaseAgent
-from framework.agents.prompt_agent import PromptAgent
+
+if TYPE_CHECKING:
+    # Модули агентов импортирует реестр при первом обращении к агенту
+    from framework.agents.image_agent import ImageAgent
+    from framework.agents.message_agent import MessageAgent
+    from framework.agents.prompt_agent import PromptAgent
+    from framework.agents.think_agent import ThinkAgent
 
 logger = logging.getLogger(__name__)
 
 class AgentCoordinator:
     """Координатор для управления агентами"""
     
-    def __init__(self, config: Dict[str, Any], bot: Optional[Bot] = None):
+    def __init__(self, config: Dict[str, Any], bot: Optional[Bot] = None,
+                 registry: Optional[AgentRegistry] = None):
         self.config = config
         self.bot = bot
         self.logger = logging.getLogger(__name__)
         self.response_callbacks = []
+        # Флаги отмены активных генераций изображений: (chat_id, user_id) -> Event
+        self._generation_cancel_events: Dict[Tuple[int, int], threading.Event] = {}
+        # Текущие генерации ответов; новое сообщение отменяет устаревшую
+        self._active_replies: Dict[Tuple[int, ...], asyncio.Task] = {}
+        generation_config = self.config.get('generation', {})
+        self.cancel_superseded = generation_config.get('cancel_superseded', True)
+        self.supersede_scope = generation_config.get('supersede_scope', 'user')
         
-        # Инициализируем ollama_client
-        from framework.ollama_client import ollama_client
-        self.ollama_client = ollama_client
+        # Агенты общие для всех точек входа и создаются при первом обращении
+        self.agents = registry or get_registry(self.config)
+        self.ollama_client = self.agents.ollama_client
         
-        # Инициализируем всех агентов
-        self.message_agent = MessageAgent(self.config)
-        self.image_agent = ImageAgent(self.config)
-        self.image_generator = StableDiffusionHandler()
-        self.think_agent = ThinkAgent(self.config)
-        self.prompt_agent = PromptAgent(self.config, self.ollama_client)
+        generation_config = self.config.get('image_generation', {})
+        self.image_generator = StableDiffusionHandler(
+            idle_timeout=generation_config.get('idle_timeout'),
+            rss_watermark_mb=generation_config.get('rss_watermark_mb'),
+            check_interval=generation_config.get('memory_check_interval', 60.0)
+        )
         
         # Устанавливаем модели из конфига
         self._update_models()
         
+        # Общий кэш ответов, пул серверов, выключатель и таймауты для всех клиентов Ollama
+        self.response_cache = ResponseCache.from_config(self.config)
+        self.ollama_pool = OllamaPool.from_config(self.config)
+        self.ollama_breaker = CircuitBreaker.from_config(
+            self.config, failure_types=(BackendError, *BACKEND_ERRORS)
+        )
+        self.ollama_timeouts = AdaptiveTimeout.from_config(self.config)
+        self.llm_scheduler = PriorityScheduler.from_config(self.config)
+        # По умолчанию в памяти закрепляется модель, отвечающая в чате
+        self.model_residency = ModelResidencyManager.from_config(
+            self.config, pinned=[self._think_model_name()]
+        )
+        if self.model_residency is not None:
+            self.llm_scheduler.affinity = self.model_residency.is_resident
+        # Общее состояние рабочих процессов (None в однопроцессном режиме)
+        self.shared_store = SharedStore.from_config(self.config)
+        self.response_cache.store = self.shared_store
+        # Повторно доставленные сообщения пропускаются (см. DedupMiddleware)
+        self.dedup = UpdateDeduplicator.from_config(self.config)
+        self.dedup.store = self.shared_store
+        self._configure_clients()
+        # Все исходящие сообщения идут через общую очередь с учётом лимитов Telegram
+        self.sender = MessageSender.from_config(self.config, bot) if bot else None
+        # Перевод и генерация изображения запускаются только для явных просьб нарисовать
+        self.intent_router = IntentRouter.from_config(self.config, self.ollama_client)
+        
         self._initialize_agents()
         
+    @property
+    def message_agent(self) -> "MessageAgent":
+        return self.agents.get('message')
+        
+    @property
+    def image_agent(self) -> "ImageAgent":
+        return self.agents.get('image')
+        
+    @property
+    def think_agent(self) -> "ThinkAgent":
+        return self.agents.get('think')
+        
+    @property
+    def prompt_agent(self) -> "PromptAgent":
+        return self.agents.get('prompt')
+        
+    def _think_model_name(self) -> str:
+        """Модель ThinkAgent из конфига (как в ThinkAgent.__init__), без создания агента"""
+        models_config = self.config.get('models', {})
+        return models_config.get('think', models_config.get('default', 'gemma3:12b'))
+        
     def _update_models(self):
-        """Обновляет модели у всех агентов"""
+        """Обновляет модели у уже созданных агентов; новые прочитают их из конфига сами"""
         default_model = self.config.get('models', {}).get('default', 'gemma3:latest')
-        self.message_agent.model_name = default_model
-        self.think_agent.model_name = default_model
+        message_agent = self.agents.peek('message')
+        if message_agent is not None:
+            message_agent.model_name = default_model
+        think_agent = self.agents.peek('think')
+        if think_agent is not None:
+            think_agent.model_name = self._think_model_name()
+        # Закреплённая модель следует за моделью чата, если не задана явно
+        if getattr(self, 'model_residency', None) is not None and not self.config.get('residency', {}).get('pinned'):
+            self.model_residency.pinned = {self._think_model_name()}
+        
+    def _configure_clients(self):
+        """Применяет общие настройки к клиенту Ollama и агентам"""
+        client = self.ollama_client
+        client.response_cache = self.response_cache
+        client.pool = self.ollama_pool
+        client.breaker = self.ollama_breaker
+        client.timeouts = self.ollama_timeouts
+        client.scheduler = self.llm_scheduler
+        client.residency = self.model_residency
+        client.store = self.shared_store
+        self.agents.store = self.shared_store
+        
+    def get_llm_stats(self) -> Dict[str, Any]:
+        """Состояние общих компонентов доступа к Ollama"""
+        return {
+            "scheduler": self.llm_scheduler.stats(),
+            "cache": self.response_cache.stats(),
+            "breaker": self.ollama_breaker.stats(),
+            "timeouts": self.ollama_timeouts.stats(),
+            "pool": self.ollama_pool.stats() if self.ollama_pool else None,
+            "residency": self.model_residency.stats() if self.model_residency else None,
+        }
         
     def add_response_callback(self, callback: Callable[[int, str], None]):
         """Добавление callback для отправки ответов"""
@@ -55,7 +157,7 @@ class AgentCoordinator:
         """Отправка ответа через все доступные интерфейсы"""
         if self.bot:
             try:
-                await self.bot.send_message(user_id, text)
+                await self.sender.send_text(user_id, text)
             except Exception as e:
                 self.logger.error(f"Ошибка при отправке через бот: {str(e)}")
         
@@ -65,60 +167,81 @@ class AgentCoordinator:
             except Exception as e:
                 self.logger.error(f"Ошибка в callback: {str(e)}")
         
-    async def process_image(self, image_content: bytes, user_id: int, message_id: int, caption: str = "") -> Dict[str, Any]:
+    @traced("coordinator.process_image")
+    async def process_image(self, image_content: bytes, user_id: int, message_id: int, caption: str = "",
+                            chat_id: Optional[int] = None) -> Dict[str, Any]:
         """Обработка изображения: ImageAgent получает описание изображения. Далее это описание комбинируется с текстом от пользователя и системными промптами, и передается в ThinkAgent для формирования финального ответа."""
-        try:
-            # Сохраняем информацию о последнем обработанном сообщении
-            self.last_processed_message = {
-                'message_id': message_id,
-                'user_id': user_id
-            }
-            
-            # Обрабатываем изображение через ImageAgent
-            image_result = await self.image_agent.process_image(
-                image_content=image_content,
-                user_id=user_id,
-                message_id=message_id
-            )
-            if image_result.get("action") != "send_message":
-                self.logger.error("Неожиданный результат от ImageAgent")
-                return {"action": "send_message", "text": "Извините, произошла ошибка при обработке изображения. Попробуйте еще раз! 🌟"}
-
-            # Извлекаем описание, полученное от ImageAgent
-            analysis = image_result.get("text", "")
-            if not analysis:
-                self.logger.error("Пустой ответ от ImageAgent")
-                return {"action": "send_message", "text": "Извините, не удалось получить описание изображения. Попробуйте еще раз! 🌟"}
-
-            # Формируем комбинированный prompt для ThinkAgent
-            combined_prompt = "Описание изображения: " + analysis
-            if caption:
-                combined_prompt += "\nСообщение пользователя: " + caption
-            combined_prompt += "\nПожалуйста, сначала проверь полученное описание изображения. Если оно выглядит неструктурированным, содержит лишние или случайные символы, отфильтруй его, оставив только осмысленное описание. Затем, используя очищенное описание, сформируй краткий и понятный финальный ответ на русском языке, без лишних деталей и оценочных суждений."
-
-            think_result = await self.think_agent.think(combined_prompt)
-            if not think_result:
-                self.logger.error("ThinkAgent не смог сформировать финальный ответ")
-                return {"action": "send_message", "text": "Извините, у меня возникли проблемы с анализом изображения. Попробуйте еще раз! 🌟"}
+        if chat_id is None:
+            chat_id = user_id
+        # Запросы к Ollama идут с приоритетом чата: группа не вытесняет личные диалоги
+        with priority(priority_for_chat(chat_id)):
+            try:
+                # Обрабатываем изображение через ImageAgent
+                image_result = await self.image_agent.process_image(
+                    image_content=image_content,
+                    user_id=user_id,
+                    message_id=message_id
+                )
+                if image_result.get("action") != "send_message":
+                    self.logger.error("Неожиданный результат от ImageAgent")
+                    return {"action": "send_message", "text": "Извините, произошла ошибка при обработке изображения. Попробуйте еще раз! 🌟"}
 
-            return {"action": "send_message", "text": think_result}
-        except Exception as e:
-            self.logger.error(f"Ошибка при обработке изображения: {str(e)}", exc_info=True)
-            return {"action": "send_message", "text": "Ой-ой! 😢 Что-то пошло не так при обработке изображения. Давайте попробуем еще раз! 🎨"}
-        finally:
-            # Очищаем информацию о последнем обработанном сообщении
-            self.last_processed_message = None
+                # Ollama недоступна - ImageAgent уже вернул фразу об ошибке
+                if image_result.get("unavailable"):
+                    return {"action": "send_message", "text": image_result["text"]}
+
+                # Извлекаем описание, полученное от ImageAgent
+                analysis = image_result.get("text", "")
+                if not analysis:
+                    self.logger.error("Пустой ответ от ImageAgent")
+                    return {"action": "send_message", "text": "Извините, не удалось получить описание изображения. Попробуйте еще раз! 🌟"}
+
+                # Формируем комбинированный prompt для ThinkAgent
+                combined_prompt = "Описание изображения: " + analysis
+                if caption:
+                    combined_prompt += "\nСообщение пользователя: " + caption
+                combined_prompt += "\nПожалуйста, сначала проверь полученное описание изображения. Если оно выглядит неструктурированным, содержит лишние или случайные символы, отфильтруй его, оставив только осмысленное описание. Затем, используя очищенное описание, сформируй краткий и понятный финальный ответ на русском языке, без лишних деталей и оценочных суждений."
+
+                # Очистка описания детерминирована, поэтому её результат кэшируется
+                think_result = await self.think_agent.think(
+                    combined_prompt,
+                    options=self.think_agent.DETERMINISTIC_OPTIONS,
+                    cache=True
+                )
+                if not think_result:
+                    self.logger.error("ThinkAgent не смог сформировать финальный ответ")
+                    return {"action": "send_message", "text": "Извините, у меня возникли проблемы с анализом изображения. Попробуйте еще раз! 🌟"}
+
+                return {"action": "send_message", "text": think_result}
+            except Exception as e:
+                self.logger.error(f"Ошибка при обработке изображения: {str(e)}", exc_info=True)
+                return {"action": "send_message", "text": "Ой-ой! 😢 Что-то пошло не так при обработке изображения. Давайте попробуем еще раз! 🎨"}
         
-    async def process_message(self, text: str, user_id: int, message_id: int) -> Dict[str, Any]:
+    def _reply_key(self, chat_id: int, user_id: int) -> Tuple[int, ...]:
+        """Ключ, в пределах которого новое сообщение вытесняет предыдущее"""
+        if self.supersede_scope == 'chat':
+            return (chat_id,)
+        return (chat_id, user_id)
+        
+    @traced("coordinator.process_message")
+    async def process_message(self, text: str, user_id: int, message_id: int, chat_id: Optional[int] = None) -> Dict[str, Any]:
         """Обработка текстового сообщения"""
+        if chat_id is None:
+            # В приватном чате идентификатор чата совпадает с идентификатором пользователя
+            chat_id = user_id
+        key = self._reply_key(chat_id, user_id)
+        task = None
         try:
-            # Пропускаем обработку, если сообщение уже обработано как изображение
-            if hasattr(self, 'last_processed_message') and self.last_processed_message is not None:
-                if self.last_processed_message.get('message_id') == message_id:
-                    return {"action": "none"}
-                
-            # Обрабатываем сообщение через ThinkAgent
-            think_result = await self.think_agent.think(text)
+            # Обрабатываем сообщение через ThinkAgent; приоритет наследует дочерняя задача
+            with priority(priority_for_chat(chat_id)):
+                task = asyncio.create_task(self.think_agent.think(text))
+            if self.cancel_superseded:
+                previous = self._active_replies.get(key)
+                if previous is not None and not previous.done():
+                    self.logger.info("Новое сообщение в чате %s отменяет предыдущую генерацию", chat_id)
+                    previous.cancel()
+                self._active_replies[key] = task
+            think_result = await task
             if not think_result:
                 self.logger.error("ThinkAgent не смог сформировать ответ")
                 error_message = "Извините, у меня возникли проблемы с анализом сообщения. Попробуйте еще раз! 🌟"
@@ -129,6 +252,11 @@ class AgentCoordinator:
                 "text": think_result
             }
             
+        except asyncio.CancelledError:
+            # Генерацию отменило более новое сообщение - отвечать на устаревшее не нужно
+            if task is not None and task.cancelled() and not asyncio.current_task().cancelling():
+                return {"action": "none"}
+            raise
         except Exception as e:
             logger.error(f"Error in process_message: {str(e)}")
             error_message = "Произошла ошибка при обработке сообщения. Попробуйте позже."
@@ -136,7 +264,11 @@ class AgentCoordinator:
                 "action": "send_message",
                 "text": error_message
             }
+        finally:
+            if task is not None and self._active_replies.get(key) is task:
+                del self._active_replies[key]
 
+    @traced("coordinator.process_document")
     async def process_document(self, message: Message, user_id: int, message_id: int) -> Dict[str, Any]:
         """Обработка документа"""
         try:
@@ -153,7 +285,8 @@ class AgentCoordinator:
                 return {"action": "send_message", "text": "Ошибка при получении файла."}
 
             # Скачиваем содержимое файла
-            file_content = await self.bot.download_file(file.file_path)
+            with tracer.span("telegram.download", size=message.document.file_size or 0):
+                file_content = await self.bot.download_file(file.file_path)
             if not file_content:
                 self.logger.error("Не удалось скачать файл")
                 await self.send_response(user_id, "Ой-ой! 😢 Не удалось скачать файл. Попробуйте отправить документ еще раз!")
@@ -163,7 +296,8 @@ class AgentCoordinator:
             return await self.process_image(
                 image_content=file_content,
                 user_id=user_id,
-                message_id=message_id
+                message_id=message_id,
+                chat_id=message.chat.id
             )
 
         except Exception as e:
@@ -171,29 +305,60 @@ class AgentCoordinator:
             await self.send_response(user_id, "Ой-ой! 😢 Что-то пошло не так при обработке документа. Давайте попробуем еще раз! 📄")
             return {"action": "send_message", "text": "Ошибка при обработке документа."}
         
+    async def cancel_generation(self, chat_id: int, user_id: int) -> bool:
+        """Отменяет активную генерацию изображения пользователя в чате"""
+        cancel_event = self._generation_cancel_events.get((chat_id, user_id))
+        if cancel_event is None or cancel_event.is_set():
+            return False
+        cancel_event.set()
+        self.logger.info("Запрошена отмена генерации: чат %s, пользователь %s", chat_id, user_id)
+        return True
+
+    @traced("coordinator.generate_image")
     async def generate_image(self, message: Message, prompt: str) -> None:
         """Генерирует и отправляет изображение"""
+        key = (message.chat.id, message.from_user.id)
+        cancel_event = threading.Event()
+        self._generation_cancel_events[key] = cancel_event
+        progress = None
         try:
             # Отправляем сообщение о начале генерации
             status_message = await message.answer("🎨 Генерирую изображение...")
+            generation_config = self.config.get('image_generation', {})
+            progress = GenerationProgress(
+                status_message,
+                min_interval=generation_config.get('progress_interval', 2.0),
+                sender=self.sender
+            )
             
             # Обрабатываем промпт через prompt_agent
             processed_prompt = await self.prompt_agent.process_prompt(prompt)
             if not processed_prompt:
-                await status_message.delete()
-                await message.answer("Ошибка при обработке описания. Попробуйте еще раз.")
+                await progress.cleanup()
+                await self.sender.answer(message, "Ошибка при обработке описания. Попробуйте еще раз.")
                 return
             
+            # Пока пайплайн загружается в фоне, сообщаем о прогреве
+            if self.image_generator.is_warming_up():
+                await progress.set_status(
+                    "⏳ Модель генерации изображений прогревается, генерация начнётся через несколько секунд..."
+                )
+
             # Генерируем изображение
-            image_path = await self.image_generator.generate_image(processed_prompt)
+            image_path = await self.image_generator.generate_image(
+                processed_prompt,
+                progress_callback=progress,
+                cancel_event=cancel_event,
+                preview_every=generation_config.get('preview_every', 0)
+            )
             
             if not image_path or not os.path.exists(image_path):
-                await status_message.delete()
-                await message.answer("Не удалось сгенерировать изображение. Попробуйте еще раз.")
+                await progress.cleanup()
+                await self.sender.answer(message, "Не удалось сгенерировать изображение. Попробуйте еще раз.")
                 return
                 
             # Удаляем сообщение о генерации
-            await status_message.delete()
+            await progress.cleanup()
             
             # Отправляем изображение
             await message.answer_photo(
@@ -207,9 +372,16 @@ class AgentCoordinator:
             except Exception as e:
                 self.logger.error(f"Error removing temporary file: {str(e)}")
                 
+        except GenerationCancelled:
+            if progress:
+                await progress.cleanup()
+            await self.sender.answer(message, "⏹ Генерация изображения отменена.")
         except Exception as e:
             self.logger.error(f"Error in generate_image: {str(e)}")
-            await message.answer("Произошла ошибка при генерации изображения. Попробуйте еще раз.")
+            await self.sender.answer(message, "Произошла ошибка при генерации изображения. Попробуйте еще раз.")
+        finally:
+            if self._generation_cancel_events.get(key) is cancel_event:
+                del self._generation_cancel_events[key]
         
     async def start(self):
         """Запуск координатора агентов (минимальный)"""
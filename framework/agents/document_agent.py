@@ -3,6 +3,7 @@ import json
 import logging
 from typing import Dict, Any
 from framework.agents.base import BaseAgent
+from framework.services.llm_scheduler import priority, BACKGROUND
 
 class DocumentAgent(BaseAgent):
     """Агент для обработки документов"""
@@ -27,12 +28,13 @@ class DocumentAgent(BaseAgent):
                     "text": "Произошла ошибка: не удалось получить содержимое документа"
                 }
 
-            # Анализируем документ с помощью модели
-            response = await self.think(
-                f"Analyze document content: {content}",
-                chat_id,
-                message_id
-            )
+            # Анализируем документ с помощью модели; длинный анализ не должен задерживать чат
+            with priority(BACKGROUND):
+                response = await self.think(
+                    f"Analyze document content: {content}",
+                    chat_id,
+                    message_id
+                )
             if not response or not isinstance(response, dict):
                 return {
                     "action": "send_message",
@@ -51,7 +53,8 @@ class DocumentAgent(BaseAgent):
         """Анализ документа"""
         try:
             prompt = self._create_document_analysis_prompt(file_id)
-            response = await self.ollama_client.generate(prompt)
+            with priority(BACKGROUND):
+                response = await self.ollama_client.generate(prompt)
             if not response:
                 return {
                     "action": "send_message",
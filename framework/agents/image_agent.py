@@ -3,28 +3,36 @@ import json
 import base64
 from typing import Dict, Any, Optional
 from framework.agents.base import BaseAgent
-from framework.agents.message_agent import MessageAgent
-from framework.ollama_client import ollama_client
+from framework.services.circuit_breaker import CircuitOpenError
+from framework.services.executor import get_executor
+from framework.services.tracing import traced
+from framework.utils.text import contains_cyrillic
 
 logger = logging.getLogger(__name__)
 
+
+def _encode_image(image_bytes: bytes) -> str:
+    # b64encode не вставляет переводы строк, результат уже готов для Ollama
+    return base64.b64encode(image_bytes).decode('ascii')
+
+
 class ImageAgent(BaseAgent):
     """Агент для обработки изображений"""
     
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.model_name = config.get('models', {}).get('image', config.get('models', {}).get('default', 'gemma3:12b'))
-        self.message_agent = MessageAgent(config)
         self.max_retries = 3  # Максимальное количество попыток генерации на русском
         
     def _is_russian(self, text: str) -> bool:
         """Проверяет, содержит ли текст хотя бы одну кириллическую букву"""
-        return any('а' <= char.lower() <= 'я' for char in text)
+        return contains_cyrillic(text)
         
+    @traced("image_agent.process_image")
     async def process_image(self, image_content: bytes, user_id: int, message_id: int) -> Dict[str, Any]:
         """Обработка изображения"""
         try:
-            logger.info(f"Начало обработки изображения от пользователя {user_id}")
+            logger.info("Начало обработки изображения от пользователя %s", user_id)
             
             # Проверяем содержимое изображения
             if not image_content:
@@ -46,10 +54,10 @@ class ImageAgent(BaseAgent):
                     continue
                 
                 if analysis:
-                    self._add_to_memory(0, "user", "Пользователь отправил изображение")
-                    self._add_to_memory(0, "assistant", analysis)
+                    await self._add_to_memory(0, "user", "Пользователь отправил изображение")
+                    await self._add_to_memory(0, "assistant", analysis)
                     logger.info("Изображение успешно проанализировано")
-                    logger.debug(f"Ответ для пользователя:\n{analysis}")
+                    logger.debug("Ответ для пользователя:\n%s", analysis)
                     return {"action": "send_message", "text": analysis}
             
             # Если все попытки исчерпаны
@@ -59,6 +67,10 @@ class ImageAgent(BaseAgent):
                 "text": "Извините, у меня возникли проблемы с описанием изображения на русском языке. Давайте попробуем еще раз! 🌟"
             }
             
+        except CircuitOpenError:
+            # Повторные попытки бессмысленны, пока Ollama недоступна
+            logger.warning("Ollama недоступна, изображение не проанализировано")
+            return self._unavailable_response(unavailable=True)
         except Exception as e:
             logger.error(f"Ошибка при обработке изображения: {str(e)}", exc_info=True)
             return {
@@ -66,6 +78,7 @@ class ImageAgent(BaseAgent):
                 "text": "Ой-ой! 😱 Что-то пошло не так при анализе картинки. Давай попробуем еще раз! 🌟"
             }
             
+    @traced("image_agent.think")
     async def think(self, image_content: bytes) -> Optional[str]:
         """Анализ изображения с помощью модели"""
         try:
@@ -79,7 +92,7 @@ class ImageAgent(BaseAgent):
             
             # Проверяем размер изображения
             content_size = len(image_bytes)
-            logger.info(f"Размер изображения: {content_size} байт")
+            logger.info("Размер изображения: %s байт", content_size)
             
             if content_size > 1024 * 1024:  # Если больше 1MB
                 logger.warning("Изображение слишком большое, попытка сжатия")
@@ -87,14 +100,16 @@ class ImageAgent(BaseAgent):
             
             # Конвертируем изображение в base64
             try:
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8').replace('\n', '').replace('\r', '').strip()
-                logger.info(f"Изображение успешно конвертировано в base64, размер: {len(image_base64)}")
+                image_base64 = await get_executor(self.config).run_in_thread(
+                    _encode_image, image_bytes, name="image_base64", size=content_size
+                )
+                logger.info("Изображение успешно конвертировано в base64, размер: %s", len(image_base64))
             except Exception as e:
                 logger.error(f"Ошибка при конвертации в base64: {str(e)}")
                 return None
             
             prompt_text ="\nИспользуя изображение, переданное через параметр 'image', опиши, что на нем изображено. Ответ должен содержать уникальное и подробное описание изображения, без шаблонных фраз. Обязательно отвечай только на русском языке!"
-            response = await ollama_client.generate_with_image(
+            response = await self.ollama_client.generate_with_image(
                 prompt=prompt_text,
                 image=image_base64
             )
@@ -108,11 +123,12 @@ class ImageAgent(BaseAgent):
             cleaned_response = cleaned_response.replace("<br/>", "\n").replace("<br />", "\n")
             
             # Логируем часть ответа (первые 200 символов)
-            preview = cleaned_response[:200] + "..." if len(cleaned_response) > 200 else cleaned_response
-            logger.info(f"Предпросмотр ответа модели:\n{preview}")
+            logger.info("Предпросмотр ответа модели:\n%.200s", cleaned_response)
             
             return cleaned_response
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             logger.error(f"Ошибка при анализе изображения: {str(e)}", exc_info=True)
             return None 
\ No newline at end of file
@@ -1,52 +1,36 @@
 import logging
 from typing import Optional
-import re
 from framework.agents.base import BaseAgent
-from framework.utils.logger import setup_logger
+from framework.services.executor import get_executor
+from framework.services.intent_router import match_image_request
+from framework.services.llm_scheduler import priority, BACKGROUND
+from framework.utils.text import clean_prompt, contains_cyrillic
 
 logger = logging.getLogger(__name__)
 
 class PromptAgent(BaseAgent):
     """Агент для обработки промптов и их перевода"""
     
-    def __init__(self, config: dict, ollama_client):
-        super().__init__(config, ollama_client)
-        self.logger = setup_logger()
+    def __init__(self, config: dict, ollama_client=None):
+        super().__init__(config, ollama_client=ollama_client)
+        self.logger = logging.getLogger(__name__)
         
     def is_russian(self, text: str) -> bool:
         """Проверяет, содержит ли текст русские буквы"""
-        return any(ord(c) in range(1040, 1104) for c in text)
+        return contains_cyrillic(text)
     
     def clean_text(self, text: str) -> str:
         """Очищает текст от русских букв и эмодзи"""
-        # Удаляем эмодзи
-        emoji_pattern = re.compile("["
-            u"\U0001F600-\U0001F64F"  # эмодзи
-            u"\U0001F300-\U0001F5FF"  # символы и пиктограммы
-            u"\U0001F680-\U0001F6FF"  # транспорт и символы
-            u"\U0001F1E0-\U0001F1FF"  # флаги
-            u"\U00002702-\U000027B0"
-            u"\U000024C2-\U0001F251"
-            "]+", flags=re.UNICODE)
-        text = emoji_pattern.sub(r'', text)
-        
-        # Удаляем русские буквы
-        text = ''.join(c for c in text if ord(c) not in range(1040, 1104))
-        
-        # Удаляем лишние пробелы
-        text = ' '.join(text.split())
-        
-        return text.strip()
+        return clean_prompt(text)
+    
+    async def _clean_text_offloaded(self, text: str) -> str:
+        """clean_text в пуле потоков (короткие промпты очищаются сразу)"""
+        return await get_executor(self.config).run_in_thread(self.clean_text, text, name="clean_text", size=len(text))
     
     def extract_prompt(self, text: str) -> Optional[str]:
-        """Извлекает промпт из текста, убирая ключевые слова"""
-        keywords = ['нарисуй', 'сгенерируй', 'создай', 'generate', 'draw', 'create']
-        text = text.lower()
-        
-        for keyword in keywords:
-            if keyword in text:
-                return text[text.find(keyword) + len(keyword):].strip()
-        return None
+        """Извлекает промпт из текста, убирая слова-триггеры (см. IntentRouter)"""
+        match = match_image_request(text)
+        return match.prompt if match else None
     
     async def translate_prompt(self, text: str) -> Optional[str]:
         """Переводит промпт на английский язык"""
@@ -57,7 +41,14 @@ class PromptAgent(BaseAgent):
                 "Focus on visual elements. "
                 "Text to translate: " + text
             )
-            translated = await self.ollama_client.generate(prompt)
+            # Перевод - чистая функция от текста, поэтому кэшируем его;
+            # ответы в чатах важнее, а генерация картинки всё равно дольше перевода
+            with priority(BACKGROUND):
+                translated = await self.ollama_client.generate(
+                    prompt,
+                    options=self.DETERMINISTIC_OPTIONS,
+                    cache=True
+                )
             return translated.strip()
         except Exception as e:
             self.logger.error(f"Error translating prompt: {str(e)}")
@@ -75,11 +66,11 @@ class PromptAgent(BaseAgent):
             if self.is_russian(prompt):
                 translated = await self.translate_prompt(prompt)
                 if translated:
-                    return self.clean_text(translated)
+                    return await self._clean_text_offloaded(translated)
                 return None
                 
             # Очищаем английский промпт
-            return self.clean_text(prompt)
+            return await self._clean_text_offloaded(prompt)
             
         except Exception as e:
             self.logger.error(f"Error processing prompt: {str(e)}")
@@ -0,0 +1,91 @@
+import importlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+from framework.agents.base import BaseAgent
+from framework.ollama_client import OllamaClient, ollama_client as default_ollama_client
+from framework.services.shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+class AgentRegistry:
+    """Единый набор агентов для всех точек входа бота.
+
+    Каждый агент создаётся один раз, при первом обращении, и все агенты
+    работают через один клиент Ollama - с общим кэшем моделей, кэшем ответов
+    и очередью запросов. Модули агентов импортируются тоже при первом обращении.
+    """
+
+    # Имя агента -> "модуль:класс"
+    AGENTS = {
+        'message': "framework.agents.message_agent:MessageAgent",
+        'image': "framework.agents.image_agent:ImageAgent",
+        'think': "framework.agents.think_agent:ThinkAgent",
+        'prompt': "framework.agents.prompt_agent:PromptAgent",
+        'document': "framework.agents.document_agent:DocumentAgent",
+        'web_search': "framework.agents.web_search_agent:WebSearchAgent",
+        'web_browser': "framework.agents.web_browser_agent:WebBrowserAgent",
+    }
+
+    def __init__(self, config: Dict[str, Any], ollama_client: Optional[OllamaClient] = None):
+        """
+        Args:
+            config: Конфигурация бота
+            ollama_client: Клиент Ollama для всех агентов (по умолчанию общий клиент модуля)
+        """
+        self.config = config
+        self.ollama_client = ollama_client or default_ollama_client
+        self._agents: Dict[str, BaseAgent] = {}
+        self._store: Optional[SharedStore] = None
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> Optional[SharedStore]:
+        """Общее хранилище памяти агентов (SharedStore)"""
+        return self._store
+
+    @store.setter
+    def store(self, store: Optional[SharedStore]) -> None:
+        self._store = store
+        for agent in self._agents.values():
+            agent.store = store
+
+    def get(self, name: str) -> BaseAgent:
+        """Возвращает агента, создавая его при первом обращении"""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self.AGENTS:
+            raise ValueError(f"Неизвестный агент: {name}")
+        with self._lock:
+            agent = self._agents.get(name)
+            if agent is None:
+                module_name, class_name = self.AGENTS[name].split(":")
+                agent_class = getattr(importlib.import_module(module_name), class_name)
+                agent = agent_class(self.config)
+                agent.ollama_client = self.ollama_client
+                agent.store = self._store
+                self._agents[name] = agent
+                logger.debug(f"Создан агент {name}")
+        return agent
+
+    __getitem__ = get
+
+    def peek(self, name: str) -> Optional[BaseAgent]:
+        """Агент, если он уже создан; сам не создаёт"""
+        return self._agents.get(name)
+
+    def created(self) -> List[BaseAgent]:
+        """Уже созданные агенты"""
+        return list(self._agents.values())
+
+
+_registry: Optional[AgentRegistry] = None
+
+
+def get_registry(config: Dict[str, Any]) -> AgentRegistry:
+    """Общий реестр агентов процесса; создаётся при первом вызове"""
+    global _registry
+    if _registry is None:
+        _registry = AgentRegistry(config)
+    return _registry
@@ -1,6 +1,9 @@
 import logging
 from typing import Dict, Any, Optional
 from framework.agents.base import BaseAgent
+from framework.services.circuit_breaker import CircuitOpenError
+from framework.services.tracing import traced
+from framework.utils.text import is_mostly_latin
 
 logger = logging.getLogger(__name__)
 
@@ -12,13 +15,21 @@ class ThinkAgent(BaseAgent):
         self.model_name = config.get('models', {}).get('think', config.get('models', {}).get('default', 'gemma3:12b'))
         self.logger = logging.getLogger(__name__)
         
-    async def think(self, message: str) -> Optional[str]:
-        """Анализ сообщения и генерация ответа"""
+    @traced("think_agent.think")
+    async def think(self, message: str, options: Optional[Dict[str, Any]] = None,
+                    cache: bool = False) -> Optional[str]:
+        """Анализ сообщения и генерация ответа
+
+        Args:
+            message: Текст сообщения
+            options: Параметры генерации Ollama
+            cache: Кэшировать ответ (только для детерминированных options)
+        """
         try:
             self.logger.info("Начало анализа сообщения")
             
             # Добавляем сообщение в память
-            self._add_to_memory(0, "user", message)
+            await self._add_to_memory(0, "user", message)
             
             # Формируем промпт с учетом контекста
             system_prompt = (
@@ -33,9 +44,12 @@ class ThinkAgent(BaseAgent):
             )
             
             # Получаем ответ от модели
+            memory_context = await self.get_memory_context()
             response = await self.ollama_client.generate(
-                f"{system_prompt}\n\nКонтекст предыдущих сообщений:\n{self.get_memory_context()}\n\nТекущее сообщение:\n{message}",
-                self.model_name
+                f"{system_prompt}\n\nКонтекст предыдущих сообщений:\n{memory_context}\n\nТекущее сообщение:\n{message}",
+                self.model_name,
+                options=options,
+                cache=cache
             )
             
             if not response:
@@ -46,13 +60,15 @@ class ThinkAgent(BaseAgent):
             cleaned_response = response.replace("<br>", "\n").replace("</br>", "\n")
             cleaned_response = cleaned_response.replace("<br/>", "\n").replace("<br />", "\n")
             
-            # Проверяем, что ответ на русском языке
-            if any(ord(char) < 128 for char in ''.join(cleaned_response.split())):
+            # Проверяем, что ответ на русском языке: отдельные латинские слова допустимы
+            if is_mostly_latin(cleaned_response):
                 self.logger.warning("Обнаружен ответ с английскими символами")
                 # Пробуем еще раз с более строгим промптом
                 response = await self.ollama_client.generate(
                     f"{system_prompt}\n\nОТВЕЧАЙ ТОЛЬКО НА РУССКОМ ЯЗЫКЕ!\n\nСообщение:\n{message}",
-                    self.model_name
+                    self.model_name,
+                    options=options,
+                    cache=cache
                 )
                 if not response:
                     return None
@@ -60,14 +76,17 @@ class ThinkAgent(BaseAgent):
                 cleaned_response = cleaned_response.replace("<br/>", "\n").replace("<br />", "\n")
             
             # Добавляем ответ в память
-            self._add_to_memory(0, "assistant", cleaned_response)
+            await self._add_to_memory(0, "assistant", cleaned_response)
             
-            # Логируем часть ответа
-            preview = cleaned_response[:200] + "..." if len(cleaned_response) > 200 else cleaned_response
-            self.logger.info(f"Сгенерирован ответ:\n{preview}")
+            # Логируем часть ответа; %.200s обрезает строку, только если запись попадёт в лог
+            self.logger.info("Сгенерирован ответ:\n%.200s", cleaned_response)
             
             return cleaned_response
             
+        except CircuitOpenError:
+            # Ollama недоступна: сразу отвечаем фразой из характера бота
+            self.logger.warning("Ollama недоступна, ответ не сгенерирован")
+            return self._get_random_error()
         except Exception as e:
             self.logger.error(f"Ошибка при анализе сообщения: {str(e)}", exc_info=True)
             return None 
\ No newline at end of file
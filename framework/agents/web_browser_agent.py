@@ -1,8 +1,9 @@
 import logging
 from typing import Dict, Any, Optional
 import aiohttp
-from bs4 import BeautifulSoup
 from .base import BaseAgent
+from framework.services.executor import get_executor
+from framework.utils.html_parsing import parse_page
 import os
 from urllib.parse import urlparse, urljoin
 import json
@@ -27,10 +28,10 @@ class WebBrowserAgent(BaseAgent):
             async with aiohttp.ClientSession() as session:
                 async with session.get(url, headers=self.headers) as response:
                     html = await response.text()
-            soup = BeautifulSoup(html, "html.parser")
-            title = soup.title.string if soup.title else ""
-            content = soup.get_text(separator="\n")
-            return {"title": title, "content": content}
+            # Разбор страницы - чистый Python, выполняется в пуле процессов
+            return await get_executor(self.config).run_in_process(
+                parse_page, html, name="parse_page", size=len(html)
+            )
         except Exception as e:
             logger.error(f"Ошибка при получении страницы: {e}")
             raise
@@ -53,9 +54,14 @@ class WebBrowserAgent(BaseAgent):
                     "text": "Не удалось получить содержимое страницы"
                 }
 
+            # Текст большой страницы сериализуется в пуле потоков
+            page_json = await get_executor(self.config).run_in_thread(
+                json.dumps, page_content, name="json_dumps", size=len(page_content["content"])
+            )
+
             # Анализируем содержимое с помощью модели
             response = await self.think(
-                f"Analyze webpage content: {json.dumps(page_content)}",
+                f"Analyze webpage content: {page_json}",
                 chat_id,
                 message_id
             )
@@ -1,8 +1,10 @@
 import logging
 from typing import Dict, Any, List
 import aiohttp
-from bs4 import BeautifulSoup
 from .base import BaseAgent
+from framework.services.executor import get_executor
+from framework.services.llm_scheduler import priority, BACKGROUND
+from framework.utils.html_parsing import parse_search_results
 import json
 
 logger = logging.getLogger(__name__)
@@ -25,19 +27,10 @@ class WebSearchAgent(BaseAgent):
                 params = {'q': query}
                 async with session.get(self.search_engine, headers=self.headers, params=params) as response:
                     html = await response.text()
-            soup = BeautifulSoup(html, 'html.parser')
-            results = []
-            # Пробуем найти ссылки выдачи
-            for a in soup.find_all('a', href=True):
-                href = a['href']
-                if href.startswith('/url?q='):
-                    actual_url = href.split('/url?q=')[1].split('&')[0]
-                    title = a.get_text().strip()
-                    if title and actual_url:
-                        results.append({"title": title, "url": actual_url})
-                if len(results) >= limit:
-                    break
-            return results
+            # Разбор страницы выдачи - чистый Python, выполняется в пуле процессов
+            return await get_executor(self.config).run_in_process(
+                parse_search_results, html, limit, name="parse_search_results", size=len(html)
+            )
         except Exception as e:
             logger.error(f"Ошибка при поиске: {e}")
             raise
@@ -53,12 +46,15 @@ class WebSearchAgent(BaseAgent):
                     "text": "По вашему запросу ничего не найдено"
                 }
 
-            # Анализируем результаты с помощью модели
-            response = await self.think(
-                f"Analyze search results: {json.dumps(search_results)}",
-                chat_id,
-                message_id
-            )
+            # Анализируем результаты с помощью модели; сводка по одинаковой выдаче кэшируется
+            with priority(BACKGROUND):
+                response = await self.think(
+                    f"Analyze search results: {json.dumps(search_results)}",
+                    chat_id,
+                    message_id,
+                    options=self.DETERMINISTIC_OPTIONS,
+                    cache=True
+                )
             return response
 
         except Exception as e:
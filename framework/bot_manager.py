@@ -6,6 +6,11 @@ from aiogram.enums import ParseMode
 from aiogram.filters import Command
 from aiogram.client.default import DefaultBotProperties
 from framework.handlers.message_handlers import MessageHandlers
+from framework.services.message_sender import MessageSender
+from framework.services.update_dedup import UpdateDeduplicator
+from framework.handlers.middlewares import DedupMiddleware, GroupFilterMiddleware, MetricsMiddleware, TracingMiddleware
+from framework.services.webhook_server import WebhookServer
+from framework.services.tracing import tracer
 
 class BotManager:
     _instance = None
@@ -23,6 +28,8 @@ class BotManager:
             self.bot: Optional[Bot] = None
             self.dp: Optional[Dispatcher] = None
             self._handlers: Optional[MessageHandlers] = None
+            self._webhook: Optional[WebhookServer] = None
+            self._dedup: Optional[UpdateDeduplicator] = None
             BotManager._initialized = True
     
     async def initialize(self) -> None:
@@ -53,6 +60,7 @@ class BotManager:
                 self._handlers = MessageHandlers(self.config)
                 # Устанавливаем бота в обработчики
                 self._handlers.bot = self.bot
+                self._handlers.sender = MessageSender.from_config(self.config, self.bot)
             except Exception as e:
                 self.logger.error(f"Failed to initialize message handlers: {e}")
                 raise
@@ -80,6 +88,15 @@ class BotManager:
             
         try:
             self.logger.info("Начало регистрации обработчиков...")
+
+            # Повторно доставленные сообщения не обрабатываются дважды
+            # Необращённые к боту сообщения в группах отбрасываются раньше всех остальных шагов
+            self.dp.message.outer_middleware(GroupFilterMiddleware(self._handlers.group_filter))
+            self._dedup = UpdateDeduplicator.from_config(self.config)
+            self.dp.message.outer_middleware(DedupMiddleware(self._dedup))
+            self.dp.message.middleware(MetricsMiddleware())
+            tracer.configure(self.config)
+            self.dp.update.outer_middleware(TracingMiddleware())
             
             # Регистрируем обработчики команд
             self.logger.debug("Регистрация обработчиков команд")
@@ -159,10 +176,14 @@ class BotManager:
             
         try:
             self.logger.info("Starting bot...")
-            await self.dp.start_polling(
-                self.bot,
-                allowed_updates=self.dp.resolve_used_update_types()
-            )
+            if WebhookServer.is_enabled(self.config):
+                self._webhook = WebhookServer.from_config(self.config, self.dp, self.bot)
+                await self._webhook.serve_forever()
+            else:
+                await self.dp.start_polling(
+                    self.bot,
+                    allowed_updates=self.dp.resolve_used_update_types()
+                )
         except Exception as e:
             self.logger.error(f"Error while running bot: {e}")
             await self.stop()
@@ -173,8 +194,18 @@ class BotManager:
         if self.dp:
             try:
                 self.logger.info("Stopping bot...")
-                await self.dp.stop_polling()
+                if self._webhook is not None:
+                    await self._webhook.stop()
+                    self._webhook = None
+                else:
+                    await self.dp.stop_polling()
                 
+                if self._handlers and self._handlers.sender:
+                    await self._handlers.sender.close()
+
+                if self._dedup is not None:
+                    self._dedup.save()
+
                 if self.bot:
                     await self.bot.session.close()
                     
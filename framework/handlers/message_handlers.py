@@ -6,13 +6,10 @@ from aiogram import types
 from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 from aiogram.enums import ChatType
-from framework.agents.base import BaseAgent
-from framework.agents.message_agent import MessageAgent
-from framework.agents.image_agent import ImageAgent
-from framework.agents.document_agent import DocumentAgent
-from framework.agents.web_search_agent import WebSearchAgent
-from framework.agents.web_browser_agent import WebBrowserAgent
+from framework.agents.registry import AgentRegistry, get_registry
 from framework.services.file_service import FileService
+from framework.services.group_filter import GroupFilter
+from framework.services.llm_scheduler import priority, priority_for_chat, INTERACTIVE, GROUP
 from framework.utils.logger import setup_logger
 
 # Настраиваем логгер
@@ -21,18 +18,26 @@ logger = logging.getLogger(__name__)
 class MessageHandlers:
     """Обработчики сообщений для бота"""
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], registry: Optional[AgentRegistry] = None):
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.file_service = FileService(config)
         self.bot = None  # Будет установлен позже из BotManager
-        self.agents = {
-            'document': DocumentAgent(config),
-            'image': ImageAgent(config),
-            'web_search': WebSearchAgent(config),
-            'web_browser': WebBrowserAgent(config),
-            'message': MessageAgent(config)
-        }
+        self.sender = None  # Очередь исходящих сообщений, устанавливается из BotManager
+        # Агенты общие с остальными точками входа и создаются при первом обращении
+        self.agents = registry or get_registry(config)
+        # Обращение к боту в группах; тот же фильтр использует GroupFilterMiddleware
+        self.group_filter = GroupFilter.from_config(config)
+
+    async def _reply(self, message: Message, text: str) -> None:
+        """Отправляет ответ: в группе - цитированием, в личном чате - обычным сообщением"""
+        reply = message.chat.type != ChatType.PRIVATE
+        if self.sender is not None:
+            await self.sender.answer(message, text, reply=reply)
+        elif reply:
+            await message.reply(text)
+        else:
+            await message.answer(text)
 
     async def handle_command_start(self, message: Message, command: CommandObject) -> Dict[str, Any]:
         """Обработка команды /start"""
@@ -42,10 +47,7 @@ class MessageHandlers:
                    "- Искать информацию в интернете\n"
                    "Просто отправьте мне сообщение, фото или документ!")
         
-        if message.chat.type != ChatType.PRIVATE:
-            await message.reply(response)
-        else:
-            await message.answer(response)
+        await self._reply(message, response)
         return {"action": "send_message", "text": response}
 
     async def handle_command_help(self, message: Message, command: CommandObject) -> Dict[str, Any]:
@@ -55,10 +57,7 @@ class MessageHandlers:
                    "/help - Показать это сообщение\n"
                    "/search <запрос> - Поиск в интернете")
         
-        if message.chat.type != ChatType.PRIVATE:
-            await message.reply(response)
-        else:
-            await message.answer(response)
+        await self._reply(message, response)
         return {"action": "send_message", "text": response}
 
     async def handle_command_search(self, message: Message, command: CommandObject) -> Dict[str, Any]:
@@ -74,23 +73,23 @@ class MessageHandlers:
                 self.logger.error(f"Ошибка при выполнении поиска: {str(e)}")
                 response = "Ошибка при выполнении поиска"
         
-        if message.chat.type != ChatType.PRIVATE:
-            await message.reply(response)
-        else:
-            await message.answer(response)
+        await self._reply(message, response)
         return {"action": "send_message", "text": response}
 
     async def handle_message(self, message: Message) -> Dict[str, Any]:
         """Обработка текстового сообщения"""
         if message.chat.type == ChatType.PRIVATE:
-            return await self.handle_private_message(message)
+            with priority(INTERACTIVE):
+                return await self.handle_private_message(message)
         else:
-            return await self.handle_group_message(message)
+            with priority(GROUP):
+                return await self.handle_group_message(message)
         
     async def handle_private_message(self, message: Message) -> None:
         """Обработка приватных сообщений"""
         try:
-            logger.info(f"Получено приватное сообщение: {message.text}")
+            logger.info("Получено приватное сообщение от %s", message.from_user.id)
+            logger.debug("Текст сообщения: %s", message.text)
             
             # Обрабатываем сообщение через агента
             response = await self.agents['message'].process_message(
@@ -100,7 +99,7 @@ class MessageHandlers:
             )
             
             # Отправляем ответ
-            await message.answer(response)
+            await self._reply(message, response)
             
         except Exception as e:
             logger.error(f"Ошибка при обработке приватного сообщения: {str(e)}")
@@ -114,15 +113,12 @@ class MessageHandlers:
                 return
 
             # Удаляем упоминание бота из текста
-            text = message.text
-            bot_username = self.config['bot']['username']
-            bot_name = self.config['bot']['name']
-            text = text.replace(f"@{bot_username}", "").replace(bot_name, "").strip()
+            text = self.group_filter.strip_address(message.text) or message.text
 
             # Обрабатываем сообщение
             response = await self.agents['message'].process_message(text, message.from_user.id, message.chat.id)
             if response and response.get('text'):
-                await message.reply(response['text'])
+                await self._reply(message, response['text'])
 
         except Exception as e:
             logger.error(f"Ошибка при обработке группового сообщения: {e}")
@@ -131,7 +127,7 @@ class MessageHandlers:
     async def handle_photo(self, message: Message) -> None:
         """Обработка фотографий"""
         try:
-            logger.info(f"Получено фото от пользователя {message.from_user.id} в чате {message.chat.id}")
+            logger.info("Получено фото от пользователя %s в чате %s", message.from_user.id, message.chat.id)
             
             if not self.bot:
                 logger.error("Бот не инициализирован в MessageHandlers")
@@ -150,11 +146,12 @@ class MessageHandlers:
                 
             # Обрабатываем фото через ImageAgent
             try:
-                response = await self.agents['image'].process_image(
-                    photo_data['content'],
-                    message.from_user.id,
-                    message.message_id
-                )
+                with priority(priority_for_chat(message.chat.id)):
+                    response = await self.agents['image'].process_image(
+                        photo_data['content'],
+                        message.from_user.id,
+                        message.message_id
+                    )
                 
                 if not response or 'text' not in response:
                     logger.error("Получен некорректный ответ от ImageAgent")
@@ -162,13 +159,13 @@ class MessageHandlers:
                     return
                     
                 logger.info("Отправка успешного ответа пользователю")
-                logger.debug(f"Текст ответа:\n{response['text']}")
+                logger.debug("Текст ответа:\n%s", response['text'])
                 
                 # Отправляем ответ, заменяя HTML-теги на обычные переносы строк
                 text = response['text'].replace("<br>", "\n").replace("</br>", "\n")
                 text = text.replace("<br/>", "\n").replace("<br />", "\n")
                 
-                await message.answer(text)
+                await self._reply(message, text)
                 
             except Exception as e:
                 logger.error(f"Ошибка при обработке изображения: {str(e)}", exc_info=True)
@@ -191,17 +188,11 @@ class MessageHandlers:
             
             if not doc_data:
                 error_message = "Ой-ой! 😅 Слайм не видит документ. Пожалуйста, отправьте файл еще раз! 📄"
-                if message.chat.type != 'private':
-                    await message.reply(error_message)
-                else:
-                    await message.answer(error_message)
+                await self._reply(message, error_message)
                 return
                 
             if 'error' in doc_data:
-                if message.chat.type != 'private':
-                    await message.reply(doc_data['message'])
-                else:
-                    await message.answer(doc_data['message'])
+                await self._reply(message, doc_data['message'])
                 return
 
             # Отправляем сообщение о начале обработки
@@ -209,11 +200,12 @@ class MessageHandlers:
             sent_message = await message.answer(processing_message) if message.chat.type == 'private' else await message.reply(processing_message)
 
             # Обрабатываем документ через DocumentAgent
-            response = await self.agents['document'].process_document(
-                doc_data['content'],
-                message.from_user.id,
-                message.chat.id
-            )
+            with priority(priority_for_chat(message.chat.id)):
+                response = await self.agents['document'].process_document(
+                    doc_data['content'],
+                    message.from_user.id,
+                    message.chat.id
+                )
             
             # Удаляем сообщение о процессе обработки
             try:
@@ -222,45 +214,25 @@ class MessageHandlers:
                 self.logger.warning(f"Не удалось удалить сообщение о процессе: {e}")
             
             if response and response.get('text'):
-                if message.chat.type != 'private':
-                    await message.reply(response['text'])
-                else:
-                    await message.answer(response['text'])
+                await self._reply(message, response['text'])
             else:
                 error_message = "Ой-ой! 😢 Слайм не смог обработать документ. Может быть, попробуем другой? 📄"
-                if message.chat.type != 'private':
-                    await message.reply(error_message)
-                else:
-                    await message.answer(error_message)
+                await self._reply(message, error_message)
 
         except Exception as e:
             logger.error(f"Ошибка при обработке документа: {e}")
             error_message = "Произошла ошибка при обработке документа. Попробуйте позже."
-            if message.chat.type != 'private':
-                await message.reply(error_message)
-            else:
-                await message.answer(error_message)
+            await self._reply(message, error_message)
         
     def _is_group_allowed(self, chat_id: int) -> bool:
         """Проверка, разрешена ли группа"""
-        allowed_groups = self.config['bot'].get('allowed_groups', [])
-        return not allowed_groups or chat_id in allowed_groups
+        return self.group_filter.is_allowed(chat_id)
         
     async def _is_bot_mentioned(self, message: Message) -> bool:
-        """Проверка упоминания бота в сообщении"""
-        if not message.text and not message.caption:
-            return False
-
-        text = message.text or message.caption
-        bot_username = self.config['bot']['username']
-        bot_name = self.config['bot']['name']
-
-        # Проверяем упоминание в тексте
-        text_lower = text.lower()
-        return (
-            f"@{bot_username}".lower() in text_lower or
-            bot_name.lower() in text_lower
-        )
+        """Проверка обращения к боту (см. GroupFilter)"""
+        if not self.group_filter.resolved and self.bot:
+            await self.group_filter.resolve(self.bot)
+        return self.group_filter.decide(message)[0]
         
     async def _remove_bot_mention(self, message: Message) -> str:
         """Удаление упоминания бота из текста"""
@@ -0,0 +1,108 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+from aiogram import BaseMiddleware
+from aiogram.types import Message, TelegramObject, Update
+from framework.services.metrics import metrics
+from framework.services.tracing import tracer
+from framework.services.group_filter import GROUP_CHAT_TYPES, GroupFilter
+from framework.services.update_dedup import UpdateDeduplicator
+
+logger = logging.getLogger(__name__)
+
+HANDLER_SECONDS = metrics.histogram("bot_handler_seconds", "Время обработки обновления", ("handler",))
+HANDLER_UPDATES = metrics.counter("bot_handler_updates_total", "Обработанные обновления", ("handler", "status"))
+HANDLER_IN_PROGRESS = metrics.gauge("bot_handler_in_progress", "Обновления в обработке", ("handler",))
+GROUP_MESSAGES = metrics.counter("group_messages_total", "Сообщения в группах по решению фильтра обращений", ("decision",))
+
+class DedupMiddleware(BaseMiddleware):
+    """Пропускает сообщения, которые уже обработаны или обрабатываются.
+
+    Повторы возникают при повторной доставке вебхука, перезапуске рабочего
+    процесса и перезапуске бота. Регистрируется как outer-middleware сообщений.
+    """
+
+    def __init__(self, deduplicator: UpdateDeduplicator):
+        self.deduplicator = deduplicator
+
+    async def __call__(self, handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+                       event: Message, data: Dict[str, Any]) -> Any:
+        chat_id, message_id = event.chat.id, event.message_id
+        if not await self.deduplicator.claim(chat_id, message_id):
+            logger.info("Повторное сообщение %s в чате %s пропущено", message_id, chat_id)
+            return None
+        try:
+            result = await handler(event, data)
+        except BaseException:
+            await self.deduplicator.release(chat_id, message_id)
+            raise
+        await self.deduplicator.complete(chat_id, message_id)
+        return result
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Замеряет время и результат работы каждого обработчика.
+
+    Регистрируется как inner-middleware: обработчик к этому моменту уже выбран
+    фильтрами, и метки содержат имя его функции.
+    """
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        started = time.perf_counter()
+        status = "error"
+        try:
+            with HANDLER_IN_PROGRESS.track_inprogress(handler=name):
+                result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+            HANDLER_UPDATES.inc(handler=name, status=status)
+
+
+class TracingMiddleware(BaseMiddleware):
+    """Открывает трассу на каждое обновление.
+
+    Регистрируется как outer-middleware обновлений (dp.update), поэтому
+    трасса покрывает дедупликацию, фильтры и обработчик. Идентификатор трассы
+    доступен ниже через contextvars (tracer.current_span()).
+    """
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        if not tracer.enabled:
+            return await handler(event, data)
+        attributes: Dict[str, Any] = {"update.id": event.update_id, "update.type": event.event_type}
+        chat = getattr(event.event, "chat", None)
+        if chat is not None:
+            attributes["chat.id"] = chat.id
+            attributes["chat.type"] = chat.type
+        with tracer.start_trace("telegram.update", **attributes):
+            return await handler(event, data)
+
+
+class GroupFilterMiddleware(BaseMiddleware):
+    """Отбрасывает сообщения в группах, не обращённые к боту.
+
+    Регистрируется как outer-middleware сообщений раньше DedupMiddleware:
+    сообщения, на которые бот не ответит, не доходят ни до фильтров
+    обработчиков, ни до хранилища повторов, ни до агентов.
+    """
+
+    def __init__(self, group_filter: GroupFilter):
+        self.group_filter = group_filter
+
+    async def __call__(self, handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
+                       event: Message, data: Dict[str, Any]) -> Any:
+        if event.chat.type not in GROUP_CHAT_TYPES:
+            return await handler(event, data)
+        if not self.group_filter.resolved:
+            await self.group_filter.resolve(data["bot"])
+        accepted, decision = self.group_filter.decide(event)
+        GROUP_MESSAGES.inc(decision=decision)
+        if not accepted:
+            return None
+        return await handler(event, data)
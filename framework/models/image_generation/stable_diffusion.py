@@ -1,11 +1,20 @@
-import torch
-from diffusers import StableDiffusionPipeline, DDIMScheduler
 from PIL import Image
+import asyncio
+import gc
 import io
 import logging
 import os
+import sys
+import threading
 import time
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional
+from framework.services.metrics import metrics
+from framework.services.tracing import traced, tracer
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
 
 # Отключаем предупреждения о символических ссылках
 os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
@@ -14,6 +23,15 @@ os.environ["HF_HUB_ENABLE_SYMLINKS"] = "0"
 
 logger = logging.getLogger(__name__)
 
+SD_STEP_SECONDS = metrics.histogram(
+    "sd_step_seconds", "Длительность шага генерации изображения",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+)
+SD_GENERATION_SECONDS = metrics.histogram(
+    "sd_generation_seconds", "Полное время генерации изображения",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+)
+
 # Обновленная конфигурация для Stable Diffusion
 DEFAULT_SCHEDULER_CONFIG = {
     "beta_start": 0.00085,
@@ -25,72 +43,248 @@ DEFAULT_SCHEDULER_CONFIG = {
     "prediction_type": "epsilon"
 }
 
+# torch и diffusers импортируются лениво: их загрузка занимает десятки секунд
+# и гигабайты памяти, а нужны они только для генерации изображений.
+def _import_torch():
+    """Ленивый импорт torch"""
+    import torch
+    return torch
+
+
+def _import_diffusers():
+    """Ленивый импорт классов diffusers"""
+    from diffusers import StableDiffusionPipeline, DDIMScheduler
+    return StableDiffusionPipeline, DDIMScheduler
+
+
+# Коэффициенты линейного приближения латентов SD 1.x к RGB.
+# Позволяют получить грубое превью без прогона через VAE.
+LATENT_RGB_FACTORS = [
+    [0.298, 0.207, 0.208],
+    [0.187, 0.286, 0.173],
+    [-0.158, 0.189, 0.264],
+    [-0.184, -0.271, -0.473],
+]
+
+# Колбэк прогресса: (текущий шаг, всего шагов, превью или None)
+ProgressCallback = Callable[[int, int, Optional[Image.Image]], Awaitable[None]]
+
+
+class GenerationCancelled(Exception):
+    """Генерация изображения отменена пользователем"""
+
+
 class StableDiffusionHandler:
-    def __init__(self, model_id: str = "runwayml/stable-diffusion-v1-5"):
+    def __init__(self, model_id: str = "runwayml/stable-diffusion-v1-5",
+                 idle_timeout: Optional[float] = None,
+                 rss_watermark_mb: Optional[float] = None,
+                 check_interval: float = 60.0):
         """Initialize the Stable Diffusion handler.
         
         Args:
             model_id (str): Путь к локальной модели или ID модели с Hugging Face.
                           Например: "C:/models/stable-diffusion-v1-5" или "runwayml/stable-diffusion-v1-5"
+            idle_timeout (float): Выгружать пайплайн после стольких секунд простоя (None - никогда)
+            rss_watermark_mb (float): Выгружать пайплайн, если RSS процесса превысил порог в МБ
+            check_interval (float): Период проверки простоя и памяти в секундах
         """
         self.model_id = model_id
         self.pipe = None
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._device: Optional[str] = None
         # Настройки размера изображения (должны быть кратны 8)
         self.width = 512
         self.height = 512
+        self.num_inference_steps = 30
+        self.guidance_scale = 7.5
         self.is_loaded = False
+        # Одновременно на GPU выполняется только одна генерация
+        self._generation_lock = asyncio.Lock()
+        self._load_lock = asyncio.Lock()
+        self._warmup_task: Optional[asyncio.Task] = None
+        # Выгрузка по простою и по давлению памяти
+        self.idle_timeout = idle_timeout
+        self.rss_watermark_mb = rss_watermark_mb
+        self.check_interval = check_interval
+        self.last_used = time.monotonic()
+        self._watchdog_task: Optional[asyncio.Task] = None
+        self.stats: Dict[str, Any] = {
+            "loads": 0,
+            "unloads": 0,
+            "unload_reasons": {"idle": 0, "memory": 0, "manual": 0},
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+            "last_unload_seconds": None,
+        }
         self.logger = logging.getLogger(__name__)
-        logger.info(f"Using device: {self.device}")
         logger.info(f"Model path: {model_id}")
+
+    @property
+    def device(self) -> str:
+        """Устройство для инференса (определяется при первом обращении)"""
+        if self._device is None:
+            self._device = "cuda" if _import_torch().cuda.is_available() else "cpu"
+            logger.info(f"Using device: {self._device}")
+        return self._device
         
     def is_model_loaded(self) -> bool:
         """Проверяет, загружена ли модель"""
         return self.is_loaded and self.pipe is not None
+
+    def is_warming_up(self) -> bool:
+        """Проверяет, идёт ли фоновая загрузка модели"""
+        return self._warmup_task is not None and not self._warmup_task.done()
+
+    def start_warmup(self) -> asyncio.Task:
+        """Запускает загрузку модели в фоне, не блокируя запуск бота"""
+        if self._warmup_task is None or self._warmup_task.done():
+            self._warmup_task = asyncio.create_task(self._warmup())
+        return self._warmup_task
+
+    async def _warmup(self) -> None:
+        """Фоновая загрузка модели"""
+        try:
+            await self.load_model()
+        except Exception as e:
+            # Ошибка уже залогирована; повторная попытка будет при первой генерации
+            logger.warning(f"Warm-up failed, model will be loaded on demand: {str(e)}")
+
+    def _load_pipeline(self):
+        """Синхронная загрузка пайплайна (выполняется в отдельном потоке)"""
+        torch = _import_torch()
+        StableDiffusionPipeline, DDIMScheduler = _import_diffusers()
+        torch_dtype = torch.float16 if self.device == "cuda" else torch.float32
+
+        # Проверяем, является ли путь локальным
+        if os.path.exists(self.model_id):
+            logger.info("Loading from local path")
+            # Преобразуем путь в формат, совместимый с diffusers
+            model_path = os.path.abspath(self.model_id).replace("\\", "/")
+            logger.info(f"Normalized model path: {model_path}")
+            
+            # Создаем планировщик с обновленной конфигурацией
+            scheduler = DDIMScheduler(**DEFAULT_SCHEDULER_CONFIG)
+            
+            # Загружаем модель с нашим планировщиком
+            pipe = StableDiffusionPipeline.from_single_file(
+                model_path,
+                torch_dtype=torch_dtype,
+                safety_checker=None,  # Отключаем проверку безопасности
+                scheduler=scheduler,
+                local_files_only=True
+            )
+        else:
+            logger.info("Loading from Hugging Face")
+            # Создаем планировщик с обновленной конфигурацией
+            scheduler = DDIMScheduler(**DEFAULT_SCHEDULER_CONFIG)
+            
+            # Загружаем модель с нашим планировщиком
+            pipe = StableDiffusionPipeline.from_pretrained(
+                self.model_id,
+                torch_dtype=torch_dtype,
+                safety_checker=None,  # Отключаем проверку безопасности
+                scheduler=scheduler,
+                local_files_only=False
+            )
+        
+        pipe.to(self.device)
+        return pipe
         
     async def load_model(self):
         """Load the Stable Diffusion model."""
-        if not self.is_model_loaded():
+        async with self._load_lock:
+            if self.is_model_loaded():
+                return
             logger.info(f"Loading model: {self.model_id}")
             try:
-                # Проверяем, является ли путь локальным
-                if os.path.exists(self.model_id):
-                    logger.info("Loading from local path")
-                    # Преобразуем путь в формат, совместимый с diffusers
-                    model_path = os.path.abspath(self.model_id).replace("\\", "/")
-                    logger.info(f"Normalized model path: {model_path}")
-                    
-                    # Создаем планировщик с обновленной конфигурацией
-                    scheduler = DDIMScheduler(**DEFAULT_SCHEDULER_CONFIG)
-                    
-                    # Загружаем модель с нашим планировщиком
-                    self.pipe = StableDiffusionPipeline.from_single_file(
-                        model_path,
-                        torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                        safety_checker=None,  # Отключаем проверку безопасности
-                        scheduler=scheduler,
-                        local_files_only=True
-                    )
-                else:
-                    logger.info("Loading from Hugging Face")
-                    # Создаем планировщик с обновленной конфигурацией
-                    scheduler = DDIMScheduler(**DEFAULT_SCHEDULER_CONFIG)
-                    
-                    # Загружаем модель с нашим планировщиком
-                    self.pipe = StableDiffusionPipeline.from_pretrained(
-                        self.model_id,
-                        torch_dtype=torch.float16 if self.device == "cuda" else torch.float32,
-                        safety_checker=None,  # Отключаем проверку безопасности
-                        scheduler=scheduler,
-                        local_files_only=False
-                    )
-                
-                self.pipe.to(self.device)
+                started = time.monotonic()
+                self.pipe = await asyncio.to_thread(self._load_pipeline)
                 self.is_loaded = True
-                logger.info("Model loaded successfully")
+                duration = time.monotonic() - started
+                self.last_used = time.monotonic()
+                self.stats["loads"] += 1
+                self.stats["last_load_seconds"] = duration
+                self.stats["total_load_seconds"] += duration
+                logger.info(f"Model loaded successfully in {duration:.1f}s")
             except Exception as e:
                 logger.error(f"Error loading model: {str(e)}")
                 raise
+            self._start_watchdog()
+
+    def _release_pipeline(self) -> None:
+        """Освобождает память пайплайна (выполняется в отдельном потоке)"""
+        self.pipe = None
+        gc.collect()
+        # torch уже импортирован, раз пайплайн был загружен
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    async def unload_model(self, reason: str = "manual") -> bool:
+        """Выгружает пайплайн; при следующей генерации он загрузится снова.
+
+        Args:
+            reason (str): Причина выгрузки: idle, memory или manual
+
+        Returns:
+            bool: True, если пайплайн был выгружен
+        """
+        # Не выгружаем модель посреди генерации
+        async with self._generation_lock:
+            async with self._load_lock:
+                if not self.is_model_loaded():
+                    return False
+                started = time.monotonic()
+                self.is_loaded = False
+                await asyncio.to_thread(self._release_pipeline)
+                duration = time.monotonic() - started
+                self.stats["unloads"] += 1
+                self.stats["unload_reasons"][reason] = self.stats["unload_reasons"].get(reason, 0) + 1
+                self.stats["last_unload_seconds"] = duration
+                logger.info(f"Model unloaded ({reason}) in {duration:.1f}s")
+                return True
+
+    def get_rss_mb(self) -> Optional[float]:
+        """Текущий RSS процесса в МБ (None, если psutil недоступен)"""
+        if psutil is None:
+            return None
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Метрики загрузки и выгрузки пайплайна"""
+        return {
+            **self.stats,
+            "unload_reasons": dict(self.stats["unload_reasons"]),
+            "is_loaded": self.is_model_loaded(),
+            "idle_seconds": time.monotonic() - self.last_used,
+            "rss_mb": self.get_rss_mb(),
+        }
+
+    def _start_watchdog(self) -> None:
+        """Запускает фоновую проверку простоя и памяти, если она настроена"""
+        if not self.idle_timeout and not self.rss_watermark_mb:
+            return
+        if self._watchdog_task is None or self._watchdog_task.done():
+            self._watchdog_task = asyncio.create_task(self._watchdog())
+
+    async def _watchdog(self) -> None:
+        """Выгружает пайплайн по простою или при превышении порога памяти"""
+        if self.rss_watermark_mb and psutil is None:
+            logger.warning("psutil is not installed, RSS watermark is disabled")
+        while self.is_model_loaded():
+            await asyncio.sleep(self.check_interval)
+            # Во время генерации модель не трогаем
+            if self._generation_lock.locked() or not self.is_model_loaded():
+                continue
+            try:
+                if self.idle_timeout and time.monotonic() - self.last_used >= self.idle_timeout:
+                    await self.unload_model("idle")
+                    continue
+                rss_mb = self.get_rss_mb() if self.rss_watermark_mb else None
+                if rss_mb is not None and rss_mb >= self.rss_watermark_mb:
+                    logger.warning(f"RSS {rss_mb:.0f} MB exceeds watermark {self.rss_watermark_mb:.0f} MB")
+                    await self.unload_model("memory")
+            except Exception as e:
+                logger.error(f"Error in SD watchdog: {str(e)}")
                 
     def validate_dimensions(self, width: int, height: int) -> tuple[int, int]:
         """Validate and adjust image dimensions to be divisible by 8.
@@ -112,43 +306,142 @@ class StableDiffusionHandler:
         
         return width, height
         
-    async def generate_image(self, prompt: str, negative_prompt: str = None, width: int = None, height: int = None) -> Optional[str]:
-        """Generate an image from a text prompt."""
-        if not self.is_model_loaded():
-            await self.load_model()
-            
-        try:
-            logger.info(f"Generating image with prompt: {prompt}")
-            
-            # Устанавливаем размеры изображения
-            if width is not None:
-                self.width = width
-            if height is not None:
-                self.height = height
-                
-            # Проверяем и корректируем размеры
-            self.width, self.height = self.validate_dimensions(self.width, self.height)
-            
-            # Генерируем изображение
-            with torch.inference_mode():
-                image = self.pipe(
-                    prompt=prompt,
-                    negative_prompt=negative_prompt,
-                    num_inference_steps=30,
-                    guidance_scale=7.5,
-                    width=self.width,
-                    height=self.height
-                ).images[0]
-            
-            # Создаем директорию для выходных файлов, если её нет
-            os.makedirs("output", exist_ok=True)
-            
-            # Сохраняем изображение
-            output_path = os.path.join("output", f"generated_{int(time.time())}.png")
-            image.save(output_path)
-            logger.info(f"Image generated successfully")
-            return output_path
-            
-        except Exception as e:
-            logger.error(f"Error generating image: {str(e)}")
-            return None 
\ No newline at end of file
+    def _latents_to_preview(self, latents: "torch.Tensor", max_size: int = 128) -> Image.Image:
+        """Дешёвое превью из латентов без декодирования через VAE.
+
+        Args:
+            latents: Латенты текущего шага, форма (batch, 4, h, w)
+            max_size: Максимальная сторона превью в пикселях
+
+        Returns:
+            Image.Image: Превью низкого разрешения
+        """
+        torch = _import_torch()
+        factors = torch.tensor(LATENT_RGB_FACTORS, dtype=torch.float32, device=latents.device)
+        rgb = latents[0].float().permute(1, 2, 0) @ factors
+        rgb = ((rgb + 1.0) / 2.0).clamp(0, 1).mul(255).byte().cpu().numpy()
+        preview = Image.fromarray(rgb)
+        preview.thumbnail((max_size, max_size))
+        return preview
+
+    def _run_pipeline(
+        self,
+        prompt: str,
+        negative_prompt: Optional[str],
+        loop: asyncio.AbstractEventLoop,
+        progress_callback: Optional[ProgressCallback],
+        cancel_event: Optional[threading.Event],
+        preview_every: int,
+    ) -> Image.Image:
+        """Синхронный прогон пайплайна (выполняется в отдельном потоке)"""
+        total_steps = self.num_inference_steps
+        last_step_at = [time.perf_counter()]
+
+        def on_step_end(pipe, step: int, timestep, callback_kwargs):
+            now = time.perf_counter()
+            SD_STEP_SECONDS.observe(now - last_step_at[0])
+            last_step_at[0] = now
+            # Прерываем оставшиеся шаги, если пользователь отменил генерацию
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled()
+            if progress_callback is not None:
+                preview = None
+                if preview_every and (step + 1) % preview_every == 0 and step + 1 < total_steps:
+                    try:
+                        preview = self._latents_to_preview(callback_kwargs["latents"])
+                    except Exception as e:
+                        logger.debug(f"Не удалось построить превью: {str(e)}")
+                # Не ждём доставки: троттлинг выполняет сам колбэк
+                asyncio.run_coroutine_threadsafe(
+                    progress_callback(step + 1, total_steps, preview), loop
+                )
+            return callback_kwargs
+
+        with _import_torch().inference_mode(), SD_GENERATION_SECONDS.time():
+            return self.pipe(
+                prompt=prompt,
+                negative_prompt=negative_prompt,
+                num_inference_steps=total_steps,
+                guidance_scale=self.guidance_scale,
+                width=self.width,
+                height=self.height,
+                callback_on_step_end=on_step_end,
+            ).images[0]
+
+    @traced("sd.generate_image")
+    async def generate_image(
+        self,
+        prompt: str,
+        negative_prompt: str = None,
+        width: int = None,
+        height: int = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        preview_every: int = 0,
+    ) -> Optional[str]:
+        """Generate an image from a text prompt.
+
+        Args:
+            prompt (str): Описание изображения на английском
+            negative_prompt (str): Негативный промпт
+            width (int): Ширина изображения
+            height (int): Высота изображения
+            progress_callback: Корутина, вызываемая после каждого шага
+            cancel_event (threading.Event): Если установлен, оставшиеся шаги пропускаются
+            preview_every (int): Передавать превью в колбэк каждые N шагов (0 - не передавать)
+
+        Returns:
+            Optional[str]: Путь к сохранённому изображению или None при ошибке
+
+        Raises:
+            GenerationCancelled: Генерация отменена через cancel_event
+        """
+        async with self._generation_lock:
+            if cancel_event is not None and cancel_event.is_set():
+                raise GenerationCancelled()
+
+            if not self.is_model_loaded():
+                await self.load_model()
+
+            try:
+                logger.info(f"Generating image with prompt: {prompt}")
+
+                # Устанавливаем размеры изображения
+                if width is not None:
+                    self.width = width
+                if height is not None:
+                    self.height = height
+
+                # Проверяем и корректируем размеры
+                self.width, self.height = self.validate_dimensions(self.width, self.height)
+
+                # Генерируем изображение в отдельном потоке, чтобы не блокировать цикл событий
+                with tracer.span("sd.pipeline", width=self.width, height=self.height):
+                    image = await asyncio.to_thread(
+                        self._run_pipeline,
+                        prompt,
+                        negative_prompt,
+                        asyncio.get_running_loop(),
+                        progress_callback,
+                        cancel_event,
+                        preview_every,
+                    )
+
+                # Создаем директорию для выходных файлов, если её нет
+                os.makedirs("output", exist_ok=True)
+
+                # Сохраняем изображение
+                output_path = os.path.join("output", f"generated_{int(time.time())}.png")
+                with tracer.span("sd.save"):
+                    image.save(output_path)
+                logger.info(f"Image generated successfully")
+                return output_path
+
+            except GenerationCancelled:
+                logger.info("Image generation cancelled")
+                raise
+            except Exception as e:
+                logger.error(f"Error generating image: {str(e)}")
+                return None
+            finally:
+                self.last_used = time.monotonic()
@@ -1,27 +1,78 @@
 import aiohttp
 import asyncio
+import contextlib
 import json
 import logging
-from typing import AsyncGenerator, Optional, Dict, Any
+import hashlib
+from typing import AsyncGenerator, Optional, Dict, Any, List
 import subprocess
 import time
+from framework.services.request_coalescer import RequestCoalescer
+from framework.services.response_cache import ResponseCache
+from framework.ollama_pool import OllamaPool, BackendError, BACKEND_ERRORS
+from framework.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from framework.services.adaptive_timeout import AdaptiveTimeout
+from framework.services.llm_scheduler import PriorityScheduler
+from framework.services.model_residency import ModelResidencyManager
+from framework.services.shared_store import SharedStore
+from framework.services.metrics import metrics
+from framework.services.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+OLLAMA_REQUEST_SECONDS = metrics.histogram(
+    "ollama_request_seconds", "Полное время запроса к Ollama без ожидания в очереди", ("model", "path")
+)
+OLLAMA_TTFT_SECONDS = metrics.histogram(
+    "ollama_ttft_seconds", "Время до первого токена потокового ответа Ollama", ("model",)
+)
+OLLAMA_TOKENS_PER_SECOND = metrics.histogram(
+    "ollama_tokens_per_second", "Скорость генерации по данным Ollama", ("model",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+)
+OLLAMA_REQUESTS = metrics.counter("ollama_requests_total", "Запросы к Ollama", ("model", "status"))
+OLLAMA_IN_PROGRESS = metrics.gauge("ollama_requests_in_progress", "Запросы к Ollama в работе", ("model",))
+
 class OllamaClient:
     """Клиент для работы с Ollama API"""
     
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    # Таймаут проверки доступности сервера
+    CHECK_TIMEOUT = 5.0
+    
+    def __init__(self, base_url: str = "http://localhost:11434", coalesce: bool = True,
+                 response_cache: Optional[ResponseCache] = None, pool: Optional[OllamaPool] = None,
+                 breaker: Optional[CircuitBreaker] = None, timeouts: Optional[AdaptiveTimeout] = None,
+                 scheduler: Optional[PriorityScheduler] = None,
+                 residency: Optional[ModelResidencyManager] = None):
         self.base_url = base_url
+        # Если задан пул, каждый запрос направляется на лучший из его серверов
+        self.pool = pool
         self._model_cache = {}
         self._model_lock = {}
-        logger.info(f"Инициализация OllamaClient с базовым URL: {base_url}")
+        # Одинаковые одновременные запросы выполняются один раз
+        self.coalescer = RequestCoalescer() if coalesce else None
+        # Кэш ответов включается вызывающим кодом для каждого запроса отдельно
+        self.response_cache = response_cache or ResponseCache()
+        # Быстрый отказ, пока сервер недоступен, и таймауты по наблюдаемым задержкам
+        self.breaker = breaker or CircuitBreaker(failure_types=(BackendError, *BACKEND_ERRORS))
+        self.timeouts = timeouts or AdaptiveTimeout()
+        # Очередь с приоритетами: личные чаты раньше групп, группы раньше фоновых задач
+        self.scheduler = scheduler or PriorityScheduler()
+        # Подбор keep_alive и учёт смен моделей; без него keep_alive решает сервер
+        self.residency = residency
+        # Общее хранилище рабочих процессов: модель, скачанная одним процессом, не скачивается другими
+        self.store: Optional[SharedStore] = None
+        # (сервер, модель), к которым уже был запрос: загрузку модели ждёт только первый
+        self._attempted: set = set()
+        logger.info("Инициализация OllamaClient с базовым URL: %s", base_url)
 
-    async def check_server(self) -> bool:
+    async def check_server(self, base_url: Optional[str] = None) -> bool:
         """Проверяет доступность Ollama сервера"""
+        base_url = base_url or self.base_url
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/api/tags") as response:
+            timeout = aiohttp.ClientTimeout(total=self.CHECK_TIMEOUT)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"{base_url}/api/tags") as response:
                     if response.status == 200:
                         logger.info("Ollama сервер доступен")
                         return True
@@ -32,73 +83,197 @@ class OllamaClient:
             logger.error(f"Ошибка при проверке Ollama сервера: {str(e)}")
             return False
 
-    async def _ensure_model_loaded(self, model_name: str) -> None:
+    @contextlib.asynccontextmanager
+    async def _endpoint(self, model_name: Optional[str]):
+        """Базовый URL сервера для запроса: из пула или фиксированный"""
+        if self.pool is None:
+            yield self.base_url
+            return
+        async with self.pool.acquire(model_name) as endpoint:
+            yield endpoint.url
+
+    def _is_cold(self, base_url: str, model_name: Optional[str]) -> bool:
+        """Запрос, скорее всего, включает загрузку модели в память сервера"""
+        if (base_url, model_name) not in self._attempted:
+            return True
+        return self.residency is not None and not self.residency.is_resident(model_name)
+
+    def _request_timeout(self, model_name: str, stream: bool, size: int = 0,
+                         cold: bool = False) -> aiohttp.ClientTimeout:
+        """Таймаут запроса по наблюдаемым задержкам модели и размеру промпта"""
+        seconds = self.timeouts.cold_timeout() if cold else self.timeouts.timeout_for(model_name, size)
+        if stream:
+            # Потоковый ответ может идти долго, ограничиваем паузу между фрагментами
+            return aiohttp.ClientTimeout(total=None, sock_connect=self.CHECK_TIMEOUT, sock_read=seconds)
+        return aiohttp.ClientTimeout(total=seconds, sock_connect=self.CHECK_TIMEOUT)
+
+    @contextlib.asynccontextmanager
+    async def _post(self, session: aiohttp.ClientSession, path: str, payload: Dict[str, Any]):
+        """POST-запрос к Ollama, закрывающий соединение при отмене"""
+        model_name = payload.get('model')
+        stream = bool(payload.get('stream'))
+        # Внешний участок включает ожидание очереди планировщика и загрузку модели
+        with tracer.span("ollama.request", model=model_name or "", path=path, stream=stream):
+            async with self.breaker.guard() as call, self.scheduler.slot(model=model_name), \
+                    self._endpoint(model_name) as base_url:
+                size = len(payload.get('prompt') or "")
+                cold = self._is_cold(base_url, model_name)
+                if (base_url, model_name) not in self._attempted:
+                    # Таймаут первой загрузки модели - не отказ сервера. Дальше таймауты
+                    # считаются отказами, иначе зависший сервер никогда не разомкнёт выключатель
+                    self._attempted.add((base_url, model_name))
+                    call.ignore = (asyncio.TimeoutError,)
+                # Убеждаемся, что модель загружена на выбранном сервере
+                await self._ensure_model_loaded(model_name, base_url)
+                if self.residency is not None and model_name:
+                    payload = {**payload, "keep_alive": await self.residency.prepare(base_url, model_name)}
+                started = time.monotonic()
+                model_label = model_name or ""
+                status = "error"
+                try:
+                    with OLLAMA_IN_PROGRESS.track_inprogress(model=model_label), \
+                            tracer.span("ollama.http", backend=base_url) as http_span:
+                        async with session.post(
+                            f"{base_url}{path}",
+                            json=payload,
+                            headers={"Content-Type": "application/json"},
+                            timeout=self._request_timeout(model_name, stream, size, cold)
+                        ) as response:
+                            if response.status >= 500:
+                                error_text = await response.text()
+                                logger.error(f"Ошибка сервера Ollama {base_url}: {response.status}")
+                                raise BackendError(f"Ошибка API: {error_text}")
+                            if stream:
+                                # Ollama отправляет заголовки вместе с первым фрагментом
+                                ttft = time.monotonic() - started
+                                OLLAMA_TTFT_SECONDS.observe(ttft, model=model_label)
+                                if http_span is not None:
+                                    http_span.set_attribute("ttft_ms", round(ttft * 1000, 1))
+                            try:
+                                yield response
+                            except asyncio.CancelledError:
+                                # Ollama прекращает генерацию, как только клиент разрывает соединение
+                                response.close()
+                                status = "cancelled"
+                                logger.info("Запрос к модели %s отменён, соединение закрыто", model_name)
+                                raise
+                            status = "ok" if response.status == 200 else str(response.status)
+                finally:
+                    OLLAMA_REQUESTS.inc(model=model_label, status=status)
+                elapsed = time.monotonic() - started
+                OLLAMA_REQUEST_SECONDS.observe(elapsed, model=model_label, path=path)
+                # Время загрузки модели не должно попадать в замеры обычных ответов
+                if not stream and not cold:
+                    self.timeouts.observe(model_name, elapsed, size)
+
+    @staticmethod
+    def _observe_eval(model_name: str, data: Dict[str, Any]) -> None:
+        """Учитывает скорость генерации из итогового ответа Ollama"""
+        eval_count, eval_duration = data.get("eval_count"), data.get("eval_duration")
+        if eval_count and eval_duration:
+            OLLAMA_TOKENS_PER_SECOND.observe(eval_count / (eval_duration / 1e9), model=model_name)
+
+    async def _pull_model(self, model_name: str, base_url: str) -> None:
+        """Скачивает модель на сервер"""
+        if base_url == self.base_url and self.pool is None:
+            # Локальный сервер: загружаем модель через ollama pull
+            process = await asyncio.create_subprocess_exec(
+                "ollama", "pull", model_name,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate()
+            
+            if process.returncode != 0:
+                error_msg = stderr.decode() if stderr else "Неизвестная ошибка"
+                logger.error(f"Ошибка при загрузке модели {model_name}. Код: {process.returncode}")
+                logger.error(error_msg)
+                raise RuntimeError(f"Ошибка при загрузке модели: {error_msg}")
+            return
+
+        # Удалённый сервер пула: используем HTTP API
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f"{base_url}/api/pull",
+                json={"name": model_name, "stream": False},
+                headers={"Content-Type": "application/json"}
+            ) as response:
+                if response.status != 200:
+                    error_msg = await response.text()
+                    logger.error(f"Ошибка при загрузке модели {model_name} на {base_url}. Статус: {response.status}")
+                    raise RuntimeError(f"Ошибка при загрузке модели: {error_msg}")
+
+    async def _ensure_model_loaded(self, model_name: str, base_url: Optional[str] = None) -> None:
         """Проверяет, загружена ли модель, и загружает её при необходимости"""
-        # Сначала проверяем доступность сервера
-        if not await self.check_server():
-            raise RuntimeError("Ollama сервер недоступен. Убедитесь, что он запущен.")
+        base_url = base_url or self.base_url
+        # Доступность серверов пула отслеживает сам пул
+        if self.pool is None and not await self.check_server(base_url):
+            raise BackendError("Ollama сервер недоступен. Убедитесь, что он запущен.")
             
         current_time = time.time()
-        logger.debug(f"Проверка загрузки модели {model_name}")
+        cache_key = model_name if base_url == self.base_url else f"{base_url}#{model_name}"
+        logger.debug("Проверка загрузки модели %s", model_name)
 
         # Проверяем, нужно ли загружать модель
-        if model_name not in self._model_cache or current_time - self._model_cache[model_name] > 3600:  # 1 час
-            logger.info(f"Модель {model_name} требует загрузки или обновления")
-            if model_name not in self._model_lock:
-                self._model_lock[model_name] = asyncio.Lock()
+        if cache_key not in self._model_cache or current_time - self._model_cache[cache_key] > 3600:  # 1 час
+            logger.info("Модель %s требует загрузки или обновления", model_name)
+            if cache_key not in self._model_lock:
+                self._model_lock[cache_key] = asyncio.Lock()
 
-            async with self._model_lock[model_name]:
+            async with self._model_lock[cache_key]:
                 try:
                     # Проверяем, не загрузил ли кто-то модель пока мы ждали
-                    if model_name in self._model_cache and current_time - self._model_cache[model_name] <= 3600:
-                        logger.debug(f"Модель {model_name} уже загружена другим процессом")
+                    if cache_key in self._model_cache and current_time - self._model_cache[cache_key] <= 3600:
+                        logger.debug("Модель %s уже загружена другим процессом", model_name)
                         return
+                    if self.store is not None:
+                        loaded_at = await asyncio.to_thread(self.store.get, "ollama_models", cache_key)
+                        if loaded_at is not None:
+                            logger.debug("Модель %s уже загружена другим рабочим процессом", model_name)
+                            self._model_cache[cache_key] = loaded_at
+                            return
 
-                    logger.info(f"Начало загрузки модели {model_name}...")
-                    # Загружаем модель через ollama pull
-                    process = await asyncio.create_subprocess_exec(
-                        "ollama", "pull", model_name,
-                        stdout=asyncio.subprocess.PIPE,
-                        stderr=asyncio.subprocess.PIPE
-                    )
-                    stdout, stderr = await process.communicate()
-                    
-                    if process.returncode != 0:
-                        error_msg = stderr.decode() if stderr else "Неизвестная ошибка"
-                        logger.error(f"Ошибка при загрузке модели {model_name}. Код: {process.returncode}")
-                        logger.error(error_msg)
-                        raise RuntimeError(f"Ошибка при загрузке модели: {error_msg}")
-                        
-                    self._model_cache[model_name] = current_time
-                    logger.info(f"Модель {model_name} успешно загружена")
+                    logger.info("Начало загрузки модели %s...", model_name)
+                    await self._pull_model(model_name, base_url)
+                    self._model_cache[cache_key] = current_time
+                    if self.store is not None:
+                        await asyncio.to_thread(self.store.set, "ollama_models", cache_key, current_time, 3600)
+                    logger.info("Модель %s успешно загружена", model_name)
                     
                 except Exception as e:
                     logger.error(f"Ошибка при загрузке модели {model_name}: {str(e)}")
                     raise
                     
-    async def generate_stream(self, prompt: str, model_name: str = "gemma3:12b") -> AsyncGenerator[str, None]:
+    async def generate_stream(self, prompt: str, model_name: str = "gemma3:12b",
+                              options: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
         """Генерирует ответ в потоковом режиме"""
         if not prompt or not isinstance(prompt, str):
             raise ValueError("Prompt должен быть непустой строкой")
 
+        if self.coalescer is None:
+            stream = self._generate_stream(prompt, model_name, options)
+        else:
+            key = RequestCoalescer.make_key(model_name, prompt, options, stream=True)
+            stream = self.coalescer.stream(key, lambda: self._generate_stream(prompt, model_name, options))
+        async for chunk in stream:
+            yield chunk
+
+    async def _generate_stream(self, prompt: str, model_name: str,
+                               options: Optional[Dict[str, Any]]) -> AsyncGenerator[str, None]:
+        """Потоковый запрос к /api/generate"""
         try:
-            # Убеждаемся, что модель загружена
-            await self._ensure_model_loaded(model_name)
-            
             # Формируем запрос
             payload = {
                 "model": model_name,
                 "prompt": prompt,
                 "stream": True
             }
+            if options:
+                payload["options"] = options
             
             # Отправляем запрос
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
+                async with self._post(session, "/api/generate", payload) as response:
                     if response.status != 200:
                         error_text = await response.text()
                         logger.error(f"Ошибка API: {response.status}")
@@ -110,6 +285,8 @@ class OllamaClient:
                         if line:
                             try:
                                 chunk = json.loads(line)
+                                if chunk.get("done"):
+                                    self._observe_eval(model_name, chunk)
                                 if "response" in chunk:
                                     if not isinstance(chunk["response"], str):
                                         raise ValueError("Неверный формат ответа: response не является строкой")
@@ -123,20 +300,31 @@ class OllamaClient:
                                 logger.error(f"Полученные данные: {line}")
                                 raise RuntimeError(f"Ошибка при обработке ответа: {str(e)}")
                                 
+        except CircuitOpenError:
+            # Сервер уже признан недоступным, об этом залогировал выключатель
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при генерации ответа: {str(e)}")
-            logger.error(f"Тип ошибки: {type(e)}")
-            logger.error(f"Аргументы ошибки: {e.args}")
+            logger.error(f"Ошибка при генерации ответа ({type(e).__name__}): {str(e)}")
             raise
             
-    async def generate_with_image(self, prompt: str, image: str, model_name: str = "gemma3:12b") -> str:
+    async def generate_with_image(self, prompt: str, image: str, model_name: str = "gemma3:12b",
+                                  options: Optional[Dict[str, Any]] = None) -> str:
         """Генерирует полный ответ с использованием изображения"""
         if not prompt or not isinstance(prompt, str):
             raise ValueError("Prompt должен быть непустой строкой")
         if not image or not isinstance(image, str):
             raise ValueError("Image должен быть непустой строкой (base64)")
+
+        if self.coalescer is None:
+            return await self._generate_with_image(prompt, image, model_name, options)
+        image_digest = hashlib.sha256(image.encode("ascii", "ignore")).hexdigest()
+        key = RequestCoalescer.make_key(model_name, prompt, options, image=image_digest)
+        return await self.coalescer.run(key, lambda: self._generate_with_image(prompt, image, model_name, options))
+
+    async def _generate_with_image(self, prompt: str, image: str, model_name: str,
+                                   options: Optional[Dict[str, Any]]) -> str:
+        """Запрос к /api/generate с изображением"""
         try:
-            await self._ensure_model_loaded(model_name)
             payload = {
                 "model": model_name,
                 "prompt": prompt,
@@ -144,21 +332,20 @@ class OllamaClient:
                 "images": [image],
                 "stream": False
             }
-            logger.info(f"Отправляем запрос с изображением: длина изображения = {len(image)}; первые 30 символов: {image[:30]}")
-            logger.debug(f"Payload: {{'model': {model_name}, 'prompt': {prompt}, 'images': [<image данных, длина={len(image)}>], 'stream': False}}")
+            if options:
+                payload["options"] = options
+            logger.info("Отправляем запрос с изображением к %s: %d символов base64", model_name, len(image))
+            logger.debug("Промпт запроса с изображением: %s", prompt)
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
+                async with self._post(session, "/api/generate", payload) as response:
                     if response.status != 200:
                         error_text = await response.text()
                         logger.error(f"Ошибка API: {response.status}")
                         logger.error(f"Ответ: {error_text}")
                         raise RuntimeError(f"Ошибка API: {error_text}")
                     response_data = await response.json()
-                    logger.debug(f"Response data: {response_data}")
+                    self._observe_eval(model_name, response_data)
+                    logger.debug("Ответ Ollama: %s", response_data)
                     if "response" in response_data:
                         if not isinstance(response_data["response"], str):
                             raise ValueError("Неверный формат ответа: response не является строкой")
@@ -167,35 +354,62 @@ class OllamaClient:
                         raise RuntimeError(f"Ошибка API: {response_data['error']}")
                     else:
                         raise ValueError("Неверный формат ответа: отсутствуют поля response и error")
+        except CircuitOpenError:
+            # Сервер уже признан недоступным, об этом залогировал выключатель
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при генерации ответа с изображением: {str(e)}")
-            logger.error(f"Тип ошибки: {type(e)}")
-            logger.error(f"Аргументы ошибки: {e.args}")
+            logger.error(f"Ошибка при генерации ответа с изображением ({type(e).__name__}): {str(e)}")
             raise
 
-    async def generate(self, prompt: str, model_name: str = "gemma3:12b") -> str:
-        """Генерирует полный ответ"""
+    async def generate(self, prompt: str, model_name: str = "gemma3:12b",
+                       options: Optional[Dict[str, Any]] = None,
+                       cache: bool = False, cache_ttl: Optional[float] = None) -> str:
+        """Генерирует полный ответ
+
+        Args:
+            prompt: Итоговый промпт
+            model_name: Имя модели
+            options: Параметры генерации Ollama (temperature, seed и т.д.)
+            cache: Использовать кэш ответов; допустимо только для детерминированных
+                запросов (temperature=0 или задан seed)
+            cache_ttl: Время жизни записи в кэше (по умолчанию - из настроек кэша)
+        """
         if not prompt or not isinstance(prompt, str):
             raise ValueError("Prompt должен быть непустой строкой")
+        if cache and not ResponseCache.is_deterministic(options):
+            raise ValueError("Кэширование доступно только для детерминированных запросов (temperature=0 или seed)")
+
+        key = RequestCoalescer.make_key(model_name, prompt, options)
+        if cache:
+            cached = await self.response_cache.get(key)
+            if cached is not None:
+                logger.debug("Ответ для %s взят из кэша", model_name)
+                return cached
 
+        if self.coalescer is None:
+            response = await self._generate(prompt, model_name, options)
+        else:
+            response = await self.coalescer.run(key, lambda: self._generate(prompt, model_name, options))
+
+        if cache:
+            await self.response_cache.set(key, response, cache_ttl)
+        return response
+
+    async def _generate(self, prompt: str, model_name: str, options: Optional[Dict[str, Any]]) -> str:
+        """Запрос к /api/generate без стриминга"""
         try:
-            # Убеждаемся, что модель загружена
-            await self._ensure_model_loaded(model_name)
-            
             # Формируем запрос
             payload = {
                 "model": model_name,
                 "prompt": prompt,
                 "stream": False
             }
+            if options:
+                payload["options"] = options
             
             # Отправляем запрос
             async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/api/generate",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
+                async with self._post(session, "/api/generate", payload) as response:
                     if response.status != 200:
                         error_text = await response.text()
                         logger.error(f"Ошибка API: {response.status}")
@@ -204,6 +418,7 @@ class OllamaClient:
                         
                     # Читаем ответ
                     response_data = await response.json()
+                    self._observe_eval(model_name, response_data)
                     if "response" in response_data:
                         if not isinstance(response_data["response"], str):
                             raise ValueError("Неверный формат ответа: response не является строкой")
@@ -213,22 +428,39 @@ class OllamaClient:
                     else:
                         raise ValueError("Неверный формат ответа: отсутствуют поля response и error")
                         
+        except CircuitOpenError:
+            # Сервер уже признан недоступным, об этом залогировал выключатель
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при генерации ответа: {str(e)}")
-            logger.error(f"Тип ошибки: {type(e)}")
-            logger.error(f"Аргументы ошибки: {e.args}")
+            logger.error(f"Ошибка при генерации ответа ({type(e).__name__}): {str(e)}")
             raise
 
+    async def embeddings(self, text: str, model_name: str = "nomic-embed-text") -> List[float]:
+        """Возвращает вектор текста (/api/embeddings)"""
+        if not text or not isinstance(text, str):
+            raise ValueError("Текст должен быть непустой строкой")
+        payload = {"model": model_name, "prompt": text}
+        async with aiohttp.ClientSession() as session:
+            async with self._post(session, "/api/embeddings", payload) as response:
+                if response.status != 200:
+                    error_text = await response.text()
+                    raise RuntimeError(f"Ошибка API: {error_text}")
+                response_data = await response.json()
+        embedding = response_data.get("embedding")
+        if not embedding:
+            raise ValueError("Неверный формат ответа: отсутствует поле embedding")
+        return embedding
+
     async def list_models(self) -> Dict[str, Any]:
         """Получает список доступных моделей через Ollama API"""
         try:
             # Проверяем доступность сервера
-            if not await self.check_server():
+            if self.pool is None and not await self.check_server():
                 raise RuntimeError("Ollama сервер недоступен. Убедитесь, что он запущен.")
                 
-            async with aiohttp.ClientSession() as session:
+            async with self._endpoint(None) as base_url, aiohttp.ClientSession() as session:
                 async with session.get(
-                    f"{self.base_url}/api/tags",
+                    f"{base_url}/api/tags",
                     headers={"Content-Type": "application/json"}
                 ) as response:
                     if response.status != 200:
@@ -243,10 +475,11 @@ class OllamaClient:
                     
                     return response_data["models"]
                     
+        except CircuitOpenError:
+            # Сервер уже признан недоступным, об этом залогировал выключатель
+            raise
         except Exception as e:
-            logger.error(f"Ошибка при получении списка моделей: {str(e)}")
-            logger.error(f"Тип ошибки: {type(e)}")
-            logger.error(f"Аргументы ошибки: {e.args}")
+            logger.error(f"Ошибка при получении списка моделей ({type(e).__name__}): {str(e)}")
             raise
 
 # Создаем глобальный экземпляр клиента
@@ -0,0 +1,204 @@
+import aiohttp
+import asyncio
+import contextlib
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, означающие проблему с самим сервером, а не с запросом
+BACKEND_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError, OSError)
+
+
+class BackendError(RuntimeError):
+    """Сервер Ollama ответил ошибкой 5xx"""
+
+
+class OllamaEndpoint:
+    """Состояние одного сервера Ollama"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.inflight = 0
+        self.latency_ewma: Optional[float] = None
+        self.loaded_models: Set[str] = set()
+        self.healthy = True
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+
+    def is_available(self, now: float) -> bool:
+        """Сервер здоров или окно исключения уже истекло"""
+        return self.healthy or now >= self.ejected_until
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "inflight": self.inflight,
+            "latency_ewma": self.latency_ewma,
+            "loaded_models": sorted(self.loaded_models),
+            "failures": self.failures,
+            "requests": self.requests,
+        }
+
+
+class OllamaPool:
+    """Пул серверов Ollama с маршрутизацией по нагрузке, задержке и загруженным моделям"""
+
+    def __init__(self, endpoints: List[str], ewma_alpha: float = 0.3, probe_interval: float = 15.0,
+                 eject_after_failures: int = 3, eject_seconds: float = 30.0, probe_timeout: float = 5.0):
+        """
+        Args:
+            endpoints: Базовые URL серверов Ollama
+            ewma_alpha: Вес нового замера в скользящем среднем задержки
+            probe_interval: Период опроса /api/ps в секундах
+            eject_after_failures: Число ошибок подряд, после которого сервер исключается
+            eject_seconds: Через сколько секунд исключённый сервер проверяется снова
+            probe_timeout: Таймаут запроса проверки
+        """
+        if not endpoints:
+            raise ValueError("Список серверов Ollama пуст")
+        self.endpoints = [OllamaEndpoint(url) for url in endpoints]
+        self.ewma_alpha = ewma_alpha
+        self.probe_interval = probe_interval
+        self.eject_after_failures = eject_after_failures
+        self.eject_seconds = eject_seconds
+        self.probe_timeout = probe_timeout
+        self._probe_task: Optional[asyncio.Task] = None
+        self._first_probe: Optional[asyncio.Future] = None
+        self._rr = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["OllamaPool"]:
+        """Создаёт пул по секции ollama конфигурации (None, если серверы не заданы)"""
+        ollama_config = config.get('ollama', {})
+        endpoints = ollama_config.get('endpoints') or []
+        if not endpoints:
+            return None
+        return cls(
+            endpoints,
+            ewma_alpha=ollama_config.get('ewma_alpha', 0.3),
+            probe_interval=ollama_config.get('probe_interval', 15.0),
+            eject_after_failures=ollama_config.get('eject_after_failures', 3),
+            eject_seconds=ollama_config.get('eject_seconds', 30.0),
+        )
+
+    def select(self, model: Optional[str] = None) -> OllamaEndpoint:
+        """Выбирает лучший сервер для модели.
+
+        Предпочтение отдаётся серверам, где модель уже загружена, затем
+        серверам с меньшим числом запросов в работе и меньшей задержкой.
+        """
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e.is_available(now)]
+        if not candidates:
+            raise BackendError("Нет доступных серверов Ollama")
+
+        # Чередуем начальную позицию, чтобы равные серверы нагружались поровну
+        self._rr = (self._rr + 1) % len(candidates)
+        candidates = candidates[self._rr:] + candidates[:self._rr]
+        return min(candidates, key=lambda e: (
+            0 if model and model in e.loaded_models else 1,
+            e.inflight,
+            e.latency_ewma or 0.0,
+        ))
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, model: Optional[str] = None) -> AsyncIterator[OllamaEndpoint]:
+        """Выдаёт сервер на время запроса и учитывает результат"""
+        await self._ensure_probing()
+        endpoint = self.select(model)
+        endpoint.inflight += 1
+        endpoint.requests += 1
+        started = time.monotonic()
+        try:
+            yield endpoint
+        except (BackendError, *BACKEND_ERRORS) as e:
+            self.record_failure(endpoint, e)
+            raise
+        else:
+            self.record_success(endpoint, time.monotonic() - started, model)
+        finally:
+            endpoint.inflight -= 1
+
+    def record_success(self, endpoint: OllamaEndpoint, latency: float, model: Optional[str] = None) -> None:
+        """Учитывает успешный запрос"""
+        if endpoint.latency_ewma is None:
+            endpoint.latency_ewma = latency
+        else:
+            endpoint.latency_ewma += self.ewma_alpha * (latency - endpoint.latency_ewma)
+        endpoint.failures = 0
+        if not endpoint.healthy:
+            logger.info(f"Сервер Ollama {endpoint.url} снова доступен")
+        endpoint.healthy = True
+        if model:
+            endpoint.loaded_models.add(model)
+
+    def record_failure(self, endpoint: OllamaEndpoint, error: BaseException) -> None:
+        """Учитывает ошибку и при необходимости исключает сервер"""
+        endpoint.failures += 1
+        if endpoint.failures >= self.eject_after_failures or not endpoint.healthy:
+            if endpoint.healthy:
+                logger.warning(f"Сервер Ollama {endpoint.url} исключён из пула: {str(error)}")
+            endpoint.healthy = False
+            endpoint.ejected_until = time.monotonic() + self.eject_seconds
+
+    async def probe(self, endpoint: OllamaEndpoint) -> bool:
+        """Опрашивает /api/ps: проверяет доступность и список загруженных моделей"""
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"{endpoint.url}/api/ps") as response:
+                    if response.status >= 500:
+                        raise BackendError(f"Статус {response.status}")
+                    data = await response.json() if response.status == 200 else {}
+            endpoint.loaded_models = {m.get('name') or m.get('model') for m in data.get('models', [])}
+            endpoint.loaded_models.discard(None)
+            if not endpoint.healthy:
+                logger.info(f"Сервер Ollama {endpoint.url} снова доступен")
+            endpoint.healthy = True
+            endpoint.failures = 0
+            return True
+        except (BackendError, *BACKEND_ERRORS, aiohttp.ClientError) as e:
+            # Неудачная проверка - достаточный признак, чтобы сразу исключить сервер
+            endpoint.failures = max(endpoint.failures, self.eject_after_failures - 1)
+            self.record_failure(endpoint, e)
+            return False
+
+    async def probe_all(self) -> None:
+        """Опрашивает здоровые серверы и исключённые, у которых истекло окно"""
+        now = time.monotonic()
+        targets = [e for e in self.endpoints if e.is_available(now)]
+        await asyncio.gather(*(self.probe(e) for e in targets))
+
+    async def _ensure_probing(self) -> None:
+        """При первом запросе опрашивает серверы и запускает фоновый опрос"""
+        if self._probe_task is None or self._probe_task.done():
+            self._first_probe = asyncio.get_running_loop().create_future()
+            self._probe_task = asyncio.create_task(self._probe_loop())
+        # Первый запрос ждёт начального опроса, чтобы не попасть на мёртвый сервер
+        await asyncio.shield(self._first_probe)
+
+    async def _probe_loop(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Ошибка при опросе серверов Ollama: {str(e)}")
+            if not self._first_probe.done():
+                self._first_probe.set_result(None)
+            await asyncio.sleep(self.probe_interval)
+
+    async def close(self) -> None:
+        """Останавливает фоновый опрос"""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._probe_task
+            self._probe_task = None
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Состояние всех серверов пула"""
+        return [e.to_dict() for e in self.endpoints]
@@ -0,0 +1,89 @@
+import math
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+class AdaptiveTimeout:
+    """Таймауты запросов, вычисляемые по наблюдаемым задержкам каждой модели.
+
+    Таймаут = перцентиль задержки * множитель, в пределах [minimum, maximum].
+    Пока замеров меньше min_samples, используется значение по умолчанию.
+    Замеры в основном от коротких реплик чата, поэтому запрос с промптом
+    длиннее обычного (медиана размеров замеров) получает пропорционально
+    больший таймаут. Первый запрос к модели, включающий её загрузку,
+    получает отдельный ограниченный таймаут cold_timeout().
+    """
+
+    def __init__(self, default: float = 120.0, minimum: float = 30.0, maximum: float = 600.0,
+                 percentile: float = 0.99, multiplier: float = 2.0, window: int = 200, min_samples: int = 20,
+                 cold: float = 180.0):
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.window = window
+        self.min_samples = min_samples
+        self.cold = cold
+        # (длительность, размер промпта в символах)
+        self._samples: Dict[str, Deque[Tuple[float, int]]] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "AdaptiveTimeout":
+        """Создаёт по секции ollama.timeouts конфигурации"""
+        timeouts = config.get('ollama', {}).get('timeouts', {})
+        return cls(
+            default=timeouts.get('default', 120.0),
+            minimum=timeouts.get('min', 30.0),
+            maximum=timeouts.get('max', 600.0),
+            percentile=timeouts.get('percentile', 0.99),
+            multiplier=timeouts.get('multiplier', 2.0),
+            cold=timeouts.get('cold', 180.0),
+        )
+
+    def observe(self, model: str, seconds: float, size: int = 0) -> None:
+        """Запоминает длительность успешного запроса и размер его промпта"""
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append((seconds, size))
+
+    def quantile(self, model: str, q: float) -> Optional[float]:
+        """Квантиль задержки модели (None, если замеров нет)"""
+        samples = self._samples.get(model)
+        if not samples:
+            return None
+        ordered = sorted(seconds for seconds, _ in samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+    def _size_factor(self, model: str, size: int) -> float:
+        """Во сколько раз промпт длиннее типичного для этой модели (не меньше 1)"""
+        samples = self._samples.get(model)
+        sizes = sorted(s for _, s in samples if s > 0) if samples else []
+        if not size or not sizes:
+            return 1.0
+        return max(1.0, size / sizes[len(sizes) // 2])
+
+    def timeout_for(self, model: str, size: int = 0) -> float:
+        """Таймаут для очередного запроса к модели с промптом size символов"""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < self.min_samples:
+            return self.default
+        value = self.quantile(model, self.percentile) * self.multiplier * self._size_factor(model, size)
+        return min(self.maximum, max(self.minimum, value))
+
+    def cold_timeout(self) -> float:
+        """Таймаут первого запроса к незагруженной модели: загрузка не отражена в замерах"""
+        return self.cold
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                "samples": len(samples),
+                "p50": self.quantile(model, 0.5),
+                "p95": self.quantile(model, 0.95),
+                "p99": self.quantile(model, 0.99),
+                "timeout": self.timeout_for(model),
+            }
+            for model, samples in self._samples.items()
+        }
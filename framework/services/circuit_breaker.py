@@ -0,0 +1,113 @@
+import contextlib
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(RuntimeError):
+    """Сервер считается недоступным: запрос отклонён без обращения к нему"""
+
+
+class _Call:
+    """Настройки одного запроса внутри CircuitBreaker.guard"""
+
+    __slots__ = ("ignore",)
+
+    def __init__(self):
+        self.ignore: Tuple[Type[BaseException], ...] = ()
+
+
+class CircuitBreaker:
+    """Автоматический выключатель для обращений к внешнему сервису.
+
+    closed    - запросы идут как обычно, ошибки подсчитываются;
+    open      - после failure_threshold ошибок подряд запросы сразу отклоняются;
+    half_open - по истечении recovery_timeout пропускается один пробный запрос,
+                его результат решает, закрыть выключатель или открыть снова.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str = "ollama", failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 failure_types: Tuple[Type[BaseException], ...] = (Exception,)):
+        """
+        Args:
+            name: Имя сервиса для логов
+            failure_threshold: Число ошибок подряд, после которого выключатель размыкается
+            recovery_timeout: Через сколько секунд пропустить пробный запрос
+            failure_types: Исключения, которые считаются отказом сервиса
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failure_types = failure_types
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probe_in_flight = False
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], **kwargs: Any) -> "CircuitBreaker":
+        """Создаёт выключатель по секции ollama.circuit_breaker конфигурации"""
+        breaker_config = config.get('ollama', {}).get('circuit_breaker', {})
+        return cls(
+            failure_threshold=breaker_config.get('failure_threshold', 5),
+            recovery_timeout=breaker_config.get('recovery_timeout', 30.0),
+            **kwargs
+        )
+
+    def _before_call(self) -> bool:
+        """Решает, можно ли выполнить запрос; True - запрос пробный"""
+        if self.state == self.CLOSED:
+            return False
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            logger.info(f"{self.name}: пробный запрос после {self.recovery_timeout:.0f}s простоя")
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected += 1
+        raise CircuitOpenError(f"{self.name} недоступен, запрос отклонён")
+
+    @contextlib.asynccontextmanager
+    async def guard(self) -> AsyncIterator["_Call"]:
+        """Оборачивает один запрос к сервису.
+
+        Внутри блока можно задать call.ignore - ошибки, которые для этого запроса
+        не считаются ни отказом, ни успехом (например, таймаут холодной загрузки модели).
+        """
+        is_probe = self._before_call()
+        call = _Call()
+        try:
+            yield call
+        except self.failure_types as e:
+            if not isinstance(e, call.ignore):
+                self._on_failure(e)
+            raise
+        else:
+            self._on_success()
+        finally:
+            if is_probe:
+                self._probe_in_flight = False
+
+    def _on_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"{self.name} снова доступен, выключатель замкнут")
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def _on_failure(self, error: BaseException) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.error(f"{self.name} недоступен ({type(error).__name__}: {str(error)}), "
+                             f"запросы отклоняются {self.recovery_timeout:.0f}s")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
@@ -0,0 +1,165 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import logging
+import multiprocessing
+import time
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+from framework.services.metrics import metrics
+from framework.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+EXECUTOR_TASK_SECONDS = metrics.histogram(
+    "executor_task_seconds", "Время выполнения задачи вне цикла событий", ("pool", "task"))
+EXECUTOR_WAIT_SECONDS = metrics.histogram(
+    "executor_wait_seconds", "Ожидание свободного потока или процесса", ("pool",))
+EXECUTOR_TASKS = metrics.counter("executor_tasks_total", "Задачи пулов выполнения", ("pool", "task", "status"))
+
+
+def _timed_call(fn: Callable, args: Tuple[Any, ...]) -> Tuple[Any, float, float]:
+    """Выполняет fn в потоке или процессе пула и замеряет начало и длительность"""
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time() - started
+
+
+def _noop() -> None:
+    return None
+
+
+class ExecutorService:
+    """Общие пулы для тяжёлых по CPU шагов обработки.
+
+    Пул потоков - для работы, которая отпускает GIL или коротка (base64,
+    json.dumps, регулярные выражения): цикл событий продолжает обслуживать
+    другие чаты. Пул процессов - для разбора на чистом Python (BeautifulSoup),
+    который в потоке всё равно держал бы GIL. Функции для пула процессов
+    должны быть объявлены на уровне модуля. Данные меньше min_offload_size
+    обрабатываются прямо в цикле: передача в пул стоила бы дороже самой работы.
+    """
+
+    def __init__(self, threads: int = 4, processes: int = 2, min_offload_size: int = 16 * 1024):
+        """
+        Args:
+            threads: Размер пула потоков
+            processes: Размер пула процессов (0 - задачи процессов идут в пул потоков)
+            min_offload_size: Данные меньшего размера (байт или символов) обрабатываются в цикле событий
+        """
+        if processes > 0 and "fork" not in multiprocessing.get_all_start_methods():
+            # Без fork (Windows) каждый процесс пула заново импортирует точку входа, а с ней
+            # создание бота, координатора, хранилища и логгера run_bot
+            logger.info("fork недоступен, задачи пула процессов выполняются в пуле потоков")
+            processes = 0
+        self.threads = threads
+        self.processes = processes
+        self.min_offload_size = min_offload_size
+        self._thread_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ExecutorService":
+        executor_config = config.get('executor', {})
+        return cls(
+            threads=executor_config.get('threads', 4),
+            processes=executor_config.get('processes', 2),
+            min_offload_size=executor_config.get('min_offload_size', 16 * 1024),
+        )
+
+    def _threads(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix="cpu")
+        return self._thread_pool
+
+    def _processes(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._process_pool is None:
+            # fork не импортирует заново точку входа бота в каждом процессе пула
+            self._process_pool = concurrent.futures.ProcessPoolExecutor(
+                self.processes, mp_context=multiprocessing.get_context("fork")
+            )
+        return self._process_pool
+
+    def prestart(self) -> None:
+        """Создаёт процессы пула синхронно, до запуска потоков процесса бота.
+
+        С fork все процессы пула создаются при первой задаче, поэтому вызов
+        до setup_logger и монитора цикла гарантирует, что в момент fork в
+        процессе есть только главный поток и ни одна блокировка не захвачена.
+        """
+        if self.processes > 0:
+            self._processes().submit(_noop).result()
+
+    async def start(self) -> None:
+        """Заранее запускает процессы пула, если prestart не был вызван"""
+        if self.processes > 0:
+            await self.run_in_process(_noop, name="start")
+
+    async def _run(self, pool: str, fn: Callable, args: Tuple[Any, ...], name: str, size: Optional[int]) -> Any:
+        if size is not None and size < self.min_offload_size:
+            pool = "inline"
+        status = "error"
+        with tracer.span(f"executor.{name}", pool=pool, size=size or 0):
+            try:
+                submitted = time.time()
+                if pool == "inline":
+                    result, started, elapsed = _timed_call(fn, args)
+                elif pool == "process":
+                    loop = asyncio.get_running_loop()
+                    try:
+                        result, started, elapsed = await loop.run_in_executor(
+                            self._processes(), _timed_call, fn, args
+                        )
+                    except BrokenProcessPool:
+                        # Процесс пула упал (например, OOM); следующий вызов создаст новый пул
+                        logger.error("Пул процессов повреждён и будет пересоздан")
+                        self._process_pool = None
+                        raise
+                else:
+                    loop = asyncio.get_running_loop()
+                    # Контекст копируется, чтобы в потоке были видны трасса и приоритет
+                    context = contextvars.copy_context()
+                    call = functools.partial(context.run, _timed_call, fn, args)
+                    result, started, elapsed = await loop.run_in_executor(self._threads(), call)
+                status = "ok"
+            finally:
+                EXECUTOR_TASKS.inc(pool=pool, task=name, status=status)
+        EXECUTOR_WAIT_SECONDS.observe(max(0.0, started - submitted), pool=pool)
+        EXECUTOR_TASK_SECONDS.observe(elapsed, pool=pool, task=name)
+        return result
+
+    async def run_in_thread(self, fn: Callable, *args: Any, name: Optional[str] = None,
+                            size: Optional[int] = None) -> Any:
+        """Выполняет fn(*args) в пуле потоков.
+
+        Args:
+            name: Имя задачи для метрик и трассировки (по умолчанию имя функции)
+            size: Размер входных данных; при size < min_offload_size fn выполняется сразу
+        """
+        return await self._run("thread", fn, args, name or fn.__name__, size)
+
+    async def run_in_process(self, fn: Callable, *args: Any, name: Optional[str] = None,
+                             size: Optional[int] = None) -> Any:
+        """Выполняет fn(*args) в пуле процессов (или в пуле потоков, если процессы отключены)"""
+        pool = "process" if self.processes > 0 else "thread"
+        return await self._run(pool, fn, args, name or fn.__name__, size)
+
+    def shutdown(self) -> None:
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+
+_executor: Optional[ExecutorService] = None
+
+
+def get_executor(config: Optional[Dict[str, Any]] = None) -> ExecutorService:
+    """Общий сервис пулов процесса; создаётся при первом вызове"""
+    global _executor
+    if _executor is None:
+        _executor = ExecutorService.from_config(config or {})
+    return _executor
@@ -2,6 +2,7 @@ import logging
 from typing import Optional, Dict, Any
 from aiogram import Bot
 from aiogram.types import Message
+from framework.services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +13,7 @@ class FileService:
         self.config = config
         self.max_file_size = config.get('file_limits', {}).get('max_size', 20 * 1024 * 1024)  # 20MB по умолчанию
         
+    @traced("file_service.get_photo_content")
     async def get_photo_content(self, message: Message, bot: Bot) -> Optional[Dict[str, Any]]:
         """Получение содержимого фото из сообщения"""
         try:
@@ -21,7 +23,7 @@ class FileService:
                 
             # Берем самую качественную версию фото
             photo = message.photo[-1]
-            logger.info(f"Получено фото: file_id={photo.file_id}, размер={photo.file_size}, разрешение={photo.width}x{photo.height}")
+            logger.info("Получено фото: file_id=%s, размер=%s, разрешение=%sx%s", photo.file_id, photo.file_size, photo.width, photo.height)
             
             # Проверяем размер файла
             if photo.file_size and photo.file_size > self.max_file_size:
@@ -65,6 +67,7 @@ class FileService:
                 'message': "Ой-ой! 😱 Что-то пошло не так при получении фото. Попробуйте еще раз!"
             }
             
+    @traced("file_service.get_document_content")
     async def get_document_content(self, message: Message, bot: Bot) -> Optional[Dict[str, Any]]:
         """Получение содержимого документа из сообщения"""
         try:
@@ -73,7 +76,7 @@ class FileService:
                 return None
                 
             document = message.document
-            logger.info(f"Получен документ: file_id={document.file_id}, размер={document.file_size}, имя={document.file_name}")
+            logger.info("Получен документ: file_id=%s, размер=%s, имя=%s", document.file_id, document.file_size, document.file_name)
             
             # Проверяем размер файла
             if document.file_size and document.file_size > self.max_file_size:
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import logging
+import time
+from typing import Optional
+from aiogram.types import Message, BufferedInputFile, InputMediaPhoto
+from PIL import Image
+from framework.services.message_sender import MessageSender
+
+logger = logging.getLogger(__name__)
+
+class GenerationProgress:
+    """Отображение хода генерации изображения в статусном сообщении"""
+
+    def __init__(self, status_message: Message, min_interval: float = 2.0,
+                 title: str = "🎨 Генерирую изображение...", sender: Optional[MessageSender] = None):
+        self.status_message = status_message
+        # Через очередь отправителя неотправленные правки статуса заменяются последней
+        self.sender = sender
+        self.min_interval = min_interval
+        self.title = title
+        self.preview_message: Optional[Message] = None
+        self._last_update = 0.0
+        self._last_text = ""
+        self._lock = asyncio.Lock()
+
+    async def __call__(self, step: int, total: int, preview: Optional[Image.Image] = None) -> None:
+        """Обновляет статус; промежуточные шаги чаще min_interval отбрасываются"""
+        now = time.monotonic()
+        if step < total and now - self._last_update < self.min_interval:
+            return
+        # Если предыдущее обновление ещё отправляется, этот шаг пропускаем
+        if self._lock.locked():
+            return
+
+        async with self._lock:
+            self._last_update = now
+            await self.set_status(f"{self.title}\nшаг {step}/{total}")
+
+            if preview is not None:
+                await self._send_preview(preview, step, total)
+
+    async def set_status(self, text: str) -> None:
+        """Заменяет текст статусного сообщения"""
+        if text == self._last_text:
+            return
+        try:
+            if self.sender is not None:
+                await self.sender.edit_text(self.status_message.chat.id, self.status_message.message_id, text)
+            else:
+                await self.status_message.edit_text(text)
+            self._last_text = text
+        except Exception as e:
+            logger.debug("Не удалось обновить статус генерации: %s", e)
+
+    async def _send_preview(self, preview: Image.Image, step: int, total: int) -> None:
+        """Отправляет или обновляет превью низкого разрешения"""
+        buffer = io.BytesIO()
+        preview.save(buffer, format="JPEG", quality=70)
+        photo = BufferedInputFile(buffer.getvalue(), filename=f"preview_{step}.jpg")
+        caption = f"👀 Превью: шаг {step}/{total}"
+        try:
+            if self.preview_message is None:
+                self.preview_message = await self.status_message.answer_photo(photo, caption=caption)
+            else:
+                await self.preview_message.edit_media(InputMediaPhoto(media=photo, caption=caption))
+        except Exception as e:
+            logger.debug("Не удалось отправить превью: %s", e)
+
+    async def cleanup(self) -> None:
+        """Удаляет статусное сообщение и превью"""
+        for msg in (self.preview_message, self.status_message):
+            if msg is None:
+                continue
+            try:
+                await msg.delete()
+            except Exception as e:
+                logger.debug("Не удалось удалить сообщение о генерации: %s", e)
@@ -0,0 +1,147 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.types import Message
+from framework.utils.text import normalize_spaces
+
+logger = logging.getLogger(__name__)
+
+GROUP_CHAT_TYPES = ("group", "supergroup")
+
+# Падежные окончания русских имён по последней букве: «у Слайма», «со Слаймом»
+_CASE_ENDINGS = {
+    "а": ("а", "ы", "и", "е", "у", "ой", "ою"),
+    "я": ("я", "и", "е", "ю", "ей", "ею"),
+    "й": ("й", "я", "ю", "ем", "е"),
+    "ь": ("ь", "я", "ю", "ем", "е", "и"),
+}
+_CONSONANT_ENDINGS = ("", "а", "у", "ом", "е")
+_CYRILLIC_CONSONANTS = set("бвгджзклмнпрстфхцчшщ")
+
+
+def name_forms(name: str) -> str:
+    """Регулярное выражение для имени во всех падежах (для русских имён)"""
+    last = name[-1:].lower()
+    if last in _CASE_ENDINGS:
+        stem, endings = name[:-1], _CASE_ENDINGS[last]
+    elif last in _CYRILLIC_CONSONANTS:
+        stem, endings = name, _CONSONANT_ENDINGS
+    else:
+        return re.escape(name)
+    return f"{re.escape(stem)}(?:{'|'.join(endings)})"
+
+
+class GroupFilter:
+    """Решает, обращено ли сообщение в группе к боту.
+
+    Проверки идут от дешёвых к дорогим: разрешена ли группа, ответ на
+    сообщение бота, сущности Telegram (mention, text_mention, bot_command),
+    и только потом одно заранее скомпилированное регулярное выражение с
+    именем бота по границам слов («Слайм, привет», но не «Слаймик»).
+    Необращённые сообщения отбрасываются до агентов и запросов к моделям.
+    """
+
+    def __init__(self, username: str = "", name: str = "", aliases: Optional[List[str]] = None,
+                 allowed_groups: Optional[List[int]] = None):
+        """
+        Args:
+            username: Имя пользователя бота без @ (уточняется через getMe)
+            name: Имя, по которому к боту обращаются в тексте
+            aliases: Другие имена бота
+            allowed_groups: Группы, где бот отвечает (пусто - любые)
+        """
+        self.name = name
+        self.aliases = [alias for alias in (aliases or []) if alias]
+        self.allowed_groups = set(allowed_groups or [])
+        self.bot_id: Optional[int] = None
+        self._set_username(username)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "GroupFilter":
+        bot_config = config.get('bot', {})
+        return cls(
+            username=bot_config.get('username', ""),
+            name=bot_config.get('name', ""),
+            aliases=bot_config.get('aliases', []),
+            allowed_groups=bot_config.get('allowed_groups', []),
+        )
+
+    def _set_username(self, username: str) -> None:
+        self.username = username.lstrip('@')
+        self._mention = f"@{self.username}".lower()
+        names = [re.escape(name) for name in (self.name, *self.aliases) if name]
+        forms = [name_forms(name) for name in (self.name, *self.aliases) if name]
+        if self.username:
+            names.append(re.escape(f"@{self.username}"))
+            forms.append(re.escape(f"@{self.username}"))
+        # (?<!\w) и (?!\w) вместо \b: имя может начинаться с @ или заканчиваться не буквой;
+        # падежные формы считаются обращением («спасибо Слайму»), «Слаймик» - нет
+        self._pattern = re.compile(rf"(?<!\w)(?:{'|'.join(forms)})(?!\w)", re.IGNORECASE) if forms else None
+        # Удаляется только обращение: имя или @username в начале («Слайм, ...») или после
+        # запятой в конце («..., Слайм!»). «что такое слайм?» остаётся как есть
+        alternatives = '|'.join(names)
+        self._strip_patterns = [
+            re.compile(rf"^\W*(?:{alternatives})(?!\w)[\s,:;!.—–-]*", re.IGNORECASE),
+            re.compile(rf"\s*,\s*(?:{alternatives})(?!\w)[\s.!?)]*$", re.IGNORECASE),
+        ] if names else []
+
+    @property
+    def resolved(self) -> bool:
+        return self.bot_id is not None
+
+    async def resolve(self, bot: Bot) -> None:
+        """Узнаёт id и имя пользователя бота (getMe кэшируется в aiogram)"""
+        try:
+            me = await bot.me()
+            self.bot_id = me.id
+            if me.username and me.username.lower() != self.username.lower():
+                self._set_username(me.username)
+        except Exception as e:
+            # id бота - первая часть токена; имя остаётся из конфигурации
+            logger.warning(f"Не удалось получить данные бота, используется конфигурация: {str(e)}")
+            self.bot_id = bot.id
+
+    def is_allowed(self, chat_id: int) -> bool:
+        """Разрешена ли группа"""
+        return not self.allowed_groups or chat_id in self.allowed_groups
+
+    def decide(self, message: Message) -> Tuple[bool, str]:
+        """(обработать ли сообщение, причина) - причина идёт в метрики"""
+        if message.chat.type not in GROUP_CHAT_TYPES:
+            return True, "private"
+        if not self.is_allowed(message.chat.id):
+            return False, "not_allowed"
+
+        reply = message.reply_to_message
+        if reply is not None and reply.from_user is not None and reply.from_user.id == self.bot_id:
+            return True, "reply"
+
+        text = message.text or message.caption
+        if not text:
+            return False, "not_addressed"
+        for entity in message.entities or message.caption_entities or ():
+            if entity.type == "text_mention":
+                if entity.user is not None and entity.user.id == self.bot_id:
+                    return True, "text_mention"
+            elif entity.type == "mention":
+                if entity.extract_from(text).lower() == self._mention:
+                    return True, "mention"
+            elif entity.type == "bot_command" and entity.offset == 0:
+                # /команда@другой_бот адресована другому боту
+                _, _, target = entity.extract_from(text).partition("@")
+                if target and target.lower() != self.username.lower():
+                    return False, "other_bot"
+                return True, "command"
+
+        if self._pattern is not None and self._pattern.search(text) is not None:
+            return True, "name"
+        return False, "not_addressed"
+
+    def strip_address(self, text: str) -> str:
+        """Убирает обращение к боту («Слайм, ...», «@bot ...») из текста"""
+        if not text:
+            return text
+        for pattern in self._strip_patterns:
+            text = pattern.sub(' ', text)
+        return normalize_spaces(text).lstrip(",.:;!-— ")
@@ -0,0 +1,288 @@
+"""
+Определение намерения сообщения: просьба нарисовать картинку или обычный чат.
+
+Первый этап - заранее скомпилированные шаблоны с границами слов, у каждого
+своя уверенность: «создай картинку заката» однозначно, а «нарисуй таблицу
+истинности», «сделай фото меньше» или «сгенерируй» без слова «картинка» могут
+быть и просьбой о тексте, поэтому такие совпадения оцениваются ниже порога.
+Одиночные «создай»/«create» картинкой не считаются, поэтому «создайте план»
+и «recreate» остаются обычным чатом.
+
+Второй, необязательный этап - сравнение эмбеддинга сообщения с примерами
+обоих классов. Он вызывается только для неоднозначных совпадений (уверенность
+от ambiguous_min до threshold); векторы примеров считаются один раз, векторы
+сообщений хранятся в LRU-кэше.
+"""
+import asyncio
+import logging
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from framework.services.metrics import metrics
+from framework.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+IMAGE = "image"
+CHAT = "chat"
+
+INTENT_DECISIONS = metrics.counter("intent_decisions_total", "Решения классификатора намерений", ("intent", "source"))
+
+_RU_DRAW = r"(?:нарису(?:й|йте)|изобрази(?:те)?|намалюй(?:те)?)"
+_RU_MAKE = r"(?:созда(?:й|йте)|сдела(?:й|йте)|сгенериру(?:й|йте)|нарису(?:й|йте))"
+_RU_NOUN = (r"(?:картинк\w*|рисун(?:ок|ка|ке|ком)|иллюстраци\w*|арт|"
+            r"постер\w*|аватар\w*|аватарк\w*|обои|логотип\w*)")
+# «изображение диска», «сделай фото меньше» - не обязательно просьба нарисовать
+_RU_NOUN_AMBIGUOUS = r"(?:изображени\w*|фото(?:графи\w*)?)"
+_EN_DRAW = r"(?:draw|paint|sketch|illustrate)"
+_EN_MAKE = r"(?:generate|create|make|render|draw|paint)"
+_EN_NOUN = (r"(?:image|picture|pic|photo|drawing|illustration|painting|artwork|art|"
+            r"wallpaper|logo|avatar|poster)s?")
+_POLITE = r"(?:(?:пожалуйста|please|бот|bot)\W+)?"
+# Существительное должно завершать фразу («an image of a cat», «a logo for my cafe»), а не
+# определять следующее слово («an image classifier», «image captions»)
+_EN_NOUN_END = r"(?=\s*(?:[.,:;!?—–-]|$)|\s+(?:of|with|showing|where|that|for|in)\b)"
+# «draw conclusions», «draw a line between», «paint over» - не про картинку
+_EN_NOT_FIGURATIVE = (r"(?!\s*(?:an?\s+|the\s+)?(?:conclusions?|attention|parallels?|comparisons?|distinctions?|"
+                      r"inspiration|lines?\s+between|up|out|on|from|over)\b)")
+
+# (шаблон, уверенность): проверяются по порядку, берётся первое совпадение.
+# Промпт - текст после совпадения; определение и значимое существительное
+# («красивую картинку», «логотип») остаются в промпте.
+RULES: List[Tuple["re.Pattern[str]", float]] = [
+    # «создай картинку ...», «generate an image of ...»
+    (re.compile(rf"\b{_RU_MAKE}\s+(?:мне\s+)?(?P<adj>\w+\s+)?(?P<noun>{_RU_NOUN})\b", re.IGNORECASE), 0.95),
+    # Ниже порога: «нарисуй таблицу истинности», «создай изображение диска» решает классификатор
+    (re.compile(rf"\b{_RU_MAKE}\s+(?:мне\s+)?(?P<adj>\w+\s+)?(?P<noun>{_RU_NOUN_AMBIGUOUS})\b", re.IGNORECASE),
+     0.65),
+    (re.compile(rf"\b{_EN_MAKE}\s+(?:me\s+)?(?:an?\s+|the\s+|some\s+)?(?P<adj>\w+\s+)?(?P<noun>{_EN_NOUN})\b{_EN_NOUN_END}",
+                re.IGNORECASE), 0.95),
+    # «нарисуй ...» в начале сообщения
+    (re.compile(rf"^\W*{_POLITE}{_RU_DRAW}\b", re.IGNORECASE), 0.65),
+    # «draw me ...», «paint a sunset ...»: у английского глагола нужен объект
+    (re.compile(rf"^\W*{_POLITE}(?:draw|paint)\s+me\b", re.IGNORECASE), 0.9),
+    (re.compile(rf"^\W*{_POLITE}(?:draw|paint)\b{_EN_NOT_FIGURATIVE}(?=\s+(?:an?|the|some|two|three|my|our)\s+\w)",
+                re.IGNORECASE), 0.8),
+    # «можешь нарисовать ...», «can you draw ...»
+    (re.compile(r"\b(?:можешь|можете|мог\w* бы)\s+(?:\w+\s+)?(?:нарисовать|изобразить)\b", re.IGNORECASE), 0.65),
+    (re.compile(rf"\b(?:can|could|would)\s+you\s+(?:please\s+)?(?:draw|paint)\s+(?:me\s+)?{_EN_NOT_FIGURATIVE}",
+                re.IGNORECASE), 0.85),
+    # «а теперь нарисуй ...» - глагол не в начале
+    (re.compile(rf"\b{_RU_DRAW}\b", re.IGNORECASE), 0.6),
+    # Без слова «картинка» или объекта неоднозначно: «сгенерируй пароль», «generate a summary»,
+    # «draw conclusions», «illustrate recursion», «sketch out a plan»
+    (re.compile(r"^\W*сгенериру(?:й|йте)\b", re.IGNORECASE), 0.6),
+    (re.compile(rf"^\W*{_POLITE}{_EN_DRAW}\b", re.IGNORECASE), 0.5),
+    (re.compile(r"^\W*generate\b", re.IGNORECASE), 0.5),
+    (re.compile(rf"\b{_EN_DRAW}\b", re.IGNORECASE), 0.4),
+    # «создай план», «create a list» - почти всегда текст
+    (re.compile(r"^\W*(?:созда(?:й|йте)|create)\b", re.IGNORECASE), 0.3),
+]
+
+# Слова «картинка», «image» сами по себе ничего не описывают и в промпт не попадают
+_GENERIC_NOUN = re.compile(r"^(?:картинк|изображени|рисун|image|picture|pic|drawing)", re.IGNORECASE)
+# Связки и вежливость в начале промпта, которые не описывают картинку
+_PROMPT_LEAD = re.compile(
+    r"^[\s,:;.!?—–-]*(?:(?:of|with|showing|where|me|please|мне|пожалуйста|где|на котор(?:ой|ом))\b[\s,:;—–-]*)*",
+    re.IGNORECASE
+)
+_PROMPT_TAIL = re.compile(r"[\s,:;.!?—–-]+$")
+
+# Примеры для классификатора по эмбеддингам (переопределяются в конфиге)
+DEFAULT_EXAMPLES: Dict[str, List[str]] = {
+    IMAGE: [
+        "нарисуй лису на опушке зимнего леса",
+        "сгенерируй картинку маяка во время шторма",
+        "сделай изображение замка в стиле акварели",
+        "хочу картинку с горами и озером",
+        "изобрази старый трамвай под дождём",
+        "draw a fox sleeping under a tree",
+        "generate a picture of a castle on a cliff",
+        "paint me a watercolor of a harbor at dawn",
+    ],
+    CHAT: [
+        "составь план тренировок на неделю",
+        "сгенерируй надёжный пин-код",
+        "придумай название для кофейни",
+        "расскажи, как устроен двигатель внутреннего сгорания",
+        "сочини короткое поздравление с днём рождения",
+        "как создать репозиторий на github",
+        "generate unit tests for this function",
+        "create a budget spreadsheet template",
+        "draw conclusions from these survey results",
+        "how do I train an image classifier",
+    ],
+}
+
+
+class IntentResult:
+    """Решение классификатора"""
+
+    __slots__ = ("intent", "confidence", "prompt", "source")
+
+    def __init__(self, intent: str, confidence: float, prompt: Optional[str] = None, source: str = "rules"):
+        self.intent = intent
+        self.confidence = confidence
+        # Описание картинки без слов-триггеров (только для IMAGE)
+        self.prompt = prompt
+        self.source = source
+
+    @property
+    def is_image(self) -> bool:
+        return self.intent == IMAGE
+
+    def __repr__(self) -> str:
+        return f"IntentResult({self.intent!r}, {self.confidence:.2f}, prompt={self.prompt!r}, source={self.source!r})"
+
+
+def match_image_request(text: str) -> Optional[IntentResult]:
+    """Первое подходящее правило: IMAGE с уверенностью правила или None"""
+    for pattern, confidence in RULES:
+        match = pattern.search(text)
+        if match is not None:
+            start = match.end()
+            groups = match.groupdict()
+            if groups.get('adj'):
+                start = match.start('adj')
+            elif groups.get('noun') and not _GENERIC_NOUN.match(groups['noun']):
+                start = match.start('noun')
+            prompt = _PROMPT_LEAD.sub('', text[start:], count=1)
+            return IntentResult(IMAGE, confidence, _PROMPT_TAIL.sub('', prompt))
+    return None
+
+
+def _normalize(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return [x / norm for x in vector] if norm else vector
+
+
+def _similarity(left: List[float], right: List[float]) -> float:
+    """Косинусное сходство нормированных векторов"""
+    return sum(a * b for a, b in zip(left, right))
+
+
+class EmbeddingClassifier:
+    """Сравнивает эмбеддинг сообщения с примерами каждого класса.
+
+    Вероятность картинки - логистическая функция от разности лучших сходств
+    с примерами IMAGE и CHAT; temperature задаёт её крутизну.
+    """
+
+    def __init__(self, ollama_client, model_name: str = "nomic-embed-text",
+                 examples: Optional[Dict[str, List[str]]] = None,
+                 temperature: float = 0.05, cache_size: int = 1024):
+        """
+        Args:
+            ollama_client: Клиент Ollama с методом embeddings
+            model_name: Модель эмбеддингов
+            examples: Примеры сообщений по классам (IMAGE и CHAT)
+            temperature: Масштаб разности сходств
+            cache_size: Сколько векторов сообщений хранить
+        """
+        self.ollama_client = ollama_client
+        self.model_name = model_name
+        self.examples = examples or DEFAULT_EXAMPLES
+        self.temperature = temperature
+        self.cache_size = cache_size
+        self._prototypes: Optional[Dict[str, List[List[float]]]] = None
+        self._prototypes_lock = asyncio.Lock()
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    async def _embed(self, text: str) -> List[float]:
+        vector = self._cache.get(text)
+        if vector is not None:
+            self._cache.move_to_end(text)
+            return vector
+        vector = _normalize(await self.ollama_client.embeddings(text, self.model_name))
+        self._cache[text] = vector
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return vector
+
+    async def _load_prototypes(self) -> Dict[str, List[List[float]]]:
+        # Векторы примеров считаются один раз; одновременные запросы ждут первый
+        if self._prototypes is None:
+            async with self._prototypes_lock:
+                if self._prototypes is None:
+                    prototypes = {}
+                    for intent, texts in self.examples.items():
+                        prototypes[intent] = [
+                            _normalize(await self.ollama_client.embeddings(text, self.model_name))
+                            for text in texts
+                        ]
+                    self._prototypes = prototypes
+                    logger.info("Векторы примеров намерений посчитаны моделью %s", self.model_name)
+        return self._prototypes
+
+    async def image_probability(self, text: str) -> float:
+        prototypes = await self._load_prototypes()
+        vector = await self._embed(text.strip().lower())
+        image = max(_similarity(vector, p) for p in prototypes[IMAGE])
+        chat = max(_similarity(vector, p) for p in prototypes[CHAT])
+        return 1.0 / (1.0 + math.exp(-(image - chat) / self.temperature))
+
+
+class IntentRouter:
+    """Решает, запускать ли перевод и генерацию изображения для сообщения"""
+
+    def __init__(self, threshold: float = 0.7, classifier: Optional[EmbeddingClassifier] = None,
+                 ambiguous_min: float = 0.3):
+        """
+        Args:
+            threshold: Минимальная уверенность для генерации изображения
+            classifier: Классификатор по эмбеддингам для неоднозначных сообщений
+            ambiguous_min: Совпадения с уверенностью ниже этой классификатору не передаются
+        """
+        self.threshold = threshold
+        self.classifier = classifier
+        self.ambiguous_min = ambiguous_min
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], ollama_client=None) -> "IntentRouter":
+        intent_config = config.get('intent', {})
+        embeddings_config = intent_config.get('embeddings', {})
+        classifier = None
+        if embeddings_config.get('enabled', False) and ollama_client is not None:
+            classifier = EmbeddingClassifier(
+                ollama_client,
+                model_name=embeddings_config.get('model', "nomic-embed-text"),
+                examples=embeddings_config.get('examples'),
+                temperature=embeddings_config.get('temperature', 0.05),
+                cache_size=embeddings_config.get('cache_size', 1024),
+            )
+        return cls(
+            threshold=intent_config.get('threshold', 0.7),
+            classifier=classifier,
+            ambiguous_min=embeddings_config.get('ambiguous_min', 0.3),
+        )
+
+    def _decide(self, match: Optional[IntentResult], confidence: float, source: str) -> IntentResult:
+        if match is not None and confidence >= self.threshold and match.prompt:
+            result = IntentResult(IMAGE, confidence, match.prompt, source)
+        else:
+            result = IntentResult(CHAT, 1.0 - confidence, source=source)
+        INTENT_DECISIONS.inc(intent=result.intent, source=source)
+        return result
+
+    def classify_rules(self, text: str) -> IntentResult:
+        """Решение только по шаблонам"""
+        match = match_image_request(text)
+        return self._decide(match, match.confidence if match else 0.0, "rules")
+
+    async def classify(self, text: str) -> IntentResult:
+        """Решение по шаблонам, при неоднозначном совпадении - по эмбеддингам"""
+        match = match_image_request(text)
+        if match is None:
+            return self._decide(None, 0.0, "rules")
+        if self.classifier is None or not (self.ambiguous_min <= match.confidence < self.threshold):
+            return self._decide(match, match.confidence, "rules")
+        with tracer.span("intent.embeddings", rule_confidence=match.confidence):
+            try:
+                probability = await self.classifier.image_probability(text)
+            except Exception as e:
+                # Без модели эмбеддингов остаётся решение по шаблонам
+                logger.warning(f"Классификатор намерений недоступен: {str(e)}")
+                return self._decide(match, match.confidence, "rules")
+        logger.debug("Намерение %r: шаблон %.2f, эмбеддинги %.2f", text[:100], match.confidence, probability)
+        return self._decide(match, probability, "embeddings")
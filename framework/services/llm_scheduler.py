@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import contextvars
+import itertools
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+from framework.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    "llm_queue_wait_seconds", "Ожидание слота для запроса к модели", ("priority",)
+)
+
+# Классы приоритета: чем меньше ранг, тем раньше запрос получает слот
+INTERACTIVE = "interactive"
+GROUP = "group"
+BACKGROUND = "background"
+
+PRIORITY_RANKS = {INTERACTIVE: 0, GROUP: 1, BACKGROUND: 2}
+
+_current_priority: contextvars.ContextVar[str] = contextvars.ContextVar("llm_priority", default=INTERACTIVE)
+
+
+def current_priority() -> str:
+    """Класс приоритета текущей задачи"""
+    return _current_priority.get()
+
+
+@contextlib.contextmanager
+def priority(name: str) -> Iterator[None]:
+    """Выполняет вложенные запросы к LLM с заданным приоритетом.
+
+    Значение наследуют и задачи, созданные внутри блока.
+    """
+    if name not in PRIORITY_RANKS:
+        raise ValueError(f"Неизвестный класс приоритета: {name}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def priority_for_chat(chat_id: Optional[int]) -> str:
+    """Личный чат - интерактивный приоритет, группа - групповой.
+
+    У личных чатов Telegram идентификатор положительный, у групп - отрицательный.
+    """
+    return GROUP if chat_id is not None and chat_id < 0 else INTERACTIVE
+
+
+class _Waiter:
+    """Запрос, ожидающий слот"""
+
+    __slots__ = ("priority", "model", "rank", "enqueued_at", "seq", "future")
+
+    def __init__(self, priority: str, model: Optional[str], seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.model = model
+        self.rank = PRIORITY_RANKS[priority]
+        self.enqueued_at = time.monotonic()
+        self.seq = seq
+        self.future = future
+
+
+class PriorityScheduler:
+    """Планировщик запросов к LLM с классами приоритета.
+
+    Одновременно выполняется не более max_concurrent запросов, и у каждого
+    класса есть собственный предел. Свободный слот получает ожидающий запрос
+    с наименьшим рангом; ранг уменьшается на единицу за каждые aging_seconds
+    ожидания, поэтому фоновые задачи не голодают.
+
+    Если задана функция affinity, среди запросов одного класса первыми идут
+    запросы к уже загруженным моделям - так реже приходится менять модель в памяти.
+    """
+
+    DEFAULT_LIMITS = {INTERACTIVE: 2, GROUP: 2, BACKGROUND: 1}
+
+    def __init__(self, max_concurrent: int = 2, limits: Optional[Dict[str, int]] = None,
+                 aging_seconds: float = 10.0, window: int = 200):
+        """
+        Args:
+            max_concurrent: Общее число одновременных запросов
+            limits: Предел одновременных запросов для каждого класса
+            aging_seconds: За сколько секунд ожидания ранг запроса повышается на один класс
+            window: Сколько последних замеров ожидания хранить для статистики
+        """
+        self.max_concurrent = max_concurrent
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.aging_seconds = aging_seconds
+        # Загружена ли модель; устанавливается менеджером размещения моделей
+        self.affinity: Optional[Callable[[Optional[str]], bool]] = None
+        self.running = 0
+        self._running_by_class = {name: 0 for name in PRIORITY_RANKS}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._waits: Dict[str, Deque[float]] = {name: deque(maxlen=window) for name in PRIORITY_RANKS}
+        self._completed = {name: 0 for name in PRIORITY_RANKS}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "PriorityScheduler":
+        """Создаёт планировщик по секции scheduler конфигурации"""
+        scheduler_config = config.get('scheduler', {})
+        return cls(
+            max_concurrent=scheduler_config.get('max_concurrent', 2),
+            limits=scheduler_config.get('limits'),
+            aging_seconds=scheduler_config.get('aging_seconds', 10.0),
+        )
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority_name: Optional[str] = None, model: Optional[str] = None) -> AsyncIterator[None]:
+        """Ждёт слот для запроса к модели и освобождает его по завершении"""
+        name = priority_name or current_priority()
+        waiter = _Waiter(name, model, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот уже выдан, но задачу отменили раньше, чем она его заняла
+                self._release(name)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+        waited = time.monotonic() - waiter.enqueued_at
+        self._waits[name].append(waited)
+        QUEUE_WAIT_SECONDS.observe(waited, priority=name)
+        if waited > self.aging_seconds:
+            logger.debug("Запрос класса %s ждал слот %.1fs", name, waited)
+        try:
+            yield
+        finally:
+            self._release(name)
+
+    def _effective_rank(self, waiter: _Waiter, now: float) -> float:
+        """Ранг с учётом времени ожидания"""
+        if self.aging_seconds <= 0:
+            return waiter.rank
+        return waiter.rank - (now - waiter.enqueued_at) / self.aging_seconds
+
+    def _order_key(self, waiter: _Waiter, now: float) -> tuple:
+        """Порядок выдачи слотов: класс с учётом ожидания, затем загруженная модель, затем очередь"""
+        rank = self._effective_rank(waiter, now)
+        if self.affinity is None:
+            return (rank, waiter.seq)
+        resident = self.affinity(waiter.model)
+        return (math.floor(rank), 0 if resident else 1, waiter.seq)
+
+    def _dispatch(self) -> None:
+        """Выдаёт свободные слоты ожидающим запросам"""
+        # Отменённые запросы могут ещё не успеть убрать себя из очереди
+        self._waiters = [w for w in self._waiters if not w.future.done()]
+        while self.running < self.max_concurrent and self._waiters:
+            now = time.monotonic()
+            eligible = [w for w in self._waiters
+                        if self._running_by_class[w.priority] < self.limits.get(w.priority, self.max_concurrent)]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: self._order_key(w, now))
+            self._waiters.remove(waiter)
+            self.running += 1
+            self._running_by_class[waiter.priority] += 1
+            waiter.future.set_result(None)
+
+    def _release(self, name: str) -> None:
+        self.running -= 1
+        self._running_by_class[name] -= 1
+        self._completed[name] += 1
+        self._dispatch()
+
+    @staticmethod
+    def _quantile(ordered: List[float], q: float) -> Optional[float]:
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Очередь, выполняющиеся запросы и время ожидания по классам"""
+        result = {}
+        for name in PRIORITY_RANKS:
+            waits = sorted(self._waits[name])
+            result[name] = {
+                "queued": sum(1 for w in self._waiters if w.priority == name),
+                "running": self._running_by_class[name],
+                "limit": self.limits.get(name, self.max_concurrent),
+                "completed": self._completed[name],
+                "wait_avg": sum(waits) / len(waits) if waits else None,
+                "wait_p95": self._quantile(waits, 0.95),
+                "wait_max": waits[-1] if waits else None,
+            }
+        return result
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, Optional
+from framework.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Корень репозитория: кадры из этих файлов считаются кодом бота
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LOOP_LAG_SECONDS = metrics.histogram(
+    "event_loop_lag_seconds", "Опоздание пробуждения цикла событий",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_STALLS = metrics.counter("event_loop_stalls_total", "Блокировки цикла событий дольше порога", ("site",))
+LOOP_STALL_SECONDS = metrics.histogram("event_loop_stall_seconds", "Длительность блокировок цикла событий", ("site",))
+
+
+def _is_project_frame(filename: str) -> bool:
+    return filename.startswith(PROJECT_ROOT) and "site-packages" not in filename
+
+
+class LoopMonitor:
+    """Сторожевой таймер цикла событий.
+
+    Корутина-пульс просыпается каждые interval секунд и записывает, насколько
+    позже она проснулась (event_loop_lag_seconds). Отдельный поток следит за
+    пульсом: если его нет дольше interval + threshold, цикл заблокирован, и
+    поток снимает стек потока цикла прямо во время блокировки. Когда цикл
+    освобождается, в лог пишется длительность блокировки, текущая задача и
+    стек, а в метрики - место блокировки (ближайший кадр кода бота).
+    """
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, stack_limit: int = 25):
+        """
+        Args:
+            interval: Период пульса в секундах
+            threshold: Блокировка дольше этого числа секунд считается зависанием
+            stack_limit: Сколько кадров стека писать в лог
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_limit = stack_limit
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Снимок стека текущей блокировки; пишет поток-сторож, читает пульс
+        self._stall: Optional[Dict[str, Any]] = None
+        self.stalls = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["LoopMonitor"]:
+        """Создаёт монитор по секции loop_monitor конфигурации (None, если выключен)"""
+        monitor_config = config.get('loop_monitor', {})
+        if not monitor_config.get('enabled', True):
+            return None
+        return cls(
+            interval=monitor_config.get('interval', 0.1),
+            threshold=monitor_config.get('threshold', 0.25),
+            stack_limit=monitor_config.get('stack_limit', 25),
+        )
+
+    def start(self) -> None:
+        """Запускает пульс и поток-сторож; вызывается внутри работающего цикла"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Монитор цикла событий запущен: порог %.0f мс", self.threshold * 1000)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            started = self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            # Снимок относится к этому пробуждению, только если снят после started
+            stall, self._stall = self._stall, None
+            if stall is not None and stall["beat"] != started:
+                stall = None
+            if lag >= self.threshold:
+                self._report(lag, stall)
+
+    def _watch(self) -> None:
+        """Поток-сторож: снимает стек цикла, пока тот заблокирован"""
+        while not self._stop.wait(self.interval / 2):
+            beat = self._last_beat
+            if time.monotonic() - beat - self.interval >= self.threshold and self._stall is None:
+                stall = self._capture()
+                if stall is not None:
+                    stall["beat"] = beat
+                    self._stall = stall
+
+    def _capture(self) -> Optional[Dict[str, Any]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        site = "unknown"
+        for entry in reversed(stack):
+            if _is_project_frame(entry.filename):
+                site = f"{os.path.relpath(entry.filename, PROJECT_ROOT)}:{entry.name}"
+                break
+        else:
+            if stack:
+                site = f"{os.path.basename(stack[-1].filename)}:{stack[-1].name}"
+        task = None
+        try:
+            # Чтение без блокировки: нужна только подсказка, какая задача выполняется
+            current = asyncio.current_task(self._loop)
+            if current is not None:
+                coro = current.get_coro()
+                task = f"{current.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        except Exception:
+            pass
+        return {"site": site, "task": task, "stack": "".join(traceback.format_list(stack[-self.stack_limit:]))}
+
+    def _report(self, lag: float, stall: Optional[Dict[str, Any]]) -> None:
+        self.stalls += 1
+        site = stall["site"] if stall else "unknown"
+        LOOP_STALLS.inc(site=site)
+        LOOP_STALL_SECONDS.observe(lag, site=site)
+        if stall:
+            logger.warning(
+                "Цикл событий был заблокирован на %.0f мс в %s, задача %s\n%s",
+                lag * 1000, site, stall["task"], stall["stack"]
+            )
+        else:
+            logger.warning("Цикл событий был заблокирован на %.0f мс", lag * 1000)
@@ -0,0 +1,460 @@
+import asyncio
+import itertools
+import logging
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.methods.base import TelegramMethod
+from aiogram.types import Message, ReplyParameters
+from framework.services.metrics import metrics
+from framework.services.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_REQUEST_SECONDS = metrics.histogram(
+    "telegram_request_seconds", "Время запроса к Bot API", ("method",)
+)
+TELEGRAM_REQUESTS = metrics.counter("telegram_requests_total", "Запросы к Bot API", ("method", "status"))
+TELEGRAM_QUEUE_SECONDS = metrics.histogram(
+    "telegram_send_queue_seconds", "Ожидание запроса в очереди отправки", ("method",)
+)
+TELEGRAM_QUEUED = metrics.gauge("telegram_send_queued", "Запросы в очереди отправки")
+TELEGRAM_IN_PROGRESS = metrics.gauge("telegram_requests_in_progress", "Запросы к Bot API в работе")
+
+# Максимальная длина текста сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
+
+# Тег или HTML-сущность: внутри них текст резать нельзя
+_HTML_TOKEN = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*>|&#?\w+;")
+_SEPARATORS = ("\n\n", "\n", " ")
+
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH, html: bool = False) -> List[str]:
+    """Делит текст на части не длиннее limit.
+
+    Границу ищет по абзацу, затем по строке, затем по пробелу; слово длиннее
+    limit режется как есть. С html=True текст не режется внутри тегов и
+    сущностей, а открытые на границе теги закрываются в конце части и
+    открываются заново в начале следующей.
+    """
+    if html:
+        return _split_html(text, limit)
+    parts = []
+    while len(text) > limit:
+        cut = -1
+        for separator in _SEPARATORS:
+            cut = text.rfind(separator, 0, limit + 1)
+            if cut > 0:
+                break
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text or not parts:
+        parts.append(text)
+    return parts
+
+
+def _closing(stack: Tuple[Tuple[str, str], ...]) -> str:
+    return "".join(f"</{name}>" for name, _ in reversed(stack))
+
+
+def _apply_tag(stack: Tuple[Tuple[str, str], ...], token: "re.Match[str]") -> Tuple[Tuple[str, str], ...]:
+    """Стек открытых тегов после открывающего или закрывающего тега"""
+    name = token.group(2).lower()
+    if not token.group(1):
+        return (*stack, (name, token.group(0)))
+    for index in range(len(stack) - 1, -1, -1):
+        if stack[index][0] == name:
+            return stack[:index] + stack[index + 1:]
+    return stack
+
+
+def _split_html(text: str, limit: int) -> List[str]:
+    if len(text) <= limit:
+        return [text]
+    parts = []
+    opened: Tuple[Tuple[str, str], ...] = ()  # (имя тега, открывающий тег)
+    while True:
+        # Теги, закрытые сразу после границы, в следующей части не нужны
+        token = _HTML_TOKEN.match(text)
+        while opened and token is not None and token.group(1) and token.group(2).lower() == opened[-1][0]:
+            opened = opened[:-1]
+            text = text[token.end():].lstrip()
+            token = _HTML_TOKEN.match(text)
+        if parts and not text:
+            return parts
+        prefix = "".join(tag for _, tag in opened)
+        stack = opened
+        closing_length = len(_closing(stack))
+        # Последняя подходящая граница для каждого разделителя и без разделителя
+        best: Dict[Optional[str], Tuple[int, Tuple[Tuple[str, str], ...]]] = {}
+        position = 0
+        # Часть из одних тегов и пробелов Telegram не примет
+        content = False
+        fits = True
+        for token in itertools.chain(_HTML_TOKEN.finditer(text), (None,)):
+            # Границы внутри текста между тегами: от position до начала следующего тега
+            segment_end = token.start() if token is not None else len(text)
+            lowest = position
+            if not content:
+                stripped = text[position:segment_end].lstrip()
+                if stripped:
+                    content = True
+                    lowest = segment_end - len(stripped) + 1
+            highest = min(segment_end, limit - len(prefix) - closing_length)
+            if content and lowest <= highest:
+                best[None] = (highest, stack)
+                for separator in _SEPARATORS:
+                    cut = text.rfind(separator, lowest, min(segment_end, highest + len(separator)))
+                    if cut >= lowest:
+                        best[separator] = (cut, stack)
+            if len(prefix) + segment_end > limit:
+                fits = False
+                break
+            if token is None:
+                break
+            position = token.end()
+            if token.group(2) is None:
+                content = True
+            else:
+                stack = _apply_tag(stack, token)
+                closing_length = len(_closing(stack))
+        if fits and len(prefix) + len(text) + closing_length <= limit:
+            parts.append(prefix + text)
+            return parts
+
+        cut, stack = next((best[key] for key in (*_SEPARATORS, None) if key in best), (0, opened))
+        if cut == 0:
+            # Не помещается даже первый символ с тегами вокруг: отдаём его отдельной частью
+            stack = opened
+            while cut < len(text):
+                token = _HTML_TOKEN.match(text, cut)
+                if token is None or token.group(2) is None:
+                    cut = token.end() if token is not None else cut + 1
+                    break
+                stack = _apply_tag(stack, token)
+                cut = token.end()
+        parts.append(prefix + text[:cut].rstrip() + _closing(stack))
+        opened = stack
+        text = text[cut:].lstrip()
+        if not text:
+            return parts
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Через сколько секунд будет доступен токен"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    """Запрос к Bot API, ожидающий отправки"""
+
+    __slots__ = ("method", "future", "attempts", "edit_key", "enqueued_at", "span")
+
+    def __init__(self, method: TelegramMethod, future: asyncio.Future, edit_key: Optional[Tuple[int, int]] = None):
+        self.method = method
+        self.future = future
+        self.attempts = 0
+        self.edit_key = edit_key
+        self.enqueued_at = time.monotonic()
+        # Участок трассы обработчика: отправка выполняется в цикле отправителя, вне его контекста
+        self.span = tracer.current_span()
+
+
+class MessageSender:
+    """Единая очередь исходящих запросов к Telegram с учётом ограничений частоты.
+
+    У каждого чата своё ведро токенов (для личных чатов и групп лимиты разные),
+    плюс общее ведро на весь бот. Запросы одного чата отправляются строго по
+    очереди, разные чаты обслуживаются по кругу. При ответе 429 (RetryAfter)
+    чат ставится на паузу, а запрос возвращается в начало его очереди -
+    обработчики при этом не ждут. Длинные тексты делятся на части, правки одного
+    сообщения, ещё не отправленные, заменяются последней. Каждый вызов
+    возвращает future с результатом доставки.
+    """
+
+    def __init__(self, bot: Bot, global_rate: float = 25.0, global_burst: float = 30,
+                 private_rate: float = 1.0, private_burst: float = 3,
+                 group_rate: float = 20 / 60, group_burst: float = 5,
+                 max_concurrent: int = 8, max_retries: int = 3):
+        """
+        Args:
+            bot: Экземпляр бота
+            global_rate: Запросов в секунду на весь бот
+            global_burst: Сколько запросов можно отправить подряд без ожидания
+            private_rate: Запросов в секунду в личный чат
+            private_burst: Запросов подряд в личный чат
+            group_rate: Запросов в секунду в группу
+            group_burst: Запросов подряд в группу
+            max_concurrent: Сколько запросов выполняется одновременно
+            max_retries: Повторов при сетевых ошибках и ответах 429
+        """
+        self.bot = bot
+        self.private_rate = private_rate
+        self.private_burst = private_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, global_burst)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._queues: "OrderedDict[int, Deque[_Job]]" = OrderedDict()
+        self._paused_until: Dict[int, float] = {}
+        self._busy: Set[int] = set()
+        self._pending_edits: Dict[Tuple[int, int], _Job] = {}
+        self._inflight = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "failed": 0, "retry_after": 0, "edits_coalesced": 0, "split": 0}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], bot: Bot) -> "MessageSender":
+        """Создаёт отправитель по секции sender конфигурации"""
+        sender_config = config.get('sender', {})
+        return cls(
+            bot,
+            global_rate=sender_config.get('global_rate', 25.0),
+            global_burst=sender_config.get('global_burst', 30),
+            private_rate=sender_config.get('private_rate', 1.0),
+            private_burst=sender_config.get('private_burst', 3),
+            group_rate=sender_config.get('group_rate', 20 / 60),
+            group_burst=sender_config.get('group_burst', 5),
+            max_concurrent=sender_config.get('max_concurrent', 8),
+            max_retries=sender_config.get('max_retries', 3),
+        )
+
+    # Публичный интерфейс
+
+    def send_text(self, chat_id: int, text: str, reply_to_message_id: Optional[int] = None,
+                  **kwargs: Any) -> "asyncio.Future[List[Message]]":
+        """Отправляет текст, при необходимости разбив его на несколько сообщений.
+
+        Ответом на reply_to_message_id делается только первая часть.
+        Future завершается списком отправленных сообщений.
+        """
+        parts = split_text(text, html=self._is_html(kwargs))
+        if len(parts) > 1:
+            self.stats["split"] += 1
+        futures = []
+        for index, part in enumerate(parts):
+            reply = None
+            if index == 0 and reply_to_message_id is not None:
+                reply = ReplyParameters(message_id=reply_to_message_id, allow_sending_without_reply=True)
+            method = SendMessage(chat_id=chat_id, text=part, reply_parameters=reply, **kwargs)
+            futures.append(self._enqueue(chat_id, method))
+        result = asyncio.gather(*futures)
+        result.add_done_callback(self._retrieve_exception)
+        return result
+
+    def answer(self, message: Message, text: str, reply: bool = False, **kwargs: Any) -> "asyncio.Future[List[Message]]":
+        """Ответ на входящее сообщение; reply=True - цитированием"""
+        if message.is_topic_message:
+            kwargs.setdefault('message_thread_id', message.message_thread_id)
+        return self.send_text(message.chat.id, text, message.message_id if reply else None, **kwargs)
+
+    def edit_text(self, chat_id: int, message_id: int, text: str, **kwargs: Any) -> asyncio.Future:
+        """Изменяет текст сообщения.
+
+        Если предыдущая правка этого сообщения ещё ждёт отправки, она заменяется
+        новой, и оба вызова получают общий future.
+        """
+        method = EditMessageText(chat_id=chat_id, message_id=message_id, text=split_text(text, html=self._is_html(kwargs))[0], **kwargs)
+        key = (chat_id, message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None and not pending.future.done():
+            pending.method = method
+            self.stats["edits_coalesced"] += 1
+            return pending.future
+        return self._enqueue(chat_id, method, edit_key=key)
+
+    def call(self, chat_id: int, method: TelegramMethod) -> asyncio.Future:
+        """Отправляет произвольный запрос Bot API через очередь чата"""
+        return self._enqueue(chat_id, method)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """Дожидается отправки очереди и останавливает отправитель"""
+        deadline = time.monotonic() + timeout
+        while (self._inflight or any(self._queues.values())) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def queue_stats(self) -> Dict[str, Any]:
+        """Размер очереди и счётчики отправок"""
+        return {
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "chats": len(self._queues),
+            "inflight": self._inflight,
+            **self.stats,
+        }
+
+    def _is_html(self, kwargs: Dict[str, Any]) -> bool:
+        """Размечен ли текст HTML: явный parse_mode или значение по умолчанию бота"""
+        default = self.bot.default.parse_mode if self.bot.default else None
+        parse_mode = kwargs.get('parse_mode', default)
+        return isinstance(parse_mode, str) and parse_mode.lower() == "html"
+
+    # Очередь
+
+    def _enqueue(self, chat_id: int, method: TelegramMethod,
+                 edit_key: Optional[Tuple[int, int]] = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(self._retrieve_exception)
+        job = _Job(method, future, edit_key)
+        self._queues.setdefault(chat_id, deque()).append(job)
+        TELEGRAM_QUEUED.inc()
+        if edit_key is not None:
+            self._pending_edits[edit_key] = job
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        self._wakeup.set()
+        return future
+
+    @staticmethod
+    def _retrieve_exception(future: asyncio.Future) -> None:
+        """Логирует ошибку доставки, даже если вызывающий не ждёт future"""
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug("Запрос к Telegram не выполнен: %s", future.exception())
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # У групп и каналов идентификатор отрицательный
+            if chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.private_rate, self.private_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _run(self) -> None:
+        while True:
+            delay = self._dispatch()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self) -> Optional[float]:
+        """Отправляет всё, что позволяют лимиты; возвращает время до следующей попытки"""
+        now = time.monotonic()
+        next_delay: Optional[float] = None
+        for chat_id in list(self._queues):
+            queue = self._queues[chat_id]
+            if chat_id in self._busy:
+                continue
+            if not queue:
+                # Очередь пуста: забываем чат, когда его ведро восстановилось
+                del self._queues[chat_id]
+                self._paused_until.pop(chat_id, None)
+                if self._bucket(chat_id).is_full(now):
+                    del self._chat_buckets[chat_id]
+                continue
+            if self._inflight >= self.max_concurrent:
+                break
+            wait = max(
+                self._paused_until.get(chat_id, 0.0) - now,
+                self._bucket(chat_id).wait_time(now),
+                self._global_bucket.wait_time(now),
+            )
+            if wait > 0:
+                next_delay = wait if next_delay is None else min(next_delay, wait)
+                continue
+
+            job = queue.popleft()
+            TELEGRAM_QUEUED.dec()
+            if job.edit_key is not None and self._pending_edits.get(job.edit_key) is job:
+                del self._pending_edits[job.edit_key]
+            if job.future.done():
+                continue
+            self._bucket(chat_id).consume(now)
+            self._global_bucket.consume(now)
+            self._busy.add(chat_id)
+            self._inflight += 1
+            TELEGRAM_IN_PROGRESS.inc()
+            TELEGRAM_QUEUE_SECONDS.observe(now - job.enqueued_at, method=type(job.method).__name__)
+            # Обслуженный чат уходит в конец, чтобы чаты чередовались
+            self._queues.move_to_end(chat_id)
+            asyncio.create_task(self._send(chat_id, job))
+        return next_delay
+
+    async def _send(self, chat_id: int, job: _Job) -> None:
+        method_name = type(job.method).__name__
+        started = time.monotonic()
+        status = "ok"
+        try:
+            with tracer.span("telegram.send", parent=job.span, method=method_name, chat_id=chat_id,
+                             attempt=job.attempts,
+                             queue_ms=round((started - job.enqueued_at) * 1000, 1)):
+                result = await self.bot(job.method)
+        except TelegramRetryAfter as e:
+            status = "retry_after"
+            self.stats["retry_after"] += 1
+            logger.warning(f"Telegram ограничил частоту в чате {chat_id}: пауза {e.retry_after}s")
+            self._paused_until[chat_id] = time.monotonic() + e.retry_after
+            self._retry(chat_id, job, e)
+        except TelegramNetworkError as e:
+            status = "network_error"
+            self._paused_until[chat_id] = time.monotonic() + 2 ** job.attempts
+            self._retry(chat_id, job, e)
+        except Exception as e:
+            status = "error"
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.stats["sent"] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            TELEGRAM_REQUEST_SECONDS.observe(time.monotonic() - started, method=method_name)
+            TELEGRAM_REQUESTS.inc(method=method_name, status=status)
+            TELEGRAM_IN_PROGRESS.dec()
+            self._busy.discard(chat_id)
+            self._inflight -= 1
+            self._wakeup.set()
+
+    def _retry(self, chat_id: int, job: _Job, error: Exception) -> None:
+        """Возвращает запрос в начало очереди чата или завершает его ошибкой"""
+        job.attempts += 1
+        if job.attempts > self.max_retries:
+            self.stats["failed"] += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+            return
+        self._queues.setdefault(chat_id, deque()).appendleft(job)
+        TELEGRAM_QUEUED.inc()
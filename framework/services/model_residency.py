@@ -0,0 +1,162 @@
+import aiohttp
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+KeepAlive = Union[str, int]
+
+
+class _HostState:
+    """Модели, загруженные на одном сервере Ollama, в порядке последнего использования"""
+
+    def __init__(self):
+        self.loaded: "OrderedDict[str, int]" = OrderedDict()
+        self.refreshed_at = 0.0
+
+
+class ModelResidencyManager:
+    """Управление моделями, находящимися в памяти Ollama.
+
+    Знает, какие модели загружены на каждом сервере (по /api/ps) и сколько
+    видеопамяти они занимают. Для каждого запроса подбирает keep_alive:
+    закреплённая (горячая) модель остаётся в памяти постоянно, остальные -
+    на обычное время, а если вместе с закреплёнными они не помещаются в
+    бюджет видеопамяти - ненадолго, чтобы быстрее освободить место.
+    Считает загрузки и вытеснения моделей.
+    """
+
+    def __init__(self, pinned: Optional[Iterable[str]] = None, vram_budget_mb: Optional[float] = None,
+                 keep_alive: KeepAlive = "5m", pinned_keep_alive: KeepAlive = -1,
+                 evict_keep_alive: KeepAlive = "30s", refresh_interval: float = 10.0,
+                 probe_timeout: float = 5.0):
+        """
+        Args:
+            pinned: Модели, которые нужно держать загруженными
+            vram_budget_mb: Бюджет видеопамяти сервера в МБ (None - не ограничен)
+            keep_alive: keep_alive для обычных моделей
+            pinned_keep_alive: keep_alive для закреплённых моделей (-1 - без выгрузки)
+            evict_keep_alive: keep_alive для моделей, не помещающихся рядом с закреплёнными
+            refresh_interval: Как часто обновлять список загруженных моделей, в секундах
+            probe_timeout: Таймаут запроса /api/ps
+        """
+        self.pinned = set(pinned or [])
+        self.vram_budget_mb = vram_budget_mb
+        self.keep_alive = keep_alive
+        self.pinned_keep_alive = pinned_keep_alive
+        self.evict_keep_alive = evict_keep_alive
+        self.refresh_interval = refresh_interval
+        self.probe_timeout = probe_timeout
+        self._hosts: Dict[str, _HostState] = {}
+        # Размеры моделей в видеопамяти (МБ), известные по /api/ps
+        self._sizes: Dict[str, float] = {}
+        self.loads: Dict[str, int] = {}
+        self.swaps: Dict[str, int] = {}
+        self.evictions: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], pinned: Optional[Iterable[str]] = None) -> Optional["ModelResidencyManager"]:
+        """Создаёт менеджер по секции residency конфигурации (None, если отключён).
+
+        Если в конфигурации не указаны закреплённые модели, используются pinned.
+        """
+        residency_config = config.get('residency', {})
+        if not residency_config.get('enabled', True):
+            return None
+        return cls(
+            pinned=residency_config.get('pinned') or pinned,
+            vram_budget_mb=residency_config.get('vram_budget_mb'),
+            keep_alive=residency_config.get('keep_alive', "5m"),
+            pinned_keep_alive=residency_config.get('pinned_keep_alive', -1),
+            evict_keep_alive=residency_config.get('evict_keep_alive', "30s"),
+            refresh_interval=residency_config.get('refresh_interval', 10.0),
+        )
+
+    def _host(self, base_url: str) -> _HostState:
+        host = self._hosts.get(base_url)
+        if host is None:
+            host = self._hosts[base_url] = _HostState()
+        return host
+
+    def is_resident(self, model: Optional[str]) -> bool:
+        """Загружена ли модель хотя бы на одном сервере"""
+        return bool(model) and any(model in host.loaded for host in self._hosts.values())
+
+    def keep_alive_for(self, model: str) -> KeepAlive:
+        """keep_alive для запроса к модели"""
+        if model in self.pinned:
+            return self.pinned_keep_alive
+        if self.vram_budget_mb is not None and model in self._sizes:
+            pinned_size = sum(self._sizes.get(name, 0.0) for name in self.pinned)
+            if pinned_size + self._sizes[model] > self.vram_budget_mb:
+                return self.evict_keep_alive
+        return self.keep_alive
+
+    async def refresh(self, base_url: str) -> None:
+        """Обновляет список загруженных моделей сервера по /api/ps"""
+        host = self._host(base_url)
+        host.refreshed_at = time.monotonic()
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"{base_url}/api/ps") as response:
+                    if response.status != 200:
+                        return
+                    data = await response.json()
+        except (aiohttp.ClientError, OSError, asyncio.TimeoutError) as e:
+            logger.debug(f"Не удалось получить список моделей {base_url}: {str(e)}")
+            return
+
+        loaded = OrderedDict()
+        for item in data.get('models', []):
+            name = item.get('name') or item.get('model')
+            if not name:
+                continue
+            size = item.get('size_vram') or item.get('size') or 0
+            self._sizes[name] = size / (1024 * 1024)
+            # Сохраняем известный порядок использования, новые модели - в начало
+            loaded[name] = self._sizes[name]
+        for name in [n for n in host.loaded if n in loaded]:
+            loaded.move_to_end(name)
+        host.loaded = loaded
+
+    async def prepare(self, base_url: str, model: str) -> KeepAlive:
+        """Учитывает предстоящий запрос к модели и возвращает keep_alive для него"""
+        host = self._host(base_url)
+        if time.monotonic() - host.refreshed_at >= self.refresh_interval:
+            await self.refresh(base_url)
+
+        if model in host.loaded:
+            host.loaded.move_to_end(model)
+        else:
+            self.loads[model] = self.loads.get(model, 0) + 1
+            if host.loaded:
+                self.swaps[model] = self.swaps.get(model, 0) + 1
+                logger.info(f"Смена модели на {base_url}: загружается {model}, "
+                            f"в памяти {', '.join(host.loaded)}")
+            host.loaded[model] = self._sizes.get(model, 0.0)
+            self._evict_over_budget(host, model)
+        return self.keep_alive_for(model)
+
+    def _evict_over_budget(self, host: _HostState, keep: str) -> None:
+        """Повторяет вытеснение Ollama: давно не использованные модели уходят первыми"""
+        if self.vram_budget_mb is None:
+            return
+        while sum(host.loaded.values()) > self.vram_budget_mb and len(host.loaded) > 1:
+            victim = next(name for name in host.loaded if name != keep)
+            del host.loaded[victim]
+            self.evictions[victim] = self.evictions.get(victim, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Загруженные модели и счётчики загрузок и смен"""
+        return {
+            "pinned": sorted(self.pinned),
+            "loaded": {url: list(host.loaded) for url, host in self._hosts.items()},
+            "loads": dict(self.loads),
+            "swaps": dict(self.swaps),
+            "swaps_total": sum(self.swaps.values()),
+            "evictions": dict(self.evictions),
+        }
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileReport:
+    """Результат профилирования: свёрнутые стеки и задержки цикла событий"""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float, lags: List[float]):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+        self.lags = lags
+
+    def folded(self) -> str:
+        """Стеки в формате collapsed ("a;b;c N"): flamegraph.pl, speedscope, inferno"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 20) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+        """Функции с наибольшим собственным и полным числом выборок"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            # Первый элемент стека - имя потока, это не функция
+            frames = stack[1:]
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return own.most_common(limit), total.most_common(limit)
+
+    def summary(self, limit: int = 15) -> str:
+        """Краткий текстовый отчёт"""
+        lines = [f"Профиль за {self.duration:.1f}s: {self.samples} выборок, интервал {self.interval * 1000:.0f} мс"]
+        if self.lags:
+            ordered = sorted(self.lags)
+            p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            lines.append(
+                f"Задержка цикла событий: средняя {sum(ordered) / len(ordered) * 1000:.1f} мс, "
+                f"p95 {p95 * 1000:.1f} мс, максимум {ordered[-1] * 1000:.1f} мс"
+            )
+        own, total = self.top(limit)
+        all_samples = sum(self.stacks.values()) or 1
+        lines.append("")
+        lines.append("Собственное время:")
+        lines.extend(f"{count / all_samples:6.1%}  {frame}" for frame, count in own)
+        lines.append("")
+        lines.append("Полное время:")
+        lines.extend(f"{count / all_samples:6.1%}  {frame}" for frame, count in total)
+        return "\n".join(lines)
+
+
+class SamplingProfiler:
+    """Выборочный профилировщик всех потоков процесса.
+
+    Отдельный поток с заданным интервалом снимает стеки через
+    sys._current_frames() и считает одинаковые стеки. Код бота при этом не
+    инструментируется, поэтому профилировщик можно запускать на работающем
+    боте. Параллельно корутина в цикле событий замеряет, насколько позже
+    заданного просыпается asyncio.sleep - это задержка цикла событий.
+    """
+
+    def __init__(self, interval: float = 0.01, lag_interval: float = 0.05, max_depth: int = 64):
+        """
+        Args:
+            interval: Интервал снятия стеков в секундах
+            lag_interval: Интервал замера задержки цикла событий в секундах
+            max_depth: Максимальная глубина стека
+        """
+        self.interval = interval
+        self.lag_interval = lag_interval
+        self.max_depth = max_depth
+        self._stacks: Counter = Counter()
+        self._samples = 0
+        self._lags: List[float] = []
+        self._stop = threading.Event()
+        # Метки кадров кэшируются по объекту кода
+        self._labels: Dict[Any, str] = {}
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, own_ident: int, thread_names: Dict[int, str]) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(thread_names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            self._stacks[tuple(stack)] += 1
+        self._samples += 1
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        thread_names: Dict[int, str] = {}
+        refreshed = 0.0
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            if now - refreshed > 1.0:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                refreshed = now
+            self._sample(own_ident, thread_names)
+
+    async def _measure_lag(self) -> None:
+        while not self._stop.is_set():
+            started = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            self._lags.append(max(0.0, time.monotonic() - started - self.lag_interval))
+
+    async def run(self, seconds: float) -> ProfileReport:
+        """Профилирует процесс в течение seconds секунд"""
+        self._stop.clear()
+        self._stacks.clear()
+        self._lags.clear()
+        self._samples = 0
+        started = time.monotonic()
+        thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        thread.start()
+        lag_task = asyncio.create_task(self._measure_lag())
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._stop.set()
+            lag_task.cancel()
+            await asyncio.to_thread(thread.join)
+        return ProfileReport(Counter(self._stacks), self._samples, time.monotonic() - started,
+                             self.interval, list(self._lags))
+
+
+class ProfilerService:
+    """Запуск профилирования по команде администратора или при старте бота"""
+
+    def __init__(self, interval: float = 0.01, max_seconds: float = 300.0, default_seconds: float = 30.0,
+                 startup_seconds: float = 0.0, output_dir: str = "logs/profiles", top: int = 15):
+        """
+        Args:
+            interval: Интервал снятия стеков в секундах
+            max_seconds: Наибольшая длительность одного профилирования
+            default_seconds: Длительность /profile без аргумента
+            startup_seconds: Профилировать первые N секунд после запуска (0 - не профилировать)
+            output_dir: Куда сохранять профили, снятые при запуске
+            top: Число функций в кратком отчёте
+        """
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.default_seconds = default_seconds
+        self.startup_seconds = startup_seconds
+        self.output_dir = output_dir
+        self.top = top
+        self._lock = asyncio.Lock()
+        self._startup_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ProfilerService":
+        profiler_config = config.get('profiler', {})
+        return cls(
+            interval=profiler_config.get('interval', 0.01),
+            max_seconds=profiler_config.get('max_seconds', 300.0),
+            default_seconds=profiler_config.get('default_seconds', 30.0),
+            startup_seconds=profiler_config.get('startup_seconds', 0.0),
+            output_dir=profiler_config.get('output_dir', "logs/profiles"),
+            top=profiler_config.get('top', 15),
+        )
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float) -> ProfileReport:
+        """Профилирует процесс; одновременно выполняется только одно профилирование"""
+        seconds = max(1.0, min(seconds, self.max_seconds))
+        async with self._lock:
+            logger.info("Профилирование на %.0fs", seconds)
+            report = await SamplingProfiler(interval=self.interval).run(seconds)
+            logger.info("Профилирование завершено: %d выборок", report.samples)
+            return report
+
+    def save(self, report: ProfileReport, name: str) -> str:
+        """Сохраняет свёрнутые стеки и отчёт; возвращает путь к файлу стеков"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, f"{name}.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(report.folded())
+        with open(os.path.join(self.output_dir, f"{name}.txt"), 'w', encoding='utf-8') as f:
+            f.write(report.summary(self.top))
+        return path
+
+    async def _profile_startup(self) -> None:
+        try:
+            report = await self.profile(self.startup_seconds)
+            path = await asyncio.to_thread(self.save, report, f"startup-{os.getpid()}-{int(time.time())}")
+            logger.info("Профиль запуска сохранён в %s", path)
+        except Exception as e:
+            logger.error(f"Ошибка при профилировании запуска: {str(e)}")
+
+    def start_startup_profile(self) -> None:
+        """Запускает фоновое профилирование первых startup_seconds секунд работы"""
+        if self.startup_seconds > 0 and self._startup_task is None:
+            self._startup_task = asyncio.create_task(self._profile_startup())
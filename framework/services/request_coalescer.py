@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+class _Call:
+    """Выполняющийся запрос и число его подписчиков"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.subscribers = 0
+
+
+class _StreamCall:
+    """Выполняющийся потоковый запрос с буфером уже полученных токенов"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.changed = asyncio.Condition()
+
+    async def publish(self, chunk: Optional[str] = None, done: bool = False,
+                      error: Optional[BaseException] = None) -> None:
+        """Добавляет токен или завершает поток и будит подписчиков"""
+        async with self.changed:
+            if chunk is not None:
+                self.chunks.append(chunk)
+            if done:
+                self.done = True
+                self.error = error
+            self.changed.notify_all()
+
+
+class RequestCoalescer:
+    """Объединение одинаковых одновременных запросов (single-flight).
+
+    Первый запрос с данным ключом выполняется, остальные, пришедшие до его
+    завершения, получают тот же результат. Если все подписчики отменены,
+    исходный запрос тоже отменяется.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _StreamCall] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    @staticmethod
+    def make_key(model: str, prompt: str, options: Optional[Dict[str, Any]] = None, **extra: Any) -> str:
+        """Ключ запроса: хэш модели, итогового промпта и параметров генерации"""
+        payload = json.dumps(
+            {"model": model, "prompt": prompt, "options": options or {}, **extra},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Выполняет запрос или присоединяется к уже выполняющемуся"""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _, c=call: self._forget(self._calls, key, c))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["followers"] += 1
+            logger.debug("Запрос %s присоединён к выполняющемуся", key[:12])
+
+        call.subscribers += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.subscribers -= 1
+            if call.subscribers == 0 and not call.task.done():
+                # Новый запрос с тем же ключом не должен присоединиться к отменяемому
+                self._forget(self._calls, key, call)
+                call.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Потоковый вариант run: каждый подписчик получает весь поток токенов"""
+        call = self._streams.get(key)
+        if call is None:
+            call = _StreamCall()
+            call.task = asyncio.create_task(self._produce(call, factory))
+            self._streams[key] = call
+            call.task.add_done_callback(lambda _, c=call: self._forget(self._streams, key, c))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["followers"] += 1
+            logger.debug("Потоковый запрос %s присоединён к выполняющемуся", key[:12])
+
+        call.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with call.changed:
+                    await call.changed.wait_for(lambda: len(call.chunks) > position or call.done)
+                    pending = call.chunks[position:]
+                    finished, error = call.done, call.error
+                for chunk in pending:
+                    yield chunk
+                position += len(pending)
+                if finished and position >= len(call.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            call.subscribers -= 1
+            if call.subscribers == 0 and not call.task.done():
+                self._forget(self._streams, key, call)
+                call.task.cancel()
+
+    @staticmethod
+    async def _produce(call: _StreamCall, factory: Callable[[], AsyncIterator[str]]) -> None:
+        """Читает исходный поток и раздаёт токены подписчикам"""
+        try:
+            async for chunk in factory():
+                await call.publish(chunk)
+        except asyncio.CancelledError:
+            await call.publish(done=True, error=asyncio.CancelledError())
+            raise
+        except Exception as e:
+            await call.publish(done=True, error=e)
+        else:
+            await call.publish(done=True)
+
+    @staticmethod
+    def _forget(calls: Dict[str, Any], key: str, call: Any) -> None:
+        """Удаляет завершённый запрос, если его ещё не заменил новый"""
+        if calls.get(key) is call:
+            del calls[key]
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from framework.services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOOKUPS = metrics.counter(
+    "llm_cache_lookups_total", "Обращения к кэшу ответов LLM по уровню, где найден ответ", ("result",)
+)
+
+class ResponseCache:
+    """Кэш ответов LLM: LRU в памяти с TTL и необязательный уровень на диске"""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 300.0, disk_dir: Optional[str] = None):
+        """
+        Args:
+            max_entries: Максимальное число записей в памяти
+            ttl: Время жизни записи в секундах
+            disk_dir: Директория для дискового уровня (None - только память)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        # Общее хранилище рабочих процессов (SharedStore): второй уровень вместо диска
+        self.store = None
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResponseCache":
+        """Создаёт кэш по секции llm_cache конфигурации"""
+        cache_config = config.get('llm_cache', {})
+        return cls(
+            max_entries=cache_config.get('max_entries', 512),
+            ttl=cache_config.get('ttl', 300.0),
+            disk_dir=cache_config.get('disk_dir')
+        )
+
+    @staticmethod
+    def is_deterministic(options: Optional[Dict[str, Any]]) -> bool:
+        """Ответ воспроизводим, если temperature равна 0 или задан seed"""
+        if not options:
+            return False
+        return options.get('temperature') == 0 or options.get('seed') is not None
+
+    async def get(self, key: str) -> Optional[str]:
+        """Возвращает сохранённый ответ или None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(result="memory")
+                return value
+            del self._entries[key]
+
+        if self.store is not None:
+            entry = await asyncio.to_thread(self.store.get, "llm_cache", key)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                self.shared_hits += 1
+                CACHE_LOOKUPS.inc(result="shared")
+                return entry[1]
+
+        if self.disk_dir:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            if entry is not None:
+                self._remember(key, *entry)
+                self.hits += 1
+                self.disk_hits += 1
+                CACHE_LOOKUPS.inc(result="disk")
+                return entry[1]
+
+        self.misses += 1
+        CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    async def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        """Сохраняет ответ в памяти и, если настроено, на диске"""
+        expires_at = time.time() + (ttl if ttl is not None else self.ttl)
+        self._remember(key, expires_at, value)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.set, "llm_cache", key, [expires_at, value], expires_at - time.time())
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, expires_at, value)
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика попаданий"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        """Кладёт запись в LRU и вытесняет самые старые"""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        """Читает запись с диска, удаляя просроченные"""
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Повреждённая запись кэша {path}: {str(e)}")
+            return None
+        if data.get('expires_at', 0) <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return data['expires_at'], data['value']
+
+    def _write_disk(self, key: str, expires_at: float, value: str) -> None:
+        """Атомарно записывает запись на диск"""
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({"expires_at": expires_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Не удалось записать кэш на диск: {str(e)}")
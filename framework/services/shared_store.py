@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SharedStore:
+    """Общее хранилище состояния для нескольких процессов бота на SQLite в режиме WAL.
+
+    Хранит значения JSON по пространствам имён (память диалогов, кэши) и очереди
+    обновлений Telegram для рабочих процессов. Операции короткие и локальные,
+    поэтому выполняются синхронно; изменение значения выполняется в одной
+    транзакции, так что параллельные процессы не теряют записи друг друга.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        """
+        Args:
+            path: Путь к файлу базы данных
+            busy_timeout: Сколько секунд ждать блокировку, занятую другим процессом
+        """
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS kv (
+                ns TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                PRIMARY KEY (ns, key)
+            );
+            CREATE TABLE IF NOT EXISTS updates (
+                id INTEGER PRIMARY KEY,
+                chat_id INTEGER NOT NULL,
+                partition INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                taken INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS updates_partition ON updates (partition, taken, id);
+        """)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["SharedStore"]:
+        """Создаёт хранилище по секции workers конфигурации.
+
+        Хранилище нужно, только если запущено несколько рабочих процессов
+        или явно задан store_path.
+        """
+        workers_config = config.get('workers', {})
+        path = workers_config.get('store_path')
+        if not path and workers_config.get('count', 1) <= 1:
+            return None
+        return cls(path or "data/shared_state.db")
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """Выполняет fn в транзакции с блокировкой записи"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    # Значения
+
+    def get(self, ns: str, key: Any, default: Any = None) -> Any:
+        """Возвращает значение или default, если его нет или срок истёк"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM kv WHERE ns = ? AND key = ?", (ns, str(key))
+            ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= time.time()):
+            return default
+        return json.loads(row[0])
+
+    def set(self, ns: str, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохраняет значение, ttl - время жизни в секундах"""
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (ns, str(key), json.dumps(value, ensure_ascii=False), expires_at)
+            )
+
+    def delete(self, ns: str, key: Any) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE ns = ? AND key = ?", (ns, str(key)))
+
+    def update(self, ns: str, key: Any, fn: Callable[[Any], Any], default: Any = None,
+               ttl: Optional[float] = None) -> Any:
+        """Атомарно заменяет значение на fn(старое значение) и возвращает новое"""
+        def apply(conn: sqlite3.Connection) -> Any:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE ns = ? AND key = ?", (ns, str(key))
+            ).fetchone()
+            current = default
+            if row is not None and (row[1] is None or row[1] > time.time()):
+                current = json.loads(row[0])
+            value = fn(current)
+            expires_at = time.time() + ttl if ttl is not None else None
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (ns, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (ns, str(key), json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            return value
+        return self._transaction(apply)
+
+    def append(self, ns: str, key: Any, item: Any, max_len: Optional[int] = None) -> List[Any]:
+        """Атомарно добавляет элемент в список, оставляя последние max_len"""
+        def push(items: Optional[List[Any]]) -> List[Any]:
+            items = (items or []) + [item]
+            return items[-max_len:] if max_len else items
+        return self.update(ns, key, push)
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные значения"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+            return cursor.rowcount
+
+    # Очередь обновлений
+
+    def enqueue_updates(self, items: List[Tuple[int, Dict[str, Any]]], partitions: int) -> None:
+        """Ставит обновления в очередь; items - пары (чат, обновление).
+
+        Раздел - остаток от деления идентификатора чата на число разделов,
+        поэтому все обновления одного чата попадают в один процесс.
+        """
+        def insert(conn: sqlite3.Connection) -> None:
+            conn.executemany(
+                "INSERT OR IGNORE INTO updates (id, chat_id, partition, payload) VALUES (?, ?, ?, ?)",
+                [(update['update_id'], chat_id, chat_id % partitions, json.dumps(update, ensure_ascii=False))
+                 for chat_id, update in items]
+            )
+        self._transaction(insert)
+
+    def repartition(self, partitions: int) -> None:
+        """Пересчитывает разделы очереди после изменения числа процессов"""
+        with self._lock:
+            # В SQLite остаток от отрицательного числа отрицателен, приводим к Python-семантике
+            self._conn.execute(
+                "UPDATE updates SET partition = ((chat_id % ?) + ?) % ?, taken = 0",
+                (partitions, partitions, partitions)
+            )
+
+    def take_updates(self, partition: int, limit: int = 100) -> List[Tuple[int, Dict[str, Any]]]:
+        """Забирает необработанные обновления раздела в порядке поступления"""
+        def take(conn: sqlite3.Connection) -> List[Tuple[int, Dict[str, Any]]]:
+            rows = conn.execute(
+                "SELECT id, payload FROM updates WHERE partition = ? AND taken = 0 ORDER BY id LIMIT ?",
+                (partition, limit)
+            ).fetchall()
+            if rows:
+                conn.executemany("UPDATE updates SET taken = 1 WHERE id = ?", [(row[0],) for row in rows])
+            return [(row[0], json.loads(row[1])) for row in rows]
+        return self._transaction(take)
+
+    def ack_update(self, update_id: int) -> None:
+        """Удаляет обработанное обновление из очереди"""
+        with self._lock:
+            self._conn.execute("DELETE FROM updates WHERE id = ?", (update_id,))
+
+    def release_updates(self, partition: int) -> int:
+        """Возвращает в очередь обновления, взятые, но не обработанные (после падения процесса)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE updates SET taken = 0 WHERE partition = ? AND taken = 1", (partition,)
+            )
+            return cursor.rowcount
+
+    def queue_stats(self) -> Dict[int, Dict[str, int]]:
+        """Число ожидающих и взятых обновлений по разделам"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT partition, taken, COUNT(*) FROM updates GROUP BY partition, taken"
+            ).fetchall()
+        stats: Dict[int, Dict[str, int]] = {}
+        for partition, taken, count in rows:
+            stats.setdefault(partition, {"pending": 0, "taken": 0})["taken" if taken else "pending"] = count
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
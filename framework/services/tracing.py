@@ -0,0 +1,308 @@
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Участок обработки запроса с временем начала, конца и атрибутами"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: "_Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration(self) -> float:
+        """Длительность в секундах (до текущего момента, если участок не завершён)"""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _Trace:
+    """Все участки одного запроса; экспортируются вместе после завершения корня"""
+
+    __slots__ = ("trace_id", "sampled", "spans")
+
+    def __init__(self, sampled: bool):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.spans: List[Span] = []
+
+
+# Текущий участок; дочерние задачи asyncio и asyncio.to_thread наследуют его
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class JsonLinesExporter:
+    """Пишет участки в файл, по одному JSON на строку.
+
+    export() только кладёт трассу в очередь: сериализация и запись в файл
+    идут в отдельном потоке и не задерживают цикл событий.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Очередь без ограничения: запись в неё не блокирует вызывающий код
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Span]) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._writer, name="trace-writer", daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(spans)
+
+    def _writer(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Всё, что накопилось, пишется одним открытием файла
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            stop = None in batch
+            lines = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+                            for spans in batch if spans is not None for span in spans)
+            if lines:
+                try:
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(lines)
+                except OSError as e:
+                    logger.debug("Не удалось записать трассы: %s", e)
+            if stop:
+                return
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Дописывает очередь и останавливает поток записи"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+
+class OtlpHttpExporter:
+    """Отправляет участки в локальный коллектор OpenTelemetry (OTLP/HTTP, JSON)"""
+
+    def __init__(self, endpoint: str = "http://127.0.0.1:4318/v1/traces", service_name: str = "telegram-agent",
+                 timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._tasks: set = set()
+
+    @staticmethod
+    def _value(value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                "attributes": [{"key": k, "value": self._value(v)} for k, v in span.attributes.items()],
+                # 1 - OK, 2 - ERROR
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "framework"}, "spans": otlp_spans}],
+        }]}
+
+    async def _send(self, payload: Dict[str, Any]) -> None:
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                async with session.post(self.endpoint, json=payload) as response:
+                    if response.status >= 300:
+                        logger.debug("Коллектор трассировки ответил %s", response.status)
+        except Exception as e:
+            logger.debug("Не удалось отправить трассировку: %s", e)
+
+    def export(self, spans: List[Span]) -> None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._send(self._payload(spans)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+class Tracer:
+    """Лёгкая трассировка обработки обновлений.
+
+    Трасса начинается на каждое обновление (start_trace), участки внутри неё
+    открываются через span() и связываются через contextvars. Трасса
+    экспортируется целиком, если попала в выборку sample_rate или если
+    обработка заняла не меньше slow_threshold секунд - так медленные запросы
+    видны всегда. Вне трассы span() ничего не делает.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, slow_threshold: Optional[float] = None,
+                 exporter: Optional[Any] = None, max_spans: int = 500):
+        """
+        Args:
+            sample_rate: Доля трасс, экспортируемых всегда
+            slow_threshold: Трассы не короче этого числа секунд экспортируются всегда
+            exporter: Объект с методом export(spans); None - трассировка выключена
+            max_spans: Предел участков в одной трассе
+        """
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.exporter = exporter
+        self.max_spans = max_spans
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Применяет секцию tracing конфигурации"""
+        tracing_config = config.get('tracing', {})
+        self.sample_rate = tracing_config.get('sample_rate', 0.0)
+        self.slow_threshold = tracing_config.get('slow_threshold')
+        self.max_spans = tracing_config.get('max_spans', 500)
+        exporter = tracing_config.get('exporter')
+        if isinstance(self.exporter, JsonLinesExporter):
+            self.exporter.close()
+        if exporter == "jsonl":
+            self.exporter = JsonLinesExporter(tracing_config.get('path', "logs/traces.jsonl"))
+        elif exporter == "otlp":
+            self.exporter = OtlpHttpExporter(
+                tracing_config.get('otlp_endpoint', "http://127.0.0.1:4318/v1/traces"),
+                service_name=tracing_config.get('service_name', "telegram-agent"),
+            )
+        else:
+            self.exporter = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    @staticmethod
+    def current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @contextlib.contextmanager
+    def start_trace(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Начинает трассу запроса; корневой участок - name"""
+        if not self.enabled:
+            yield None
+            return
+        trace = _Trace(sampled=random.random() < self.sample_rate)
+        span = None
+        try:
+            with self._open(trace, name, None, attributes) as span:
+                yield span
+        finally:
+            # Ошибочные трассы тоже экспортируются по тем же правилам
+            if trace.sampled or (self.slow_threshold is not None and span.duration >= self.slow_threshold):
+                self._export(trace)
+
+    def _export(self, trace: _Trace) -> None:
+        try:
+            self.exporter.export(trace.spans)
+        except Exception as e:
+            logger.debug("Не удалось экспортировать трассу: %s", e)
+
+    @contextlib.contextmanager
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Участок внутри текущей трассы (или внутри parent, если задан)"""
+        parent = parent or _current_span.get()
+        if parent is None or len(parent.trace.spans) >= self.max_spans:
+            yield None
+            return
+        with self._open(parent.trace, name, parent.span_id, attributes) as span:
+            yield span
+
+    @contextlib.contextmanager
+    def _open(self, trace: _Trace, name: str, parent_id: Optional[str],
+              attributes: Dict[str, Any]) -> Iterator[Span]:
+        span = Span(trace, name, parent_id, attributes)
+        trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {str(e)}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+
+    def traced(self, name: Optional[str] = None) -> Callable:
+        """Декоратор: выполняет функцию (обычную или async) внутри участка"""
+        def decorator(fn: Callable) -> Callable:
+            span_name = name or fn.__qualname__
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    with self.span(span_name):
+                        return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+# Трассировщик процесса; настраивается из конфигурации при запуске
+tracer = Tracer()
+traced = tracer.traced
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Состояния обработки сообщения
+PROCESSING = "processing"
+DONE = "done"
+
+
+def _pid_alive(pid: int) -> bool:
+    """Жив ли процесс с данным PID"""
+    # os.kill(pid, 0) на Windows не проверка, а отправка CTRL_C_EVENT
+    return psutil.pid_exists(pid)
+
+
+class UpdateDeduplicator:
+    """Защита от повторной обработки одного и того же сообщения.
+
+    Запоминает пары (chat_id, message_id): LRU в памяти с TTL и, если задано
+    общее хранилище, запись в SharedStore, видимая всем рабочим процессам.
+    Сообщение сначала захватывается (processing), после обработки помечается
+    обработанным (done); при ошибке захват снимается, и повторная доставка
+    обработается заново. Захват процесса, который упал, не блокирует повтор.
+    """
+
+    NAMESPACE = "processed_messages"
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0,
+                 processing_ttl: float = 600.0, path: Optional[str] = None):
+        """
+        Args:
+            max_entries: Сколько сообщений помнить в памяти
+            ttl: Сколько секунд помнить обработанное сообщение
+            processing_ttl: Через сколько секунд захват считается брошенным
+            path: Файл, куда сохраняются обработанные сообщения между
+                перезапусками в однопроцессном режиме
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.processing_ttl = processing_ttl
+        self.path = path
+        # Общее хранилище рабочих процессов (SharedStore), если оно есть
+        self.store = None
+        self._entries: "OrderedDict[Tuple[int, int], Tuple[float, str]]" = OrderedDict()
+        self.duplicates = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "UpdateDeduplicator":
+        """Создаёт защиту от повторов по секции dedup конфигурации"""
+        dedup_config = config.get('dedup', {})
+        deduplicator = cls(
+            max_entries=dedup_config.get('max_entries', 10000),
+            ttl=dedup_config.get('ttl', 86400.0),
+            processing_ttl=dedup_config.get('processing_ttl', 600.0),
+            path=dedup_config.get('path')
+        )
+        deduplicator.load()
+        return deduplicator
+
+    def _remember(self, key: Tuple[int, int], state: str, ttl: float) -> None:
+        self._entries[key] = (time.time() + ttl, state)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _local_state(self, key: Tuple[int, int]) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def _claim_shared(self, key: Tuple[int, int]) -> bool:
+        """Захватывает сообщение в общем хранилище; False - его уже обрабатывают"""
+        pid = os.getpid()
+        now = time.time()
+        claimed = False
+
+        def take(current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            nonlocal claimed
+            if current is not None and (
+                current["state"] == DONE
+                or (current["until"] > now and _pid_alive(current["pid"]))
+            ):
+                return current
+            claimed = True
+            return {"state": PROCESSING, "pid": pid, "until": now + self.processing_ttl}
+
+        self.store.update(self.NAMESPACE, f"{key[0]}:{key[1]}", take, ttl=self.ttl)
+        return claimed
+
+    async def claim(self, chat_id: int, message_id: int) -> bool:
+        """Захватывает сообщение для обработки; False - это повтор"""
+        key = (chat_id, message_id)
+        if self._local_state(key) is not None:
+            self.duplicates += 1
+            return False
+        # Захватываем в памяти до обращения к хранилищу, чтобы параллельный повтор
+        # в этом же процессе не прошёл, пока идёт запрос
+        self._remember(key, PROCESSING, self.processing_ttl)
+        if self.store is not None:
+            try:
+                claimed = await asyncio.to_thread(self._claim_shared, key)
+            except Exception as e:
+                logger.warning(f"Не удалось проверить сообщение в общем хранилище: {str(e)}")
+                claimed = True
+            if not claimed:
+                self.duplicates += 1
+                return False
+        return True
+
+    async def complete(self, chat_id: int, message_id: int) -> None:
+        """Помечает сообщение обработанным"""
+        key = (chat_id, message_id)
+        self._remember(key, DONE, self.ttl)
+        if self.store is not None:
+            await asyncio.to_thread(
+                self.store.set, self.NAMESPACE, f"{chat_id}:{message_id}", {"state": DONE}, self.ttl
+            )
+
+    async def release(self, chat_id: int, message_id: int) -> None:
+        """Снимает захват после ошибки, чтобы повторная доставка обработалась"""
+        self._entries.pop((chat_id, message_id), None)
+        if self.store is not None:
+            await asyncio.to_thread(self.store.delete, self.NAMESPACE, f"{chat_id}:{message_id}")
+
+    def load(self) -> None:
+        """Загружает обработанные сообщения, сохранённые при прошлой остановке"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except Exception as e:
+            logger.warning(f"Не удалось загрузить список обработанных сообщений: {str(e)}")
+            return
+        now = time.time()
+        for chat_id, message_id, expires_at in entries:
+            if expires_at > now:
+                self._entries[(chat_id, message_id)] = (expires_at, DONE)
+        logger.info(f"Загружено {len(self._entries)} обработанных сообщений")
+
+    def save(self) -> None:
+        """Сохраняет обработанные сообщения, чтобы повторы после перезапуска пропускались"""
+        if not self.path:
+            return
+        now = time.time()
+        entries = [
+            [chat_id, message_id, expires_at]
+            for (chat_id, message_id), (expires_at, state) in self._entries.items()
+            if state == DONE and expires_at > now
+        ]
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Не удалось сохранить список обработанных сообщений: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "duplicates": self.duplicates}
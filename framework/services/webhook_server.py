@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from framework.services.metrics import metrics_handler
+
+logger = logging.getLogger(__name__)
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """Обработчик вебхука с ограничением числа одновременно обрабатываемых обновлений.
+
+    Telegram получает ответ сразу, а обновление обрабатывается в фоне. Одновременно
+    выполняется не более max_concurrent обновлений; если в работе и в очереди уже
+    max_pending обновлений, запрос отклоняется с 503 и Telegram доставит его повторно.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: Optional[str] = None,
+                 max_concurrent: int = 32, max_pending: int = 256, shutdown_timeout: float = 30.0, **data: Any):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self.max_pending = max_pending
+        self.shutdown_timeout = shutdown_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.stats = {"accepted": 0, "rejected": 0, "unauthorized": 0, "failed": 0}
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception as e:
+                self.stats["failed"] += 1
+                logger.error(f"Ошибка при обработке обновления {update.get('update_id')}: {str(e)}", exc_info=True)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        bot = await self.resolve_bot(request)
+        if not self.verify_secret(request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot):
+            self.stats["unauthorized"] += 1
+            return web.Response(body="Unauthorized", status=401)
+        if len(self._background_feed_update_tasks) >= self.max_pending:
+            self.stats["rejected"] += 1
+            logger.warning(f"Очередь обновлений заполнена ({self.max_pending}), обновление отклонено")
+            return web.Response(body="Busy", status=503, headers={"Retry-After": "1"})
+        self.stats["accepted"] += 1
+        return await self._handle_request_background(bot=bot, request=request)
+
+    __call__ = handle
+
+    async def close(self) -> None:
+        """Дожидается принятых обновлений и закрывает сессию бота"""
+        if self._background_feed_update_tasks:
+            logger.info(f"Ожидание обработки {len(self._background_feed_update_tasks)} обновлений...")
+            await asyncio.wait(set(self._background_feed_update_tasks), timeout=self.shutdown_timeout)
+        await super().close()
+
+
+class WebhookServer:
+    """Приём обновлений Telegram через вебхук на встроенном aiohttp-сервере"""
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, host: str = "0.0.0.0", port: int = 8080,
+                 path: str = "/webhook", url: Optional[str] = None, secret_token: Optional[str] = None,
+                 max_concurrent: int = 32, max_pending: int = 256, drop_pending_updates: bool = False,
+                 serve_metrics: bool = False):
+        """
+        Args:
+            dispatcher: Диспетчер aiogram
+            bot: Экземпляр бота
+            host: Адрес, на котором слушает сервер
+            port: Порт сервера
+            path: Путь вебхука
+            url: Публичный адрес (https://host[:port]); если не задан, вебхук
+                у Telegram не регистрируется - например, когда реплики стоят за
+                общим прокси и вебхук регистрирует кто-то один
+            secret_token: Секрет, который Telegram присылает в заголовке
+                X-Telegram-Bot-Api-Secret-Token
+            max_concurrent: Сколько обновлений обрабатывается одновременно
+            max_pending: Сколько обновлений может быть в работе и в очереди
+            drop_pending_updates: Отбросить накопившиеся обновления при регистрации
+            serve_metrics: Отдавать /metrics на порту вебхука. Порт обычно открыт
+                в интернет, поэтому по умолчанию метрики отдаёт только MetricsServer
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url
+        self.secret_token = secret_token
+        self.drop_pending_updates = drop_pending_updates
+        self.serve_metrics = serve_metrics
+        self.handler = BoundedRequestHandler(
+            dispatcher, bot,
+            secret_token=secret_token,
+            max_concurrent=max_concurrent,
+            max_pending=max_pending
+        )
+        self._runner: Optional[web.AppRunner] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], dispatcher: Dispatcher, bot: Bot) -> "WebhookServer":
+        """Создаёт сервер по секции webhook конфигурации.
+
+        Переменные окружения WEBHOOK_SECRET и WEBHOOK_PORT переопределяют
+        конфигурацию - так несколько реплик запускаются на разных портах.
+        """
+        webhook_config = config.get('webhook', {})
+        return cls(
+            dispatcher, bot,
+            host=webhook_config.get('host', "0.0.0.0"),
+            port=int(os.getenv("WEBHOOK_PORT") or webhook_config.get('port', 8080)),
+            path=webhook_config.get('path', "/webhook"),
+            url=webhook_config.get('url'),
+            secret_token=os.getenv("WEBHOOK_SECRET") or webhook_config.get('secret_token'),
+            max_concurrent=webhook_config.get('max_concurrent_updates', 32),
+            max_pending=webhook_config.get('max_pending_updates', 256),
+            drop_pending_updates=webhook_config.get('drop_pending_updates', False),
+            serve_metrics=(webhook_config.get('serve_metrics', False)
+                           and config.get('metrics', {}).get('enabled', False)),
+        )
+
+    @staticmethod
+    def is_enabled(config: Dict[str, Any]) -> bool:
+        """Включён ли режим вебхука в конфигурации"""
+        return bool(config.get('webhook', {}).get('enabled', False))
+
+    def build_app(self) -> web.Application:
+        """Создаёт приложение aiohttp с маршрутом вебхука и проверкой здоровья"""
+        app = web.Application()
+        self.handler.register(app, path=self.path)
+        app.router.add_get("/healthz", self._health)
+        if self.serve_metrics:
+            app.router.add_get("/metrics", metrics_handler)
+        # Запуск и остановка диспетчера вместе с приложением
+        setup_application(app, self.dispatcher, bot=self.bot)
+        return app
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "status": "ok",
+            "in_progress": len(self.handler._background_feed_update_tasks),
+            **self.handler.stats,
+        })
+
+    async def start(self) -> None:
+        """Запускает сервер и при необходимости регистрирует вебхук у Telegram"""
+        self._runner = web.AppRunner(self.build_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        logger.info(f"Вебхук слушает {self.host}:{self.port}{self.path}")
+
+        if self.url:
+            await self.bot.set_webhook(
+                f"{self.url.rstrip('/')}{self.path}",
+                secret_token=self.secret_token,
+                allowed_updates=self.dispatcher.resolve_used_update_types(),
+                drop_pending_updates=self.drop_pending_updates
+            )
+            logger.info(f"Вебхук зарегистрирован: {self.url.rstrip('/')}{self.path}")
+
+    async def stop(self) -> None:
+        """Останавливает сервер, дожидаясь обработки принятых обновлений"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def serve_forever(self) -> None:
+        """Запускает сервер и работает до отмены"""
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from typing import Any, Callable, Dict, List, Optional
+from aiogram import Bot, Dispatcher
+from framework.services.shared_store import SharedStore
+
+logger = logging.getLogger(__name__)
+
+# Поля обновления, в которых может находиться сообщение с чатом
+_MESSAGE_FIELDS = (
+    "message", "edited_message", "channel_post", "edited_channel_post",
+    "business_message", "edited_business_message",
+)
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Идентификатор чата, к которому относится обновление (0, если чата нет)"""
+    for field in _MESSAGE_FIELDS:
+        message = update.get(field)
+        if message:
+            return message["chat"]["id"]
+    callback = update.get("callback_query")
+    if callback:
+        if callback.get("message"):
+            return callback["message"]["chat"]["id"]
+        return callback["from"]["id"]
+    for field in ("my_chat_member", "chat_member", "chat_join_request", "message_reaction"):
+        event = update.get(field)
+        if event:
+            return event["chat"]["id"]
+    for event in update.values():
+        if isinstance(event, dict) and isinstance(event.get("from"), dict):
+            return event["from"]["id"]
+    return 0
+
+
+class UpdateSupervisor:
+    """Получает обновления Telegram и раздаёт их рабочим процессам по чатам.
+
+    Обновления сохраняются в общую очередь SharedStore с разделом chat_id % count,
+    так что все сообщения одного чата обрабатывает один процесс в исходном порядке.
+    Смещение getUpdates подтверждается только после записи в очередь, а упавший
+    процесс перезапускается и дообрабатывает взятые им обновления. При остановке
+    процессы получают общий сигнал stop_event и сами завершают начатую работу;
+    terminate() - только для тех, кто не успел за отведённое время.
+    """
+
+    def __init__(self, bot: Bot, store: SharedStore, count: int,
+                 target: Callable[[int, int, Any], None],
+                 allowed_updates: Optional[List[str]] = None, poll_timeout: int = 30,
+                 restart_delay: float = 5.0):
+        """
+        Args:
+            bot: Экземпляр бота для getUpdates
+            store: Общее хранилище с очередью обновлений
+            count: Число рабочих процессов
+            target: Точка входа рабочего процесса, вызывается как target(index, count, stop_event)
+            allowed_updates: Типы обновлений, которые нужно получать
+            poll_timeout: Таймаут long polling в секундах
+            restart_delay: Пауза перед перезапуском упавшего процесса
+        """
+        self.bot = bot
+        self.store = store
+        self.count = count
+        self.target = target
+        self.allowed_updates = allowed_updates
+        self.poll_timeout = poll_timeout
+        self.restart_delay = restart_delay
+        # spawn: у каждого процесса свой интерпретатор и свой цикл событий
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: Dict[int, multiprocessing.process.BaseProcess] = {}
+        # Просьба к рабочим процессам завершиться
+        self.stop_event = self._context.Event()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], bot: Bot, store: SharedStore,
+                    target: Callable[[int, int, Any], None], allowed_updates: Optional[List[str]] = None) -> "UpdateSupervisor":
+        """Создаёт супервизор по секции workers конфигурации"""
+        workers_config = config.get('workers', {})
+        return cls(
+            bot, store,
+            count=workers_config.get('count', 1),
+            target=target,
+            allowed_updates=allowed_updates,
+            poll_timeout=workers_config.get('poll_timeout', 30),
+            restart_delay=workers_config.get('restart_delay', 5.0),
+        )
+
+    @staticmethod
+    def is_enabled(config: Dict[str, Any]) -> bool:
+        """Включён ли режим нескольких рабочих процессов"""
+        return config.get('workers', {}).get('count', 1) > 1
+
+    def _spawn(self, index: int) -> None:
+        process = self._context.Process(target=self.target, args=(index, self.count, self.stop_event),
+                                        name=f"bot-worker-{index}")
+        process.start()
+        self._processes[index] = process
+        logger.info(f"Запущен рабочий процесс {index} (PID {process.pid})")
+
+    async def _watch_workers(self) -> None:
+        """Перезапускает упавшие рабочие процессы"""
+        while True:
+            await asyncio.sleep(self.restart_delay)
+            for index, process in list(self._processes.items()):
+                if not process.is_alive():
+                    logger.error(f"Рабочий процесс {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self._spawn(index)
+
+    async def run(self) -> None:
+        """Запускает рабочие процессы и раздаёт им обновления до отмены"""
+        # Число процессов могло измениться: пересчитываем разделы оставшихся обновлений
+        self.store.repartition(self.count)
+        self.stop_event.clear()
+        for index in range(self.count):
+            self._spawn(index)
+        watcher = asyncio.create_task(self._watch_workers())
+
+        offset = None
+        try:
+            while True:
+                try:
+                    updates = await self.bot.get_updates(
+                        offset=offset, timeout=self.poll_timeout, allowed_updates=self.allowed_updates
+                    )
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка при получении обновлений: {str(e)}")
+                    await asyncio.sleep(1)
+                    continue
+                if not updates:
+                    continue
+                items = []
+                for update in updates:
+                    raw = update.model_dump(mode="json", exclude_none=True)
+                    items.append((update_chat_id(raw), raw))
+                await asyncio.to_thread(self.store.enqueue_updates, items, self.count)
+                offset = updates[-1].update_id + 1
+        finally:
+            watcher.cancel()
+            await self.stop()
+
+    def _join(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Останавливает рабочие процессы, давая им завершить начатую работу"""
+        self.stop_event.set()
+        # join блокирует, поэтому ждём в отдельном потоке
+        await asyncio.to_thread(self._join, timeout)
+        for index, process in self._processes.items():
+            if process.is_alive():
+                logger.warning(f"Рабочий процесс {index} не завершился за {timeout:.0f}s, принудительная остановка")
+                process.terminate()
+        await asyncio.to_thread(self._join, 5.0)
+        self._processes.clear()
+
+
+class UpdateWorker:
+    """Рабочий процесс: обрабатывает обновления своего раздела общей очереди.
+
+    Обновления разных чатов обрабатываются параллельно, одного чата - строго по
+    очереди. Обновление удаляется из очереди только после обработки.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, store: SharedStore, index: int,
+                 max_concurrent: int = 16, poll_interval: float = 0.05, batch_size: int = 100):
+        """
+        Args:
+            dispatcher: Диспетчер aiogram
+            bot: Экземпляр бота
+            store: Общее хранилище с очередью обновлений
+            index: Номер раздела очереди
+            max_concurrent: Сколько обновлений обрабатывается одновременно
+            poll_interval: Пауза между проверками пустой очереди в секундах
+            batch_size: Сколько обновлений забирать за раз
+        """
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.store = store
+        self.index = index
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._chat_locks: Dict[int, asyncio.Lock] = {}
+        self._chat_pending: Dict[int, int] = {}
+        self._tasks: set = set()
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], dispatcher: Dispatcher, bot: Bot,
+                    store: SharedStore, index: int) -> "UpdateWorker":
+        workers_config = config.get('workers', {})
+        return cls(
+            dispatcher, bot, store, index,
+            max_concurrent=workers_config.get('max_concurrent_updates', 16),
+            poll_interval=workers_config.get('poll_interval', 0.05),
+        )
+
+    async def _process(self, update_id: int, chat_id: int, update: Dict[str, Any], lock: asyncio.Lock) -> None:
+        try:
+            async with lock, self._semaphore:
+                await self.dispatcher.feed_raw_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке обновления {update_id}: {str(e)}", exc_info=True)
+        finally:
+            await asyncio.to_thread(self.store.ack_update, update_id)
+            self._chat_pending[chat_id] -= 1
+            if not self._chat_pending[chat_id]:
+                del self._chat_pending[chat_id]
+                del self._chat_locks[chat_id]
+
+    async def run(self, stop_event: Optional[Any] = None) -> None:
+        """Обрабатывает обновления раздела до отмены или до установки stop_event"""
+        released = await asyncio.to_thread(self.store.release_updates, self.index)
+        if released:
+            logger.info(f"Процесс {self.index}: возвращено в очередь {released} необработанных обновлений")
+        await self.dispatcher.emit_startup(bot=self.bot)
+        try:
+            while stop_event is None or not stop_event.is_set():
+                # Не забираем новые обновления, пока не разобраны уже взятые
+                if len(self._tasks) >= self.batch_size:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                batch = await asyncio.to_thread(self.store.take_updates, self.index, self.batch_size)
+                if not batch:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                for update_id, update in batch:
+                    chat_id = update_chat_id(update)
+                    lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+                    self._chat_pending[chat_id] = self._chat_pending.get(chat_id, 0) + 1
+                    # Задачи одного чата встают в очередь к его блокировке в порядке создания
+                    task = asyncio.create_task(self._process(update_id, chat_id, update, lock))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+        finally:
+            if self._tasks:
+                await asyncio.wait(set(self._tasks), timeout=30)
+            await self.dispatcher.emit_shutdown(bot=self.bot)
@@ -0,0 +1,65 @@
+"""
+Общие фикстуры тестов: фейковые Ollama и Bot API из benchmarks/.
+"""
+import os
+import sys
+import time
+
+import pytest
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                "benchmarks"))
+
+from fake_ollama import FakeOllama
+from fake_telegram import BOT_USER, FakeTelegram
+
+from framework.ollama_client import OllamaClient
+
+MODEL = "gemma3:latest"
+
+
+def _url(runner) -> str:
+    return "http://%s:%d" % runner.addresses[0][:2]
+
+
+@pytest.fixture
+async def fake_ollama():
+    """Фейковый Ollama с быстрыми ответами; адрес - в fake_ollama.url"""
+    fake = FakeOllama(ttft=0.01, tokens_per_second=1000.0, tokens=5, seed=0)
+    runner = await fake.start()
+    fake.url = _url(runner)
+    yield fake
+    await runner.cleanup()
+
+
+@pytest.fixture
+def ollama_client(fake_ollama):
+    """Клиент, направленный на фейковый Ollama, с уже «скачанной» моделью"""
+    client = OllamaClient(base_url=fake_ollama.url)
+    # Иначе клиент запустит ollama pull для локального сервера
+    client._model_cache[MODEL] = time.time()
+    return client
+
+
+@pytest.fixture
+async def fake_telegram():
+    """Фейковый Bot API; адрес - в fake_telegram.url"""
+    fake = FakeTelegram(seed=0)
+    runner = await fake.start()
+    fake.url = _url(runner)
+    yield fake
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def bot(fake_telegram):
+    """Бот, отправляющий запросы в фейковый Bot API"""
+    session = AiohttpSession(api=TelegramAPIServer.from_base(fake_telegram.url))
+    bot = Bot(f"{BOT_USER['id']}:test", session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    yield bot
+    await session.close()
@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+from framework.ollama_pool import BACKEND_ERRORS, BackendError
+from framework.services.adaptive_timeout import AdaptiveTimeout
+from framework.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from framework.tests.conftest import MODEL
+
+
+@pytest.fixture
+def breaker(ollama_client):
+    ollama_client.breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.1,
+                                           failure_types=(BackendError, *BACKEND_ERRORS))
+    return ollama_client.breaker
+
+
+async def test_breaker_opens_and_rejects_without_calling_ollama(fake_ollama, ollama_client, breaker):
+    fake_ollama.error_rate = 1.0
+    for attempt in range(2):
+        with pytest.raises(BackendError):
+            await ollama_client.generate(f"запрос {attempt}", MODEL)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        await ollama_client.generate("ещё запрос", MODEL)
+    assert fake_ollama.requests["generate"] == 2
+    assert breaker.rejected == 1
+
+
+async def test_successful_probe_closes_breaker(fake_ollama, ollama_client, breaker):
+    fake_ollama.error_rate = 1.0
+    for attempt in range(2):
+        with pytest.raises(BackendError):
+            await ollama_client.generate(f"запрос {attempt}", MODEL)
+
+    fake_ollama.error_rate = 0.0
+    await asyncio.sleep(breaker.recovery_timeout)
+    assert await ollama_client.generate("пробный запрос", MODEL)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+async def test_failed_probe_reopens_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05, failure_types=(BackendError,))
+    with pytest.raises(BackendError):
+        async with breaker.guard():
+            raise BackendError("down")
+    await asyncio.sleep(breaker.recovery_timeout)
+
+    with pytest.raises(BackendError):
+        async with breaker.guard():
+            assert breaker.state == CircuitBreaker.HALF_OPEN
+            raise BackendError("still down")
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+async def test_only_first_request_to_model_is_a_cold_load(fake_ollama, ollama_client, breaker):
+    ollama_client.timeouts = AdaptiveTimeout(default=0.05, cold=0.1)
+    fake_ollama.ttft = 0.3
+
+    # Первый запрос к модели включает её загрузку и получает таймаут cold
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await ollama_client.generate("холодный запрос", MODEL)
+    assert 0.1 <= time.monotonic() - started < 0.3
+    assert breaker.failures == 0
+
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await ollama_client.generate("второй запрос", MODEL)
+    assert time.monotonic() - started < 0.1
+    assert breaker.failures == 1
+
+
+async def test_hung_backend_opens_breaker(fake_ollama, ollama_client, breaker):
+    ollama_client.timeouts = AdaptiveTimeout(default=0.05, cold=0.1)
+    fake_ollama.ttft = 1.0
+
+    for attempt in range(3):
+        with pytest.raises(asyncio.TimeoutError):
+            await ollama_client.generate(f"запрос {attempt}", MODEL)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    started = time.monotonic()
+    with pytest.raises(CircuitOpenError):
+        await ollama_client.generate("ещё запрос", MODEL)
+    assert time.monotonic() - started < 0.05
+
+
+async def test_cold_request_is_not_a_latency_sample(fake_ollama, ollama_client):
+    await ollama_client.generate("первый", MODEL)
+    assert ollama_client.timeouts.quantile(MODEL, 0.5) is None
+
+    await ollama_client.generate("второй", MODEL)
+    assert ollama_client.timeouts.quantile(MODEL, 0.5) is not None
+
+
+def test_timeout_uses_default_until_enough_samples():
+    timeouts = AdaptiveTimeout(default=120.0, minimum=30.0, min_samples=5)
+    for _ in range(4):
+        timeouts.observe(MODEL, 1.0)
+    assert timeouts.timeout_for(MODEL) == 120.0
+
+    timeouts.observe(MODEL, 1.0)
+    assert timeouts.timeout_for(MODEL) == 30.0
+
+
+def test_timeout_grows_with_prompt_size():
+    timeouts = AdaptiveTimeout(minimum=1.0, maximum=600.0, multiplier=2.0, min_samples=1)
+    for _ in range(10):
+        timeouts.observe(MODEL, 5.0, size=200)
+
+    assert timeouts.timeout_for(MODEL, 200) == 10.0
+    assert timeouts.timeout_for(MODEL, 100) == 10.0
+    assert timeouts.timeout_for(MODEL, 2000) == 100.0
+    assert timeouts.timeout_for(MODEL, 200000) == 600.0
+    assert timeouts.cold_timeout() == 180.0
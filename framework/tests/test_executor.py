@@ -0,0 +1,54 @@
+import os
+import threading
+
+import pytest
+
+from framework.services.executor import ExecutorService
+from framework.services.llm_scheduler import BACKGROUND, current_priority, priority
+
+
+@pytest.fixture
+def make_executor():
+    executors = []
+
+    def make(**kwargs) -> ExecutorService:
+        executor = ExecutorService(**kwargs)
+        executors.append(executor)
+        return executor
+
+    yield make
+    for executor in executors:
+        executor.shutdown()
+
+
+async def test_small_input_runs_inline(make_executor):
+    executor = make_executor(threads=1, processes=0, min_offload_size=100)
+    assert await executor.run_in_thread(threading.get_ident, size=99) == threading.get_ident()
+    assert await executor.run_in_process(threading.get_ident, size=10) == threading.get_ident()
+    assert executor._thread_pool is None
+
+
+async def test_large_or_unsized_input_is_offloaded(make_executor):
+    executor = make_executor(threads=1, processes=0, min_offload_size=100)
+    assert await executor.run_in_thread(threading.get_ident, size=100) != threading.get_ident()
+    assert await executor.run_in_thread(threading.get_ident) != threading.get_ident()
+
+
+async def test_process_tasks_use_threads_when_processes_disabled(make_executor):
+    executor = make_executor(threads=1, processes=0)
+    assert await executor.run_in_process(os.getpid) == os.getpid()
+    assert executor._process_pool is None and executor._thread_pool is not None
+
+
+async def test_process_pool_runs_in_another_process(make_executor):
+    executor = make_executor(threads=1, processes=1)
+    if executor.processes == 0:
+        pytest.skip("fork недоступен")
+    assert await executor.run_in_process(os.getpid) != os.getpid()
+    assert await executor.run_in_process(os.getpid, size=1) == os.getpid()
+
+
+async def test_thread_sees_caller_context(make_executor):
+    executor = make_executor(threads=1, processes=0)
+    with priority(BACKGROUND):
+        assert await executor.run_in_thread(current_priority) == BACKGROUND
@@ -0,0 +1,93 @@
+import pytest
+from aiogram.types import Message
+
+from framework.services.group_filter import GroupFilter
+
+BOT_ID = 123456
+GROUP_ID = -100500
+
+
+@pytest.fixture
+def group_filter():
+    group_filter = GroupFilter(username="slime_bot", name="Слайм", aliases=["Slime"])
+    group_filter.bot_id = BOT_ID
+    return group_filter
+
+
+def _message(text, chat_type="supergroup", entities=None, reply_from=None):
+    data = {
+        "message_id": 1, "date": 0, "text": text,
+        "chat": {"id": GROUP_ID if chat_type != "private" else 42, "type": chat_type},
+        "from": {"id": 42, "is_bot": False, "first_name": "Тест"},
+    }
+    if entities:
+        data["entities"] = entities
+    if reply_from is not None:
+        data["reply_to_message"] = {
+            "message_id": 0, "date": 0, "text": "ответ",
+            "chat": data["chat"], "from": {"id": reply_from, "is_bot": True, "first_name": "Бот"},
+        }
+    return Message.model_validate(data)
+
+
+def _mention(text, mention):
+    offset = text.index(mention)
+    return [{"type": "mention", "offset": offset, "length": len(mention)}]
+
+
+@pytest.mark.parametrize("text", [
+    "Слайм, привет",
+    "привет, слайм!",
+    "спасибо Слайму",
+    "у Слайма есть идеи?",
+    "поговори со Слаймом",
+    "Slime, what's up?",
+])
+def test_name_in_any_case_addresses_bot(group_filter, text):
+    assert group_filter.decide(_message(text)) == (True, "name")
+
+
+@pytest.mark.parametrize("text", ["Слаймик, привет", "слаймовый цвет", "просто сообщение", ""])
+def test_other_words_do_not_address_bot(group_filter, text):
+    assert group_filter.decide(_message(text))[0] is False
+
+
+def test_private_chat_is_always_addressed(group_filter):
+    assert group_filter.decide(_message("что угодно", chat_type="private")) == (True, "private")
+
+
+def test_reply_to_bot_addresses_bot(group_filter):
+    assert group_filter.decide(_message("а почему?", reply_from=BOT_ID)) == (True, "reply")
+    assert group_filter.decide(_message("а почему?", reply_from=777))[0] is False
+
+
+def test_mention_entity(group_filter):
+    text = "@slime_bot как дела"
+    assert group_filter.decide(_message(text, entities=_mention(text, "@slime_bot"))) == (True, "mention")
+    text = "@other_bot как дела"
+    assert group_filter.decide(_message(text, entities=_mention(text, "@other_bot")))[0] is False
+
+
+def test_command_for_other_bot_is_ignored(group_filter):
+    text = "/start@other_bot"
+    entities = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    assert group_filter.decide(_message(text, entities=entities)) == (False, "other_bot")
+    entities = [{"type": "bot_command", "offset": 0, "length": 6}]
+    assert group_filter.decide(_message("/start", entities=entities)) == (True, "command")
+
+
+def test_not_allowed_group(group_filter):
+    group_filter.allowed_groups = {-1}
+    assert group_filter.decide(_message("Слайм, привет")) == (False, "not_allowed")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Слайм, что такое слайм и как его сделать?", "что такое слайм и как его сделать?"),
+    ("@slime_bot нарисуй кота", "нарисуй кота"),
+    ("Как дела, Слайм?", "Как дела"),
+    ("расскажи про @slime_bot и его друзей", "расскажи про @slime_bot и его друзей"),
+    ("спасибо Слайму", "спасибо Слайму"),
+    ("", ""),
+])
+def test_strip_address_removes_only_vocative(group_filter, text, expected):
+    assert group_filter.strip_address(text) == expected
@@ -0,0 +1,92 @@
+import pytest
+
+from framework.services.intent_router import CHAT, IMAGE, IntentRouter, match_image_request
+
+
+class FakeClassifier:
+    """Классификатор с заранее заданной вероятностью картинки"""
+
+    def __init__(self, probability: float = 0.9, error: Exception = None):
+        self.probability = probability
+        self.error = error
+        self.texts = []
+
+    async def image_probability(self, text: str) -> float:
+        self.texts.append(text)
+        if self.error is not None:
+            raise self.error
+        return self.probability
+
+
+@pytest.mark.parametrize("text, prompt", [
+    ("нарисуй кота в космосе", "кота в космосе"),
+    ("Нарисуйте, пожалуйста, закат над горами", "закат над горами"),
+    ("создай картинку заката над морем", "заката над морем"),
+    ("сделай мне красивую картинку моря", "красивую картинку моря"),
+    ("сделай логотип для кофейни", "логотип для кофейни"),
+    ("можешь нарисовать собаку в шляпе?", "собаку в шляпе"),
+    ("generate an image of a cat in a spacesuit", "a cat in a spacesuit"),
+    ("draw me a castle on a cliff!", "a castle on a cliff"),
+    ("make a logo for my bakery", "logo for my bakery"),
+])
+def test_prompt_is_extracted_without_trigger_words(text, prompt):
+    assert match_image_request(text).prompt == prompt
+
+
+@pytest.mark.parametrize("text", [
+    "создай картинку заката",
+    "сделай обои с северным сиянием",
+    "generate an image of a lighthouse",
+])
+def test_explicit_image_request_passes_threshold(text):
+    result = IntentRouter().classify_rules(text)
+    assert result.intent == IMAGE and result.source == "rules"
+
+
+@pytest.mark.parametrize("text", [
+    "нарисуй таблицу истинности для xor",
+    "создай изображение диска с виндой",
+    "сделай фото меньше по размеру",
+    "нарисуй кота",
+])
+def test_ambiguous_request_scores_below_threshold(text):
+    router = IntentRouter()
+    match = match_image_request(text)
+    assert router.ambiguous_min <= match.confidence < router.threshold
+    assert router.classify_rules(text).intent == CHAT
+
+
+@pytest.mark.parametrize("text", [
+    "создай план тренировок на неделю",
+    "create an image classifier in pytorch",
+    "how do I recreate the database from a backup?",
+    "draw conclusions from this report",
+])
+def test_text_requests_are_chat(text):
+    assert IntentRouter().classify_rules(text).intent == CHAT
+
+
+async def test_classifier_decides_ambiguous_request():
+    router = IntentRouter(classifier=FakeClassifier(probability=0.9))
+    result = await router.classify("нарисуй кота в космосе")
+    assert result.intent == IMAGE
+    assert result.prompt == "кота в космосе"
+    assert result.source == "embeddings"
+
+    router.classifier.probability = 0.1
+    assert (await router.classify("нарисуй таблицу истинности для xor")).intent == CHAT
+
+
+async def test_classifier_is_not_asked_about_confident_matches():
+    classifier = FakeClassifier()
+    router = IntentRouter(classifier=classifier)
+    assert (await router.classify("создай картинку заката")).intent == IMAGE
+    assert (await router.classify("составь план тренировок")).intent == CHAT
+    assert (await router.classify("как дела?")).intent == CHAT
+    assert classifier.texts == []
+
+
+async def test_unavailable_classifier_falls_back_to_rules():
+    router = IntentRouter(classifier=FakeClassifier(error=ConnectionError("ollama down")))
+    result = await router.classify("нарисуй кота")
+    assert result.intent == CHAT and result.source == "rules"
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from framework.services.llm_scheduler import (
+    BACKGROUND, GROUP, INTERACTIVE, PriorityScheduler, current_priority, priority, priority_for_chat,
+)
+
+
+async def _occupy(scheduler: PriorityScheduler, name: str, order: list, release: asyncio.Event,
+                  model: str = None) -> None:
+    async with scheduler.slot(name, model=model):
+        order.append(name if model is None else model)
+        await release.wait()
+
+
+async def test_free_slot_goes_to_highest_priority():
+    scheduler = PriorityScheduler(max_concurrent=1, aging_seconds=0)
+    order, hold, rest = [], asyncio.Event(), asyncio.Event()
+    rest.set()
+    holder = asyncio.create_task(_occupy(scheduler, BACKGROUND, order, hold))
+    await asyncio.sleep(0)
+
+    waiters = [asyncio.create_task(_occupy(scheduler, name, order, rest))
+               for name in (BACKGROUND, GROUP, INTERACTIVE)]
+    await asyncio.sleep(0)
+    hold.set()
+    await asyncio.gather(holder, *waiters)
+
+    assert order == [BACKGROUND, INTERACTIVE, GROUP, BACKGROUND]
+
+
+async def test_class_limit_leaves_slots_for_other_classes():
+    scheduler = PriorityScheduler(max_concurrent=3, limits={BACKGROUND: 1})
+    hold = asyncio.Event()
+    order = []
+    tasks = [asyncio.create_task(_occupy(scheduler, BACKGROUND, order, hold)) for _ in range(2)]
+    await asyncio.sleep(0)
+    assert scheduler.stats()[BACKGROUND]["running"] == 1
+    assert scheduler.stats()[BACKGROUND]["queued"] == 1
+
+    tasks.append(asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, hold)))
+    await asyncio.sleep(0)
+    assert scheduler.stats()[INTERACTIVE]["running"] == 1
+
+    hold.set()
+    await asyncio.gather(*tasks)
+    assert scheduler.running == 0
+
+
+async def test_waiting_request_ages_into_higher_class():
+    scheduler = PriorityScheduler(max_concurrent=1, aging_seconds=0.05)
+    order, hold, rest = [], asyncio.Event(), asyncio.Event()
+    rest.set()
+    holder = asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, hold))
+    await asyncio.sleep(0)
+    old_group = asyncio.create_task(_occupy(scheduler, GROUP, order, rest))
+    await asyncio.sleep(0.12)
+    fresh = asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, rest))
+    await asyncio.sleep(0)
+
+    hold.set()
+    await asyncio.gather(holder, old_group, fresh)
+    assert order == [INTERACTIVE, GROUP, INTERACTIVE]
+
+
+async def test_resident_model_goes_first_within_class():
+    scheduler = PriorityScheduler(max_concurrent=1, aging_seconds=0)
+    scheduler.affinity = lambda model: model == "loaded"
+    order, hold, rest = [], asyncio.Event(), asyncio.Event()
+    rest.set()
+    holder = asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, hold, model="first"))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, rest, model=model))
+               for model in ("cold", "loaded")]
+    await asyncio.sleep(0)
+
+    hold.set()
+    await asyncio.gather(holder, *waiters)
+    assert order == ["first", "loaded", "cold"]
+
+
+async def test_cancelled_waiter_does_not_leak_slot():
+    scheduler = PriorityScheduler(max_concurrent=1)
+    order, hold = [], asyncio.Event()
+    holder = asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, hold))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(_occupy(scheduler, INTERACTIVE, order, hold))
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    hold.set()
+    await holder
+
+    assert scheduler.running == 0
+    assert scheduler.stats()[INTERACTIVE]["queued"] == 0
+    async with scheduler.slot(INTERACTIVE):
+        assert scheduler.running == 1
+
+
+async def test_priority_is_inherited_by_child_tasks():
+    async def child():
+        return current_priority()
+
+    with priority(BACKGROUND):
+        task = asyncio.create_task(child())
+    assert await task == BACKGROUND
+    assert current_priority() == INTERACTIVE
+    assert priority_for_chat(-100123) == GROUP
+    assert priority_for_chat(42) == INTERACTIVE
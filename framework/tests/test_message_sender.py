@@ -0,0 +1,160 @@
+import asyncio
+import re
+import time
+
+import pytest
+
+from framework.services.message_sender import MAX_MESSAGE_LENGTH, MessageSender, TokenBucket, split_text
+
+UNLIMITED = 1e6
+
+
+@pytest.fixture
+async def make_sender(bot):
+    senders = []
+
+    def make(**kwargs) -> MessageSender:
+        settings = {"global_rate": UNLIMITED, "global_burst": UNLIMITED, "private_rate": UNLIMITED,
+                    "private_burst": UNLIMITED, "group_rate": UNLIMITED, "group_burst": UNLIMITED, **kwargs}
+        sender = MessageSender(bot, **settings)
+        senders.append(sender)
+        return sender
+
+    yield make
+    for sender in senders:
+        await sender.close()
+
+
+def _send_times(fake_telegram, method: str = "sendmessage"):
+    return [at for at, name, _ in fake_telegram.calls if name == method]
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(rate=10.0, capacity=2)
+    now = bucket.updated_at
+    bucket.consume(now)
+    bucket.consume(now)
+    assert bucket.wait_time(now) == pytest.approx(0.1)
+    assert bucket.wait_time(now + 0.11) == 0.0
+    assert bucket.is_full(now + 0.21)
+
+
+async def test_private_chat_bucket_limits_rate(fake_telegram, make_sender):
+    sender = make_sender(private_rate=20.0, private_burst=2)
+    results = await asyncio.gather(*(sender.send_text(1, f"сообщение {i}") for i in range(6)))
+
+    times = _send_times(fake_telegram)
+    # Два сообщения подряд, затем по одному каждые 50 мс
+    assert times[-1] - times[0] >= 4 / 20.0 * 0.9
+    ids = [messages[0].message_id for messages in results]
+    assert ids == sorted(ids)
+
+
+async def test_group_uses_its_own_limit(fake_telegram, make_sender):
+    sender = make_sender(private_rate=UNLIMITED, group_rate=20.0, group_burst=1)
+    await asyncio.gather(*(sender.send_text(1, f"личное {i}") for i in range(3)))
+    private_elapsed = _send_times(fake_telegram)[-1] - _send_times(fake_telegram)[0]
+    fake_telegram.calls.clear()
+
+    await asyncio.gather(*(sender.send_text(-100, f"группа {i}") for i in range(3)))
+    group_times = _send_times(fake_telegram)
+
+    assert private_elapsed < 0.05
+    assert group_times[-1] - group_times[0] >= 2 / 20.0 * 0.9
+
+
+async def test_chats_do_not_wait_for_each_other(fake_telegram, make_sender):
+    sender = make_sender(private_rate=1.0, private_burst=1)
+    started = time.monotonic()
+    await asyncio.gather(*(sender.send_text(chat_id, "привет") for chat_id in range(1, 6)))
+
+    assert time.monotonic() - started < 0.5
+    assert fake_telegram.methods["sendmessage"] == 5
+
+
+async def test_global_bucket_limits_all_chats(fake_telegram, make_sender):
+    sender = make_sender(global_rate=20.0, global_burst=2)
+    await asyncio.gather(*(sender.send_text(chat_id, "привет") for chat_id in range(1, 7)))
+
+    times = _send_times(fake_telegram)
+    assert times[-1] - times[0] >= 4 / 20.0 * 0.9
+
+
+async def test_retry_after_pauses_only_that_chat(fake_telegram, make_sender):
+    fake_telegram.retry_after_rate = 1.0
+    sender = make_sender()
+    limited = sender.send_text(1, "первое")
+    while not fake_telegram.rate_limited:
+        await asyncio.sleep(0.01)
+    fake_telegram.retry_after_rate = 0.0
+    limited_at = time.monotonic()
+
+    # Пока чат 1 на паузе, остальные чаты отправляются сразу
+    await sender.send_text(2, "другой чат")
+    assert time.monotonic() - limited_at < 0.5
+    assert not limited.done()
+
+    await limited
+    assert time.monotonic() - limited_at >= fake_telegram.retry_after * 0.9
+    assert sender.stats["retry_after"] == 1
+    assert sender.stats["sent"] == 2
+
+
+async def test_pending_edits_are_coalesced(fake_telegram, make_sender):
+    sender = make_sender()
+    futures = [sender.edit_text(1, 10, f"версия {i}") for i in range(3)]
+    await asyncio.gather(*futures)
+
+    assert fake_telegram.methods["editmessagetext"] == 1
+    assert sender.stats["edits_coalesced"] == 2
+    assert futures[0] is futures[2]
+
+
+async def test_long_html_reply_is_sent_in_valid_parts(fake_telegram, make_sender):
+    sender = make_sender()
+    text = "<b>" + "слово " * 1500 + "</b>"
+    messages = await sender.send_text(1, text)
+
+    assert len(messages) == fake_telegram.methods["sendmessage"] > 1
+    assert sender.stats["split"] == 1
+    for message in messages:
+        assert len(message.text) <= MAX_MESSAGE_LENGTH
+        assert message.text.startswith("<b>") and message.text.endswith("</b>")
+
+
+def _balanced(part: str) -> bool:
+    stack = []
+    for closing, name in re.findall(r"<(/?)([a-z-]+)", part):
+        if not closing:
+            stack.append(name)
+        elif not stack or stack.pop() != name:
+            return False
+    return not stack
+
+
+def test_split_text_plain_prefers_paragraphs():
+    text = "абзац один\n\nабзац два длиннее"
+    assert split_text(text, limit=20) == ["абзац один", "абзац два длиннее"]
+    assert split_text("x" * 10, limit=4) == ["xxxx", "xxxx", "xx"]
+    assert split_text("") == [""]
+
+
+def test_split_text_html_never_cuts_tags_or_entities():
+    text = ("<b>жирный <i>курсив &amp; ещё</i> " + "слово " * 30 + "</b> "
+            '<a href="https://example.com/?a=1&amp;b=2">ссылка на страницу</a> конец')
+    for limit in (60, 100, 200):
+        parts = split_text(text, limit=limit, html=True)
+        assert len(parts) > 1
+        for part in parts:
+            assert len(part) <= limit
+            assert _balanced(part)
+            assert not re.search(r"<[^>]*$|&#?\w*$", re.sub(r"<[^>]+>", "", part))
+        plain = lambda value: "".join(re.sub(r"<[^>]+>", "", value).split())
+        assert "".join(plain(part) for part in parts) == plain(text)
+
+
+def test_split_text_html_reopens_tag_attributes():
+    text = '<a href="https://example.com">' + "текст ссылки " * 10 + "</a>"
+    parts = split_text(text, limit=80, html=True)
+    assert len(parts) > 1
+    assert all(part.startswith('<a href="https://example.com">') and part.endswith("</a>") for part in parts)
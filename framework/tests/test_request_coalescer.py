@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from framework.services.request_coalescer import RequestCoalescer
+from framework.tests.conftest import MODEL
+
+
+async def test_identical_requests_reach_ollama_once(fake_ollama, ollama_client):
+    results = await asyncio.gather(*(ollama_client.generate("Привет", MODEL) for _ in range(5)))
+
+    assert len(set(results)) == 1
+    assert fake_ollama.requests["generate"] == 1
+    assert ollama_client.coalescer.stats == {"leaders": 1, "followers": 4}
+
+
+async def test_different_prompts_are_not_coalesced(fake_ollama, ollama_client):
+    first, second = await asyncio.gather(
+        ollama_client.generate("Привет", MODEL),
+        ollama_client.generate("Как дела?", MODEL),
+    )
+
+    assert first != second
+    assert fake_ollama.requests["generate"] == 2
+
+
+async def test_stream_subscribers_get_the_whole_stream(fake_ollama, ollama_client):
+    async def collect():
+        return [chunk async for chunk in ollama_client.generate_stream("Расскажи сказку", MODEL)]
+
+    streams = await asyncio.gather(*(collect() for _ in range(3)))
+
+    assert streams[0] and streams[0] == streams[1] == streams[2]
+    assert fake_ollama.requests["generate"] == 1
+
+
+async def test_finished_request_is_not_reused(fake_ollama, ollama_client):
+    await ollama_client.generate("Привет", MODEL)
+    await ollama_client.generate("Привет", MODEL)
+
+    assert fake_ollama.requests["generate"] == 2
+
+
+async def test_request_is_cancelled_with_its_last_subscriber():
+    coalescer = RequestCoalescer()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def slow():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    subscribers = [asyncio.create_task(coalescer.run("key", slow)) for _ in range(2)]
+    await started.wait()
+    subscribers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+
+    subscribers[1].cancel()
+    await asyncio.wait_for(cancelled.wait(), 1)
+    for task in subscribers:
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+
+async def test_request_after_last_subscriber_left_starts_anew():
+    coalescer = RequestCoalescer()
+    calls = 0
+
+    async def slow():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return calls
+
+    first = asyncio.create_task(coalescer.run("key", slow))
+    await asyncio.sleep(0)
+    first.cancel()
+    # Отменённый запрос ещё не завершился, но новый вызов к нему не присоединяется
+    second = asyncio.create_task(coalescer.run("key", slow))
+
+    assert await second == 2
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+async def test_stream_after_last_subscriber_left_starts_anew():
+    coalescer = RequestCoalescer()
+    calls = 0
+
+    async def tokens():
+        nonlocal calls
+        calls += 1
+        for token in ("а", "б"):
+            await asyncio.sleep(0.01)
+            yield token
+
+    async def collect():
+        return [chunk async for chunk in coalescer.stream("key", tokens)]
+
+    first = asyncio.create_task(collect())
+    await asyncio.sleep(0)
+    first.cancel()
+    second = asyncio.create_task(collect())
+
+    assert await second == ["а", "б"]
+    assert calls == 2
+
+
+async def test_error_is_shared_by_all_subscribers():
+    coalescer = RequestCoalescer()
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    results = await asyncio.gather(*(coalescer.run("key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,43 @@
+import pytest
+
+from framework.utils.text import (
+    clean_prompt, contains_cyrillic, count_cyrillic, count_latin, is_mostly_latin, normalize_spaces,
+    strip_cyrillic, strip_emoji,
+)
+
+RUSSIAN = set("абвгдеёжзийклмнопрстуфхцчшщъыьэюяАБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ")
+
+
+@pytest.mark.parametrize("text", [
+    "Ёжик в тумане",
+    "ещё раз, please",
+    "№ 5 «ёлка» — 100 €",
+    "Київ і Україна",
+    "café naïve Straße",
+    "🙂 emoji 🚀 и текст",
+    "",
+])
+def test_letter_counts_match_character_scan(text):
+    assert count_cyrillic(text) == sum(1 for ch in text if ch in RUSSIAN)
+    assert count_latin(text) == sum(1 for ch in text if ch.isascii() and ch.isalpha())
+
+
+def test_yo_is_cyrillic():
+    assert contains_cyrillic("Ё")
+    assert contains_cyrillic("ёж")
+    assert not contains_cyrillic("hello, world 123")
+    assert strip_cyrillic("ёлка tree Ёж") == " tree "
+
+
+def test_is_mostly_latin():
+    assert is_mostly_latin("This answer is in English")
+    assert not is_mostly_latin("Это ответ с терминами Python и Docker")
+    assert not is_mostly_latin("1234 !? 🙂")
+    assert is_mostly_latin("ab ё", threshold=0.6)
+    assert not is_mostly_latin("ab ёж", threshold=0.5)
+
+
+def test_clean_prompt_drops_russian_and_emoji():
+    assert strip_emoji("кот 🐱 в космосе 🚀") == "кот  в космосе "
+    assert normalize_spaces("  a \n\t b  ") == "a b"
+    assert clean_prompt("🎨 a cat in space, ёлка на фоне  ") == "a cat in space,"
@@ -0,0 +1,38 @@
+import json
+import threading
+
+from framework.services.tracing import JsonLinesExporter, Tracer
+
+
+def test_jsonl_exporter_writes_outside_caller_thread(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path))
+    writers = []
+    real_dumps = json.dumps
+    monkeypatch.setattr(json, "dumps", lambda *args, **kwargs: writers.append(threading.current_thread())
+                        or real_dumps(*args, **kwargs))
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+
+    for attempt in range(3):
+        with tracer.start_trace("update", attempt=attempt):
+            with tracer.span("agent"):
+                pass
+    exporter.close()
+
+    spans = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [span["name"] for span in spans] == ["update", "agent"] * 3
+    assert writers and threading.current_thread() not in writers
+
+
+def test_closed_exporter_restarts_on_next_export(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonLinesExporter(str(path))
+    tracer = Tracer(sample_rate=1.0, exporter=exporter)
+    with tracer.start_trace("first"):
+        pass
+    exporter.close()
+    with tracer.start_trace("second"):
+        pass
+    exporter.close()
+
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
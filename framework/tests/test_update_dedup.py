@@ -0,0 +1,113 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+from framework.services.shared_store import SharedStore
+from framework.services.update_dedup import DONE, PROCESSING, UpdateDeduplicator
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SharedStore(str(tmp_path / "shared_state.db"))
+    yield store
+    store.close()
+
+
+def _worker(store: SharedStore, **kwargs) -> UpdateDeduplicator:
+    """Защита от повторов одного рабочего процесса"""
+    deduplicator = UpdateDeduplicator(**kwargs)
+    deduplicator.store = store
+    return deduplicator
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+async def test_repeated_message_is_claimed_once():
+    deduplicator = UpdateDeduplicator()
+    assert await deduplicator.claim(1, 10)
+    assert not await deduplicator.claim(1, 10)
+
+    await deduplicator.complete(1, 10)
+    assert not await deduplicator.claim(1, 10)
+    assert await deduplicator.claim(1, 11)
+    assert deduplicator.stats()["duplicates"] == 2
+
+
+async def test_concurrent_redelivery_is_processed_once():
+    deduplicator = UpdateDeduplicator()
+    results = await asyncio.gather(*(deduplicator.claim(1, 10) for _ in range(5)))
+    assert results.count(True) == 1
+
+
+async def test_released_message_is_processed_again():
+    deduplicator = UpdateDeduplicator()
+    assert await deduplicator.claim(1, 10)
+    await deduplicator.release(1, 10)
+    assert await deduplicator.claim(1, 10)
+
+
+async def test_expired_entries_are_forgotten():
+    deduplicator = UpdateDeduplicator(ttl=0.05)
+    assert await deduplicator.claim(1, 10)
+    await deduplicator.complete(1, 10)
+    await asyncio.sleep(0.1)
+    assert await deduplicator.claim(1, 10)
+
+
+async def test_lru_keeps_max_entries():
+    deduplicator = UpdateDeduplicator(max_entries=2)
+    for message_id in range(3):
+        assert await deduplicator.claim(1, message_id)
+    assert deduplicator.stats()["entries"] == 2
+    assert await deduplicator.claim(1, 0)
+
+
+async def test_workers_share_claims(store):
+    first, second = _worker(store), _worker(store)
+    assert await first.claim(1, 10)
+    assert not await second.claim(1, 10)
+
+    await first.complete(1, 10)
+    assert not await second.claim(1, 10)
+    assert store.get(UpdateDeduplicator.NAMESPACE, "1:10") == {"state": DONE}
+
+
+async def test_release_lets_other_worker_retry(store):
+    first, second = _worker(store), _worker(store)
+    assert await first.claim(1, 10)
+    await first.release(1, 10)
+    assert await second.claim(1, 10)
+
+
+async def test_claim_of_dead_worker_is_taken_over(store):
+    store.set(UpdateDeduplicator.NAMESPACE, "1:10",
+              {"state": PROCESSING, "pid": _dead_pid(), "until": float("inf")})
+    assert await _worker(store).claim(1, 10)
+
+
+async def test_abandoned_claim_is_taken_over(store):
+    first = _worker(store, processing_ttl=0.05)
+    assert await first.claim(1, 10)
+    await asyncio.sleep(0.1)
+    assert await _worker(store).claim(1, 10)
+
+
+async def test_done_messages_survive_restart(tmp_path):
+    path = str(tmp_path / "processed_messages.json")
+    deduplicator = UpdateDeduplicator(path=path)
+    assert await deduplicator.claim(1, 10)
+    await deduplicator.complete(1, 10)
+    assert await deduplicator.claim(1, 11)
+    deduplicator.save()
+
+    restarted = UpdateDeduplicator(path=path)
+    restarted.load()
+    assert not await restarted.claim(1, 10)
+    # Незавершённая обработка не сохраняется: сообщение обработается заново
+    assert await restarted.claim(1, 11)
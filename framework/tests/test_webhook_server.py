@@ -0,0 +1,20 @@
+from aiogram import Dispatcher
+
+from framework.services.webhook_server import WebhookServer
+
+
+def _routes(config, bot):
+    app = WebhookServer.from_config(config, Dispatcher(), bot).build_app()
+    return {route.resource.canonical for route in app.router.routes()}
+
+
+async def test_metrics_are_not_public_by_default(bot):
+    assert "/metrics" not in _routes({}, bot)
+    assert "/metrics" not in _routes({"metrics": {"enabled": True}}, bot)
+    # Метрики выключены: serve_metrics на вебхуке их не включает
+    assert "/metrics" not in _routes({"webhook": {"serve_metrics": True}}, bot)
+
+
+async def test_metrics_on_webhook_port_when_requested(bot):
+    config = {"webhook": {"serve_metrics": True}, "metrics": {"enabled": True}}
+    assert {"/webhook", "/healthz", "/metrics"} <= _routes(config, bot)
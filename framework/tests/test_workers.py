@@ -0,0 +1,57 @@
+import asyncio
+import functools
+import os
+import signal
+
+from framework.services.workers import UpdateSupervisor, update_chat_id
+from framework.tests.worker_targets import graceful_worker, stuck_worker
+
+
+def _supervisor(target, count: int = 2) -> UpdateSupervisor:
+    return UpdateSupervisor(bot=None, store=None, count=count, target=target)
+
+
+async def _wait_started(supervisor: UpdateSupervisor) -> None:
+    for index in range(supervisor.count):
+        supervisor._spawn(index)
+    while not all(process.is_alive() for process in supervisor._processes.values()):
+        await asyncio.sleep(0.01)
+
+
+async def test_workers_finish_their_shutdown(tmp_path):
+    marker = str(tmp_path / "closed")
+    supervisor = _supervisor(functools.partial(graceful_worker, marker))
+    await _wait_started(supervisor)
+    processes = list(supervisor._processes.values())
+
+    await supervisor.stop(timeout=30)
+
+    assert [process.exitcode for process in processes] == [0, 0]
+    assert all(os.path.exists(f"{marker}.{index}") for index in range(2))
+
+
+async def test_stuck_worker_is_terminated_without_blocking_loop():
+    supervisor = _supervisor(stuck_worker, count=1)
+    await _wait_started(supervisor)
+    process = supervisor._processes[0]
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    await supervisor.stop(timeout=0.3)
+    ticker.cancel()
+
+    assert process.exitcode == -signal.SIGTERM
+    # Пока супервизор ждал процесс, цикл событий продолжал работать
+    assert ticks >= 10
+
+
+def test_update_chat_id():
+    assert update_chat_id({"message": {"chat": {"id": -100}}}) == -100
+    assert update_chat_id({"callback_query": {"from": {"id": 7}}}) == 7
+    assert update_chat_id({"poll": {"id": "1"}}) == 0
@@ -0,0 +1,19 @@
+"""
+Точки входа рабочих процессов для тестов супервизора.
+
+Отдельный модуль без aiogram: процесс, запущенный через spawn, импортирует
+только его.
+"""
+import time
+
+
+def graceful_worker(marker: str, index: int, count: int, stop_event) -> None:
+    while not stop_event.is_set():
+        time.sleep(0.01)
+    # Завершение работы, которое terminate() не дал бы выполнить
+    with open(f"{marker}.{index}", "w") as f:
+        f.write("closed")
+
+
+def stuck_worker(index: int, count: int, stop_event) -> None:
+    time.sleep(60)
@@ -1,6 +1,6 @@
 import os
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Set
 from dotenv import load_dotenv
 
 def load_config() -> Dict[str, Any]:
@@ -52,4 +52,16 @@ def load_config() -> Dict[str, Any]:
     except Exception as e:
         print(f"Предупреждение: Ошибка при загрузке конфигурации из файла: {str(e)}")
         print("Используется конфигурация по умолчанию")
-        return config 
\ No newline at end of file
+        return config 
+
+
+def load_admin_ids(path: str = 'data/admin_data.json') -> Set[int]:
+    """Идентификаторы администраторов бота (пустое множество, если файла нет)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {int(admin_id) for admin_id in json.load(f).get('admin_ids', [])}
+    except FileNotFoundError:
+        return set()
+    except Exception as e:
+        print(f"Предупреждение: Ошибка при чтении списка администраторов: {str(e)}")
+        return set()
@@ -0,0 +1,33 @@
+"""
+Разбор HTML для веб-агентов.
+
+Функции чистые и работают только со строками, поэтому выполняются в пуле
+процессов (см. framework.services.executor): модуль импортирует лишь bs4.
+"""
+from typing import Any, Dict, List
+from bs4 import BeautifulSoup
+
+
+def parse_search_results(html: str, limit: int) -> List[Dict[str, Any]]:
+    """Ссылки поисковой выдачи Google: [{"title", "url"}]"""
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    # Пробуем найти ссылки выдачи
+    for a in soup.find_all('a', href=True):
+        href = a['href']
+        if href.startswith('/url?q='):
+            actual_url = href.split('/url?q=')[1].split('&')[0]
+            title = a.get_text().strip()
+            if title and actual_url:
+                results.append({"title": title, "url": actual_url})
+        if len(results) >= limit:
+            break
+    return results
+
+
+def parse_page(html: str) -> Dict[str, Any]:
+    """Заголовок и текст страницы"""
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string if soup.title else ""
+    content = soup.get_text(separator="\n")
+    return {"title": str(title or ""), "content": content}
@@ -1,84 +1,203 @@
+import atexit
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+from datetime import datetime, timezone
 from typing import Dict, Any, Optional
+from framework.services.tracing import tracer
 
-def setup_logger(config: Optional[Dict[str, Any]] = None) -> logging.Logger:
+DEFAULT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Слушатель очереди текущей конфигурации; setup_logger останавливает его при повторном вызове
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - один JSON-объект в строке"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            data["trace_id"] = trace_id
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает лишь долю записей ниже WARNING от указанных логгеров.
+
+    Правило для логгера действует и на его потомков: "framework.agents"
+    покрывает "framework.agents.think_agent". Предупреждения и ошибки
+    не отбрасываются никогда.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._cache: Dict[str, float] = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _TraceIdFilter(logging.Filter):
+    """Добавляет к записи идентификатор текущей трассы (см. framework.services.tracing)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = tracer.current_span()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, откладывающий форматирование до потока слушателя.
+
+    Стандартный prepare() подставляет аргументы в сообщение в вызывающем
+    потоке, чтобы запись можно было передать в другой процесс. Очередь здесь
+    внутрипроцессная, поэтому запись передаётся как есть.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(config: Optional[Dict[str, Any]] = None, process_name: Optional[str] = None) -> logging.Logger:
     """Настройка логгера
-    
+
+    Корневой логгер получает только обработчик очереди: запись в файл и
+    консоль выполняет отдельный поток, поэтому цикл событий не ждёт диска.
+    Повторный вызов заменяет предыдущую конфигурацию.
+
     Args:
         config: Опциональный словарь с настройками логгера
             {
                 'logging': {
                     'level': 'INFO|DEBUG|WARNING|ERROR',
-                    'format': 'строка форматирования'
+                    'format': 'строка форматирования',
+                    'json': false,
+                    'file': 'logs/bot.log',
+                    'max_size': 10485760,
+                    'backup_count': 5,
+                    'sampling': {'aiogram.event': 0.1}
                 }
             }
+        process_name: Суффикс файла логов рабочего процесса (bot.<name>.log),
+            чтобы процессы не ротировали один и тот же файл
     Returns:
         logging.Logger: Настроенный логгер
     """
     try:
+        logging_config = (config or {}).get('logging', {})
+        log_format = logging_config.get('format', DEFAULT_FORMAT)
+        log_level = logging_config.get('level', 'INFO')
+        log_file = logging_config.get('file', os.path.join("logs", "bot.log"))
+        if process_name:
+            root, ext = os.path.splitext(log_file)
+            log_file = f"{root}.{process_name}{ext}"
+
         # Создаем директорию для логов если её нет
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            print(f"Создана директория для логов: {log_dir}")
-        
-        # Получаем корневой логгер
+        log_dir = os.path.dirname(log_file)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+
+        # Получаем корневой логгер и снимаем предыдущую конфигурацию
         logger = logging.getLogger()
-        
-        # Очищаем существующие обработчики
-        logger.handlers.clear()
-        
-        # Настройки из конфига или по умолчанию
-        log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-        log_level = 'INFO'
-        
-        if config and 'logging' in config:
-            log_level = config['logging'].get('level', log_level)
-            log_format = config['logging'].get('format', log_format)
-        
+        _stop_listener()
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
         # Создаем форматтер
-        formatter = logging.Formatter(log_format)
-        
+        formatter = JsonFormatter() if logging_config.get('json', False) else logging.Formatter(log_format)
+
+        handlers = []
         # Добавляем обработчик для файла
         try:
-            file_handler = logging.FileHandler(
-                os.path.join(log_dir, "bot.log"),
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=logging_config.get('max_size', 10 * 1024 * 1024),
+                backupCount=logging_config.get('backup_count', 5),
                 encoding='utf-8'
             )
             file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
-            print("Добавлен файловый обработчик логов")
+            handlers.append(file_handler)
         except Exception as e:
             print(f"Ошибка при создании файлового обработчика: {str(e)}")
-        
+
         # Добавляем обработчик для консоли
         console_handler = logging.StreamHandler()
         console_handler.setFormatter(formatter)
-        logger.addHandler(console_handler)
-        print("Добавлен консольный обработчик логов")
-        
+        handlers.append(console_handler)
+
+        # Очередь без ограничения: запись в неё не блокирует вызывающий код
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = _LazyQueueHandler(log_queue)
+        queue_handler.addFilter(SamplingFilter(logging_config.get('sampling', {})))
+        queue_handler.addFilter(_TraceIdFilter())
+        logger.addHandler(queue_handler)
+
+        global _listener
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+
         # Устанавливаем уровень логирования
         try:
-            level = getattr(logging, log_level.upper())
-            logger.setLevel(level)
-            print(f"Установлен уровень логирования: {log_level}")
+            logger.setLevel(getattr(logging, log_level.upper()))
         except (AttributeError, TypeError):
             logger.setLevel(logging.INFO)
-            print(f"Некорректный уровень логирования: {log_level}, используется INFO")
-        
-        logger.info("Логгер успешно настроен")
+            logger.warning("Некорректный уровень логирования: %s, используется INFO", log_level)
+
+        logger.info("Логгер настроен: уровень %s, файл %s", logging.getLevelName(logger.level), log_file)
         return logger
-        
+
     except Exception as e:
         # В случае ошибки создаем базовый логгер
         basic_logger = logging.getLogger()
         basic_logger.setLevel(logging.INFO)
-        
+
         if not basic_logger.handlers:
             console_handler = logging.StreamHandler()
             console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
             basic_logger.addHandler(console_handler)
-        
+
         basic_logger.warning(f"Ошибка при настройке логгера: {str(e)}. Используется базовая конфигурация.")
-        return basic_logger 
\ No newline at end of file
+        return basic_logger
+
+
+# Дописываем очередь в файл при завершении процесса
+atexit.register(_stop_listener)
@@ -1,6 +1,7 @@
 import logging
 from typing import Optional
-import re
+from framework.services.intent_router import match_image_request
+from framework.utils.text import clean_prompt, contains_cyrillic
 
 logger = logging.getLogger(__name__)
 
@@ -10,40 +11,18 @@ class PromptGenerator:
     @staticmethod
     def is_russian(text: str) -> bool:
         """Проверяет, содержит ли текст русские буквы"""
-        return any(ord(c) in range(1040, 1104) for c in text)
+        return contains_cyrillic(text)
     
     @staticmethod
     def clean_russian(text: str) -> str:
         """Очищает текст от русских букв и эмодзи"""
-        # Удаляем эмодзи
-        emoji_pattern = re.compile("["
-            u"\U0001F600-\U0001F64F"  # эмодзи
-            u"\U0001F300-\U0001F5FF"  # символы и пиктограммы
-            u"\U0001F680-\U0001F6FF"  # транспорт и символы
-            u"\U0001F1E0-\U0001F1FF"  # флаги
-            u"\U00002702-\U000027B0"
-            u"\U000024C2-\U0001F251"
-            "]+", flags=re.UNICODE)
-        text = emoji_pattern.sub(r'', text)
-        
-        # Удаляем русские буквы
-        text = ''.join(c for c in text if ord(c) not in range(1040, 1104))
-        
-        # Удаляем лишние пробелы
-        text = ' '.join(text.split())
-        
-        return text.strip()
+        return clean_prompt(text)
     
     @staticmethod
     def extract_prompt(text: str) -> Optional[str]:
-        """Извлекает промпт из текста, убирая ключевые слова"""
-        keywords = ['нарисуй', 'сгенерируй', 'создай', 'generate', 'draw', 'create']
-        text = text.lower()
-        
-        for keyword in keywords:
-            if keyword in text:
-                return text[text.find(keyword) + len(keyword):].strip()
-        return None
+        """Извлекает промпт из текста, убирая слова-триггеры (см. IntentRouter)"""
+        match = match_image_request(text)
+        return match.prompt if match else None
     
     @staticmethod
     def generate_translation_prompt(text: str) -> str:
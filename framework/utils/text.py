@@ -0,0 +1,78 @@
+"""
+Общие функции для определения языка и очистки текста.
+
+Шаблоны и таблицы удаления строятся один раз при импорте. Кириллица здесь -
+русский алфавит целиком, включая Ё/ё (U+0401, U+0451), которые лежат вне
+диапазона А-я (U+0410-U+044F).
+
+Буквы считаются без обхода строки в Python: текст кодируется в ASCII или
+cp1251 с отбрасыванием остальных символов, и из байтов удаляются буквы
+через bytes.translate - обе операции выполняются в C.
+"""
+import re
+import string
+
+CYRILLIC_PATTERN = re.compile("[А-Яа-яЁё]")
+CYRILLIC_RUN_PATTERN = re.compile("[А-Яа-яЁё]+")
+
+EMOJI_PATTERN = re.compile("["
+    u"\U0001F600-\U0001F64F"  # эмодзи
+    u"\U0001F300-\U0001F5FF"  # символы и пиктограммы
+    u"\U0001F680-\U0001F6FF"  # транспорт и символы
+    u"\U0001F1E0-\U0001F1FF"  # флаги
+    u"\U00002702-\U000027B0"
+    u"\U000024C2-\U0001F251"
+    "]+", flags=re.UNICODE)
+
+# Буквы в однобайтовых кодировках: латиница в ASCII, А-я (0xC0-0xFF) и Ё/ё (0xA8/0xB8) в cp1251
+_LATIN_BYTES = string.ascii_letters.encode('ascii')
+_CYRILLIC_BYTES = bytes(range(0xC0, 0x100)) + b"\xa8\xb8"
+
+
+def contains_cyrillic(text: str) -> bool:
+    """Есть ли в тексте хотя бы одна русская буква"""
+    return CYRILLIC_PATTERN.search(text) is not None
+
+
+def strip_cyrillic(text: str) -> str:
+    """Удаляет русские буквы"""
+    return CYRILLIC_RUN_PATTERN.sub('', text)
+
+
+def strip_emoji(text: str) -> str:
+    """Удаляет эмодзи и пиктограммы"""
+    return EMOJI_PATTERN.sub('', text)
+
+
+def normalize_spaces(text: str) -> str:
+    """Заменяет любые последовательности пробельных символов одним пробелом"""
+    return ' '.join(text.split())
+
+
+def clean_prompt(text: str) -> str:
+    """Очищает промпт для генерации изображения от русских букв и эмодзи"""
+    return normalize_spaces(strip_cyrillic(strip_emoji(text)))
+
+
+def count_cyrillic(text: str) -> int:
+    """Число русских букв"""
+    encoded = text.encode('cp1251', 'ignore')
+    return len(encoded) - len(encoded.translate(None, _CYRILLIC_BYTES))
+
+
+def count_latin(text: str) -> int:
+    """Число латинских букв"""
+    encoded = text.encode('ascii', 'ignore')
+    return len(encoded) - len(encoded.translate(None, _LATIN_BYTES))
+
+
+def is_mostly_latin(text: str, threshold: float = 0.5) -> bool:
+    """Латинских букв больше threshold от всех русских и латинских букв.
+
+    Отдельные английские слова (названия, термины) в русском ответе так не
+    считаются ответом на английском; цифры, знаки и эмодзи не учитываются.
+    """
+    latin = count_latin(text)
+    if not latin:
+        return False
+    return latin / (latin + count_cyrillic(text)) > threshold
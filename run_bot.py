@@ -1,26 +1,42 @@
 import asyncio
 import logging
+import multiprocessing
+import time
 from aiogram import Bot, Dispatcher, F
 from aiogram.filters import Command, CommandObject
-from aiogram.types import Message
+from aiogram.types import BufferedInputFile, Message
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from framework.agents.coordinator import AgentCoordinator
 from framework.utils.logger import setup_logger
-from framework.utils.config import load_config
+from framework.utils.config import load_admin_ids, load_config
 import os
 from dotenv import load_dotenv
 from framework.utils.prompt_generator import PromptGenerator
+from framework.services.webhook_server import WebhookServer
+from framework.services.workers import UpdateSupervisor, UpdateWorker
+from framework.handlers.middlewares import DedupMiddleware, GroupFilterMiddleware, MetricsMiddleware, TracingMiddleware
+from framework.services.metrics import MetricsServer
+from framework.services.tracing import tracer
+from framework.services.profiler import ProfilerService
+from framework.services.loop_monitor import LoopMonitor
+from framework.services.executor import get_executor
+from framework.services.group_filter import GroupFilter
 
 # Загружаем переменные окружения
 load_dotenv()
 
-# Инициализируем логгер
-logger = setup_logger()
-
 # Загружаем конфигурацию
 config = load_config()
 
+# Процессы пула разбора создаются fork'ом до того, как запущены поток логов, сторож
+# цикла событий и сам бот. Супервизор задач не выполняет, пул нужен только рабочим процессам
+if not UpdateSupervisor.is_enabled(config) or multiprocessing.parent_process() is not None:
+    get_executor(config).prestart()
+
+# Инициализируем логгер
+logger = setup_logger(config)
+
 # Инициализируем бота и диспетчер
 bot = Bot(
     token=os.getenv("TELEGRAM_BOT_TOKEN"),
@@ -30,6 +46,18 @@ dp = Dispatcher()
 
 # Инициализируем координатор агентов
 coordinator = AgentCoordinator(config, bot)
+# Сообщения в группах, не обращённые к боту, отбрасываются до любой работы агентов
+group_filter = GroupFilter.from_config(config)
+dp.message.outer_middleware(GroupFilterMiddleware(group_filter))
+# Повторно доставленные сообщения не обрабатываются дважды
+dp.message.outer_middleware(DedupMiddleware(coordinator.dedup))
+# Время работы каждого обработчика для /metrics
+dp.message.middleware(MetricsMiddleware())
+# Трасса на каждое обновление (секция tracing конфигурации)
+tracer.configure(config)
+dp.update.outer_middleware(TracingMiddleware())
+# Профилирование работающего бота по команде /profile
+profiler = ProfilerService.from_config(config)
 
 # Регистрируем обработчики команд
 @dp.message(Command("start"))
@@ -51,7 +79,8 @@ async def handle_help(message: Message):
         "📝 Основные команды:\n"
         "/start - Начать работу с ботом\n"
         "/help - Показать это сообщение\n"
-        "/generate &lt;описание&gt; - Сгенерировать изображение по описанию\n\n"
+        "/generate &lt;описание&gt; - Сгенерировать изображение по описанию\n"
+        "/cancel - Остановить текущую генерацию изображения\n\n"
         "🔄 Управление моделями:\n"
         "/models - Показать список доступных моделей\n"
         "/setmodel &lt;название&gt; - Установить модель по умолчанию\n"
@@ -62,7 +91,7 @@ async def handle_help(message: Message):
         "3. Нарисуй красивый закат над горами\n\n"
         "📸 Работа с изображениями:\n"
         "• Отправьте изображение для его анализа\n"
-        "• Используйте команду /generate или ключевые слова 'нарисуй', 'сгенерируй', 'создай' для генерации изображений"
+        "• Используйте команду /generate или просьбы вроде 'нарисуй ...' или 'создай картинку ...' для генерации изображений"
     )
 
 @dp.message(Command("generate"))
@@ -85,6 +114,18 @@ async def handle_generate(message: Message):
         logger.error(f"Error in handle_generate: {str(e)}")
         await message.answer("Произошла ошибка при генерации изображения. Попробуйте еще раз.")
 
+@dp.message(Command("cancel"))
+async def handle_cancel(message: Message):
+    """Обработчик команды /cancel"""
+    try:
+        if await coordinator.cancel_generation(message.chat.id, message.from_user.id):
+            await message.answer("⏹ Останавливаю генерацию изображения...")
+        else:
+            await message.answer("Сейчас нет активной генерации изображения.")
+    except Exception as e:
+        logger.error(f"Error in handle_cancel: {str(e)}")
+        await message.answer("Не удалось отменить генерацию. Попробуйте еще раз.")
+
 @dp.message(Command("models"))
 async def cmd_models(message: Message):
     """Обработчик команды /models"""
@@ -194,6 +235,38 @@ async def cmd_current(message: Message):
             "Пожалуйста, попробуйте позже."
         )
 
+@dp.message(Command("profile"))
+async def cmd_profile(message: Message, command: CommandObject):
+    """Обработчик команды /profile (только для администраторов)"""
+    if message.from_user.id not in load_admin_ids():
+        await message.answer("⛔ Команда доступна только администраторам.")
+        return
+    try:
+        seconds = float(command.args) if command.args else profiler.default_seconds
+    except ValueError:
+        await message.answer("Использование: /profile &lt;секунды&gt;")
+        return
+    if profiler.busy:
+        await message.answer("⏳ Профилирование уже выполняется, дождитесь результата.")
+        return
+    try:
+        seconds = max(1.0, min(seconds, profiler.max_seconds))
+        await message.answer(f"⏱ Профилирую бота {seconds:.0f} с...")
+        report = await profiler.profile(seconds)
+        name = f"profile-{os.getpid()}-{int(time.time())}"
+        # Свёрнутые стеки открываются в speedscope или flamegraph.pl
+        await message.answer_document(
+            BufferedInputFile(report.folded().encode("utf-8"), filename=f"{name}.folded"),
+            caption=f"🔥 {report.samples} выборок за {report.duration:.0f} с (speedscope.app, flamegraph.pl)"
+        )
+        await message.answer_document(
+            BufferedInputFile(report.summary(profiler.top).encode("utf-8"), filename=f"{name}.txt"),
+            caption="📊 Самые затратные функции и задержка цикла событий"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при профилировании: {str(e)}")
+        await message.answer("😢 Не удалось выполнить профилирование.")
+
 @dp.message(F.photo)
 async def handle_photo(message: Message):
     """Обработчик фотографий"""
@@ -207,12 +280,14 @@ async def handle_photo(message: Message):
         file_path = file.file_path
         
         # Скачиваем файл
-        file_bytes = await bot.download_file(file_path)
+        with tracer.span("telegram.download", size=photo.file_size or 0):
+            file_bytes = await bot.download_file(file_path)
         
         # Обрабатываем изображение
-        result = await coordinator.process_image(file_bytes, message.from_user.id, message.message_id, message.caption or "")
+        result = await coordinator.process_image(file_bytes, message.from_user.id, message.message_id,
+                                                 message.caption or "", chat_id=message.chat.id)
         if result.get("action") == "send_message":
-            await message.answer(result["text"])
+            await coordinator.sender.answer(message, result["text"])
             
     except Exception as e:
         logger.error(f"Error in handle_photo: {str(e)}")
@@ -231,7 +306,7 @@ async def handle_document(message: Message):
         
         # Отправляем ответ
         if result["action"] == "send_message":
-            await message.answer(result["text"])
+            await coordinator.sender.answer(message, result["text"])
             
     except Exception as e:
         logger.error(f"Ошибка при обработке документа: {str(e)}", exc_info=True)
@@ -247,42 +322,120 @@ async def handle_text(message: Message):
         # Проверяем, не является ли сообщение командой
         if message.text.startswith('/'):
             return
+        # В группе обращение к боту («Слайм, ...») не относится к запросу
+        text = message.text
+        if message.chat.type != "private":
+            text = group_filter.strip_address(text) or text
             
         # Проверяем, является ли сообщение ответом на сообщение бота
         if message.reply_to_message and message.reply_to_message.from_user.id == bot.id:
             # Обрабатываем как обычное сообщение
-            result = await coordinator.process_message(message.text, message.from_user.id, message.message_id)
+            result = await coordinator.process_message(
+                text, message.from_user.id, message.message_id, chat_id=message.chat.id
+            )
             if result.get("action") == "send_message":
-                await message.answer(result["text"])
+                await coordinator.sender.answer(message, result["text"])
             return
             
-        # Проверяем наличие ключевых слов для генерации изображения
-        prompt = coordinator.prompt_agent.extract_prompt(message.text)
-        if prompt:
-            await coordinator.generate_image(message, prompt)
+        # Генерация изображения - только если сообщение уверенно распознано как просьба нарисовать
+        intent = await coordinator.intent_router.classify(text)
+        if intent.is_image:
+            await coordinator.generate_image(message, intent.prompt)
             return
             
         # Если это не запрос на генерацию изображения, обрабатываем как обычное сообщение
-        result = await coordinator.process_message(message.text, message.from_user.id, message.message_id)
+        result = await coordinator.process_message(
+            text, message.from_user.id, message.message_id, chat_id=message.chat.id
+        )
         if result.get("action") == "send_message":
-            await message.answer(result["text"])
+            await coordinator.sender.answer(message, result["text"])
             
     except Exception as e:
         logger.error(f"Error in handle_text: {str(e)}")
         await message.answer("Произошла ошибка при обработке сообщения. Попробуйте позже.")
 
+def start_warmup() -> None:
+    """Запускает фоновую загрузку модели генерации изображений, если она включена"""
+    # Модель генерации изображений грузится в фоне, текстовый чат доступен сразу
+    if config.get('image_generation', {}).get('warmup_on_start', True):
+        logger.info("Фоновая загрузка модели генерации изображений...")
+        coordinator.image_generator.start_warmup()
+
+async def run_worker(index: int, stop_event=None) -> None:
+    """Рабочий процесс: обрабатывает обновления своего раздела общей очереди"""
+    loop_monitor = LoopMonitor.from_config(config)
+    metrics_server = None
+    try:
+        logger.info(f"Запуск рабочего процесса {index}...")
+        if loop_monitor:
+            loop_monitor.start()
+        # Процессы пула разбора запускаются до загрузки моделей
+        await get_executor(config).start()
+        # Модель изображений прогревает только первый процесс, чтобы не занимать память N раз
+        if index == 0:
+            start_warmup()
+        profiler.start_startup_profile()
+        # Порт метрик процесса: базовый занимает супервизор, рабочие - следующие
+        metrics_server = MetricsServer.from_config(config, port_offset=index + 1)
+        if metrics_server:
+            await metrics_server.start()
+        await UpdateWorker.from_config(config, dp, bot, coordinator.shared_store, index).run(stop_event)
+    finally:
+        if loop_monitor:
+            await loop_monitor.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        get_executor(config).shutdown()
+        await coordinator.sender.close()
+        coordinator.dedup.save()
+        await bot.session.close()
+
+def worker_entry(index: int, count: int, stop_event) -> None:
+    """Точка входа рабочего процесса, запускаемого супервизором"""
+    # У каждого процесса свой файл логов: ротация общего файла из нескольких процессов небезопасна
+    setup_logger(config, process_name=f"worker{index}")
+    asyncio.run(run_worker(index, stop_event))
+
 async def main():
     """Основная функция запуска бота"""
+    # Блокировки цикла событий попадают в лог и метрики event_loop_*
+    loop_monitor = LoopMonitor.from_config(config)
+    metrics_server = None
     try:
         logger.info("Запуск бота...")
-        logger.info("Загрузка модели генерации изображений...")
-        await coordinator.image_generator.load_model()
+        if loop_monitor:
+            loop_monitor.start()
+        metrics_server = MetricsServer.from_config(config)
+        if metrics_server:
+            await metrics_server.start()
+        if UpdateSupervisor.is_enabled(config):
+            # Этот процесс только получает обновления, обработка - в рабочих процессах
+            supervisor = UpdateSupervisor.from_config(
+                config, bot, coordinator.shared_store, worker_entry, dp.resolve_used_update_types()
+            )
+            logger.info(f"Бот запущен в режиме {supervisor.count} рабочих процессов")
+            await supervisor.run()
+            return
+        # Процессы пула разбора запускаются до загрузки моделей
+        await get_executor(config).start()
+        start_warmup()
+        profiler.start_startup_profile()
         logger.info("Бот успешно запущен")
-        await dp.start_polling(bot)
+        if WebhookServer.is_enabled(config):
+            await WebhookServer.from_config(config, dp, bot).serve_forever()
+        else:
+            await dp.start_polling(bot)
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {str(e)}")
         raise
     finally:
+        if loop_monitor:
+            await loop_monitor.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        get_executor(config).shutdown()
+        await coordinator.sender.close()
+        coordinator.dedup.save()
         await bot.session.close()
 
 if __name__ == "__main__":